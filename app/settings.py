@@ -1,4 +1,5 @@
 import os
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -43,7 +44,7 @@ INSTALLED_APPS = [
 
     # Local
     'users.apps.UsersConfig',
-    'core',
+    'core.apps.CoreConfig',
 
     'django_extensions',
     'corsheaders'
@@ -103,6 +104,43 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# local-memory cache evicts least recently used entries above MAX_ENTRIES,
+# cache versions are kept in the database and shared by every worker
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'moneycontrol'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '1000')),
+        },
+    }
+}
+
+HOME_LIST_CACHE_TIMEOUT = int(os.environ.get('HOME_LIST_CACHE_TIMEOUT', '3600'))
+
+# Seconds report sections of past months are cached at most
+REPORT_MONTH_CACHE_TIMEOUT = int(
+    os.environ.get('REPORT_MONTH_CACHE_TIMEOUT', '604800'))
+
+# Seconds a response is replayed to requests with the same Idempotency-Key
+IDEMPOTENCY_KEY_TIMEOUT = int(os.environ.get('IDEMPOTENCY_KEY_TIMEOUT', '86400'))
+
+# Seconds a key stays claimed by a request still in progress, not shorter
+# than the gunicorn worker timeout of the Procfile
+IDEMPOTENCY_LEASE_TIMEOUT = int(
+    os.environ.get('IDEMPOTENCY_LEASE_TIMEOUT', '1200'))
+
+# Read monthly reports and operation totals from DailyRollup, run
+# rebuild_rollups before enabling
+REPORTS_FROM_ROLLUPS = os.environ.get('REPORTS_FROM_ROLLUPS', '') == 'TRUE'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -219,4 +257,5 @@ LOGGING = {
 }
 
 CORS_ALLOWED_ORIGINS = str(os.environ.get('CORS_ALLOWED_ORIGINS')).split(",")
-CSRF_TRUSTED_ORIGINS = str(os.environ.get('CSRF_TRUSTED_ORIGINS')).split(",")
\ No newline at end of file
+CSRF_TRUSTED_ORIGINS = str(os.environ.get('CSRF_TRUSTED_ORIGINS')).split(",")
+CORS_ALLOW_HEADERS = list(default_headers) + ['idempotency-key']
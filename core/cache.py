@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core import models
+
+
+HOME_LIST_KEY = 'home-list:{company_id}:{version}:{profile_id}:{param}'
+REPORT_MONTH_KEY = 'monthly-report:{company_id}:{version}:{scope}:{month}'
+
+
+def increment_version(company_id, field):
+    """Add one to the ``field`` version of the company's CompanyState"""
+    state = models.CompanyState.objects.filter(company_id=company_id)
+
+    if state.update(**{field: F(field) + 1}):
+        return
+
+    try:
+        with transaction.atomic():
+            models.CompanyState.objects.create(
+                company_id=company_id, **{field: 1})
+    except IntegrityError:
+        # created by a concurrent bump or the company is deleted
+        state.update(**{field: F(field) + 1})
+
+
+def bump_company_version(company_id):
+    """
+    Invalidate every cached response of the company.
+
+    The version is changed once the current transaction commits, so a
+    reader can not cache data of the transaction not yet visible to it
+    under the new version.
+    """
+    if company_id is None:
+        return
+
+    transaction.on_commit(lambda: increment_version(company_id, 'version'))
+
+
+def get_home_list_cache_key(user, profile_id_param=None):
+    """
+    Return the home-list cache key for the user or None if the response
+    should not be cached.
+
+    The profile and the company version are read by one query, the
+    version is shared by every worker process.
+
+    :param user: requesting user
+    :param profile_id_param: str, ``profile_id`` query param if given
+    """
+    if profile_id_param is not None and not profile_id_param.isdigit():
+        return None
+
+    profile = models.Profile.objects.filter(user=user)\
+        .values_list('id', 'company_id', 'company__state__version').first()
+
+    if profile is None or profile[1] is None:
+        return None
+
+    profile_id, company_id, version = profile
+
+    return HOME_LIST_KEY.format(
+        company_id=company_id,
+        version=version or 0,
+        profile_id=profile_id,
+        param=profile_id_param or '',
+    )
+
+
+def get_home_list(cache_key):
+    return cache.get(cache_key)
+
+
+def set_home_list(cache_key, data):
+    cache.set(cache_key, data, settings.HOME_LIST_CACHE_TIMEOUT)
+
+
+def bump_history_version(company_id):
+    """
+    Invalidate cached reports of the company's past months once the
+    current transaction commits.
+
+    Creating an operation only adds to the current month, so the version
+    changes only when an existing operation is edited or deleted.
+    """
+    if company_id is None:
+        return
+
+    transaction.on_commit(
+        lambda: increment_version(company_id, 'history_version'))
+
+
+def get_report_month_keys(company_id, version, scope, months):
+    """
+    Return ``{month: cache key}`` of monthly report sections.
+
+    :param version: int, ``CompanyState.history_version`` of the company,
+        None if it has no state yet
+    :param scope: str, identifies the report params, see
+        ``MonthlyReportView.get_scope``
+    :param months: iterable of month start dates
+    """
+    return {
+        month: REPORT_MONTH_KEY.format(
+            company_id=company_id,
+            version=version or 0,
+            scope=scope,
+            month=month.strftime('%Y-%m'),
+        )
+        for month in months
+    }
+
+
+def get_report_months(keys):
+    """Return ``{month: section}`` of the cached months of ``keys``"""
+    cached = cache.get_many(list(keys.values()))
+
+    return {
+        month: cached[key] for month, key in keys.items() if key in cached
+    }
+
+
+def set_report_months(keys, sections):
+    """
+    Cache sections of past months. They are invalidated by the history
+    version, the timeout only bounds how long a missed bump is served.
+    """
+    cache.set_many({
+        keys[month]: section for month, section in sections.items()
+    }, settings.REPORT_MONTH_CACHE_TIMEOUT)
+
+
+def mark_ledger_pending(company_id):
+    """
+    Flag the company as having ledger entries not in its balances once
+    the current transaction commits them.
+    """
+    def mark():
+        state = models.CompanyState.objects.filter(company_id=company_id)
+
+        if state.filter(ledger_pending=False).update(ledger_pending=True) \
+                or state.exists():
+            return
+
+        try:
+            with transaction.atomic():
+                models.CompanyState.objects.create(
+                    company_id=company_id, ledger_pending=True)
+        except IntegrityError:
+            # created by a concurrent writer or the company is deleted
+            state.update(ledger_pending=True)
+
+    transaction.on_commit(mark)
+
+
+def take_ledger_pending(company_id):
+    """
+    Return whether the company has pending ledger entries and clear the
+    flag by one statement. Call it in the transaction compacting the
+    entries, so the flag comes back if the compaction fails. It is cleared
+    before the entries are compacted, so a flag set by a writer meanwhile
+    is kept for the next reader.
+    """
+    return bool(
+        models.CompanyState.objects
+        .filter(company_id=company_id, ledger_pending=True)
+        .update(ledger_pending=False)
+    )
@@ -0,0 +1,214 @@
+import datetime
+import decimal
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils.timezone import localdate, localtime, make_aware
+
+from dateutil import parser
+
+from core import models
+from core.services import OPERATION_TYPES, get_rollup_kinds
+
+
+OPERATION_MODELS = {
+    'action': models.Action,
+    'transaction': models.Transaction,
+    'transfer': models.Transfer,
+}
+
+
+def parse_ids(value):
+    try:
+        return [int(item) for item in value.split(",") if item]
+    except ValueError:
+        raise ValueError('Неверный фильтр')
+
+
+def parse_amount(value):
+    if not value:
+        return None
+
+    try:
+        return decimal.Decimal(value)
+    except decimal.InvalidOperation:
+        raise ValueError('Неверный диапазон сумм')
+
+
+def parse_date(value, end_of_day=False):
+    if not value:
+        return None
+
+    try:
+        date = make_aware(parser.parse(value).replace(tzinfo=None))
+    except (ValueError, OverflowError):
+        raise ValueError('Неверный диапазон дат')
+
+    if end_of_day:
+        date = date.replace(minute=59, hour=23, second=59)
+
+    return date
+
+
+class OperationFilter:
+    """
+    Filters of operation lists validated once and applied to the action,
+    transaction and transfer querysets.
+
+    Query params are ``account``, ``category``, ``tag`` and ``type``
+    comma separated lists, ``start_date``, ``end_date``, ``min_amount``
+    and ``max_amount``. Transfers have no category and no tags, so they
+    are filtered out when one of those filters is set.
+    """
+
+    def __init__(self, accounts=(), categories=(), tags=(), types=(),
+                 start_date=None, end_date=None,
+                 min_amount=None, max_amount=None):
+        for operation_type in types:
+            if operation_type not in OPERATION_TYPES:
+                raise ValueError('Неверный тип операции')
+
+        if start_date and end_date and start_date > end_date:
+            raise ValueError('Неверный диапазон дат')
+
+        if min_amount is not None and max_amount is not None and \
+                min_amount > max_amount:
+            raise ValueError('Неверный диапазон сумм')
+
+        self.accounts = list(accounts)
+        self.categories = list(categories)
+        self.tags = list(tags)
+        self.types = list(types)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        """Return the filter of a request, raise ValueError if invalid"""
+        return cls(
+            accounts=parse_ids(query_params.get('account', '')),
+            categories=parse_ids(query_params.get('category', '')),
+            tags=parse_ids(query_params.get('tag', '')),
+            types=[operation_type for operation_type in query_params.get(
+                'type', '').split(",") if operation_type],
+            start_date=parse_date(query_params.get('start_date')),
+            end_date=parse_date(
+                query_params.get('end_date'), end_of_day=True),
+            min_amount=parse_amount(query_params.get('min_amount')),
+            max_amount=parse_amount(query_params.get('max_amount')),
+        )
+
+    def filter_accounts(self, accounts):
+        """Narrow the Account queryset the user may see to the filter"""
+        if self.accounts:
+            return accounts.filter(id__in=self.accounts)
+
+        return accounts
+
+    def get_tag_filter(self, operation_type):
+        """Return an EXISTS subquery matching operations with any tag"""
+        through = OPERATION_MODELS[operation_type].tags.through
+
+        return Exists(through.objects.filter(**{
+            f'{operation_type}_id': OuterRef('pk'),
+            'tag_id__in': self.tags,
+        }))
+
+    def filter_operations(self, operation_type, queryset):
+        """
+        Apply every filter but accounts to ``queryset`` of ``type``.
+
+        Tags are matched with an EXISTS subquery, so an operation is
+        returned once however many of its tags match.
+        """
+        if self.types and operation_type not in self.types:
+            return queryset.none()
+
+        if operation_type == 'transfer':
+            if self.categories or self.tags:
+                return queryset.none()
+        else:
+            if self.categories:
+                queryset = queryset.filter(category__in=self.categories)
+
+            if self.tags:
+                queryset = queryset\
+                    .annotate(has_tag=self.get_tag_filter(operation_type))\
+                    .filter(has_tag=True)
+
+        if self.start_date:
+            queryset = queryset.filter(last_updated__gte=self.start_date)
+
+        if self.end_date:
+            queryset = queryset.filter(last_updated__lte=self.end_date)
+
+        amount_field = f'{operation_type}_amount'
+
+        if self.min_amount is not None:
+            queryset = queryset.filter(
+                **{f'{amount_field}__gte': self.min_amount})
+
+        if self.max_amount is not None:
+            queryset = queryset.filter(
+                **{f'{amount_field}__lte': self.max_amount})
+
+        return queryset
+
+    def get_queryset(self, operation_type, accounts):
+        """
+        Return filtered operations of ``type`` touching ``accounts``.
+
+        :param operation_type: str, one of ``OPERATION_TYPES``
+        :param accounts: Account queryset the user may see
+        """
+        accounts = self.filter_accounts(accounts)
+        queryset = OPERATION_MODELS[operation_type].objects.all()
+
+        if operation_type == 'transfer':
+            queryset = queryset.filter(
+                Q(from_account__in=accounts) | Q(to_account__in=accounts))
+        else:
+            queryset = queryset.filter(account__in=accounts)
+
+        return self.filter_operations(operation_type, queryset)
+
+    @property
+    def supports_rollups(self):
+        """
+        Whether daily rollups hold every operation matching the filter,
+        the dates must cover whole days
+        """
+        return not self.tags and \
+            self.min_amount is None and self.max_amount is None and \
+            (self.start_date is None or
+             localtime(self.start_date).time() == datetime.time.min) and \
+            (self.end_date is None or
+             localtime(self.end_date).time() >= datetime.time(23, 59, 59))
+
+    def get_rollups(self, company, accounts):
+        """
+        Return DailyRollup rows of ``company`` matching the filter.
+
+        Rollups have no tags and no amounts of single operations, check
+        ``supports_rollups`` first.
+        """
+        rollups = models.DailyRollup.objects.filter(
+            company=company, account__in=self.filter_accounts(accounts))
+
+        if self.types:
+            rollups = rollups.filter(kind__in=[
+                kind for operation_type in self.types
+                for kind in get_rollup_kinds(operation_type)
+            ])
+
+        if self.categories:
+            rollups = rollups.filter(category__in=self.categories)
+
+        if self.start_date:
+            rollups = rollups.filter(day__gte=localdate(self.start_date))
+
+        if self.end_date:
+            rollups = rollups.filter(day__lte=localdate(self.end_date))
+
+        return rollups
@@ -0,0 +1,175 @@
+import datetime
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, \
+    transaction
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from core import models
+from core.services.main import is_retryable
+
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+class IdempotencyError(Exception):
+    """Key can not be used for the request, carries the error response"""
+
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.response = Response({"detail": detail}, status=status_code)
+
+
+def get_request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+
+    return hashlib.sha256(
+        f'{request.method} {request.path} {body}'.encode()).hexdigest()
+
+
+def claim_key(user, key, request_hash):
+    """
+    Return a new in progress IdempotencyKey of the request or the stored
+    response of the request already made with ``key``.
+
+    The row is committed before the request is handled, so a concurrent
+    retry finds it in progress instead of creating a second operation.
+    It expires after ``IDEMPOTENCY_LEASE_TIMEOUT`` until the response is
+    stored, so a retry takes over the key of a request whose worker died.
+    """
+    now = timezone.now()
+    models.IdempotencyKey.objects\
+        .filter(user=user, key=key, expires__lte=now).delete()
+
+    while True:
+        try:
+            with transaction.atomic():
+                return models.IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_hash=request_hash,
+                    expires=now + datetime.timedelta(
+                        seconds=settings.IDEMPOTENCY_LEASE_TIMEOUT),
+                ), None
+        except IntegrityError:
+            pass
+
+        try:
+            record = models.IdempotencyKey.objects.get(user=user, key=key)
+            break
+        except models.IdempotencyKey.DoesNotExist:
+            # The request holding the key failed and released it.
+            continue
+
+    if record.request_hash != request_hash:
+        raise IdempotencyError(
+            'Ключ идемпотентности использован для другого запроса',
+            status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    if record.status_code is None:
+        raise IdempotencyError(
+            'Запрос с этим ключом идемпотентности еще выполняется',
+            status.HTTP_409_CONFLICT)
+
+    response = Response(json.loads(record.response),
+                        status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+
+    return None, response
+
+
+def store_response(record, response):
+    """
+    Store a successful response of ``record`` or release the key of an
+    error response, in the current transaction.
+    """
+    if response.status_code >= 400:
+        record.delete()
+        return
+
+    models.IdempotencyKey.objects.filter(id=record.id).update(
+        status_code=response.status_code,
+        response=json.dumps(response.data, cls=JSONEncoder),
+        expires=timezone.now() + datetime.timedelta(
+            seconds=settings.IDEMPOTENCY_KEY_TIMEOUT))
+
+
+def idempotent(create, retries=3):
+    """
+    Replay the stored response to create requests repeating the
+    ``Idempotency-Key`` header of a handled one, without running the view.
+
+    The view runs in one transaction with storing its response, so a
+    crash can not commit the operation without it. The transaction is
+    retried up to ``retries`` times if the database aborts it on a
+    serialization failure or a deadlock.
+
+    Only successful responses are stored. Error responses and exceptions,
+    which roll the view back, release the key, so the client may retry
+    with it. Requests without the header are not changed.
+    """
+    @functools.wraps(create)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+
+        if key is None:
+            return create(self, request, *args, **kwargs)
+
+        try:
+            if not key or len(key) > 255:
+                raise IdempotencyError('Неверный ключ идемпотентности')
+
+            record, replay = claim_key(
+                request.user, key, get_request_hash(request))
+        except IdempotencyError as e:
+            return e.response
+
+        if replay is not None:
+            return replay
+
+        for attempt in range(retries):
+            try:
+                with transaction.atomic():
+                    response = create(self, request, *args, **kwargs)
+                    store_response(record, response)
+
+                return response
+            except OperationalError as e:
+                if not is_retryable(e) or connection.in_atomic_block or \
+                        attempt == retries - 1:
+                    record.delete()
+                    raise
+            except Exception:
+                record.delete()
+                raise
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Delete expired idempotency keys ``batch_size`` at a time, every batch
+    in its own short transaction.
+
+    :return: int, number of keys deleted
+    """
+    deleted = 0
+
+    while True:
+        ids = list(
+            models.IdempotencyKey.objects
+            .filter(expires__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+
+        if not ids:
+            return deleted
+
+        deleted += models.IdempotencyKey.objects.filter(id__in=ids).delete()[0]
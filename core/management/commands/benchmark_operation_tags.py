@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core import models
+from core.management.seed import seed_company
+from core.services import attach_operation_tags, tag_operations
+
+
+class Command(BaseCommand):
+    help = 'Compare reading operation tags through the through tables ' \
+           'with the ArrayAgg GROUP BY plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations', type=int, default=100000,
+            help='Total number of seeded actions and transactions')
+        parser.add_argument(
+            '--tags', type=int, default=20,
+            help='Number of seeded tags')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of timed runs of every plan')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            company = seed_company(
+                options['operations'] // 3, days=365, tags=options['tags'])
+            accounts = models.Account.objects.filter(company=company)
+            querysets = {
+                'action': models.Action.objects
+                .filter(account__in=accounts)
+                .order_by('-last_updated', '-id'),
+                'transaction': models.Transaction.objects
+                .filter(account__in=accounts)
+                .order_by('-last_updated', '-id'),
+            }
+
+            plans = [('through table', self.read_through_tables)]
+
+            if connection.vendor == 'postgresql':
+                plans.append(('ArrayAgg', self.read_array_agg))
+            else:
+                self.stdout.write(
+                    f'ArrayAgg plan skipped, {connection.vendor} '
+                    f'has no ARRAY_AGG')
+
+            for name, plan in plans:
+                timings = [
+                    self.measure(plan, querysets)
+                    for run in range(options['repeat'])
+                ]
+                self.stdout.write(
+                    f'{name}: median {statistics.median(timings):.3f}s, '
+                    f'best {min(timings):.3f}s')
+
+            transaction.set_rollback(True)
+
+    def measure(self, plan, querysets):
+        started = time.perf_counter()
+        plan(querysets)
+        return time.perf_counter() - started
+
+    def read_through_tables(self, querysets):
+        operations = [
+            operation
+            for operation_type, queryset in querysets.items()
+            for operation in tag_operations(operation_type, queryset)
+        ]
+        attach_operation_tags(operations, querysets=querysets)
+        return operations
+
+    def read_array_agg(self, querysets):
+        from django.contrib.postgres.aggregates import ArrayAgg
+
+        return [
+            operation
+            for operation_type, queryset in querysets.items()
+            for operation in tag_operations(operation_type, queryset.annotate(
+                tag_ids=ArrayAgg('tags__id', distinct=True)))
+        ]
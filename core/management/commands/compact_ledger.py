@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import models
+from core.services import compact_ledger
+
+
+class Command(BaseCommand):
+    help = 'Fold new ledger entries into the balances of ledger mode accounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company', type=int, action='append', dest='companies',
+            help='Company id to compact, may be repeated, all by default')
+        parser.add_argument(
+            '--interval', type=float,
+            help='Seconds between runs, run forever in the background if '
+                 'given, once by default')
+
+    def compact(self, companies):
+        compacted = 0
+
+        for company_id in companies.values_list('id', flat=True):
+            compacted += compact_ledger(
+                models.Account.objects.filter(company_id=company_id))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Compacted {compacted} accounts'))
+
+    def handle(self, *args, **options):
+        companies = models.Company.objects.order_by('id')
+
+        if options['companies']:
+            companies = companies.filter(id__in=options['companies'])
+
+        self.compact(companies)
+
+        while options['interval']:
+            time.sleep(options['interval'])
+            self.compact(companies)
@@ -0,0 +1,94 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import models
+from core.management.seed import seed_company
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans of the list and filter queries of the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company', type=int,
+            help='Company id to explain the queries for')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed that many operations per type into a new company '
+                 'before explaining, rolled back afterwards')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Spread seeded operations over that many days')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                company = seed_company(options['seed'], options['days'])
+            elif options['company']:
+                company = models.Company.objects\
+                    .filter(id=options['company']).first()
+            else:
+                company = models.Company.objects.order_by('id').first()
+
+            if company is None:
+                raise CommandError('Company not found, use --seed')
+
+            for name, queryset in self.get_queries(company):
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(str(queryset.query))
+                self.stdout.write(queryset.explain())
+                self.stdout.write('')
+
+            transaction.set_rollback(True)
+
+    def get_queries(self, company):
+        accounts = models.Account.objects.filter(company=company)
+        account_ids = list(accounts.values_list('id', flat=True)[:3])
+        end = timezone.now()
+        start = end - datetime.timedelta(days=31)
+        ordering = ('-last_updated', '-id')
+
+        return (
+            ('Account list',
+             accounts.order_by('-last_updated')),
+            ('Category list',
+             models.Category.objects.filter(company=company)
+             .order_by('-last_updated')),
+            ('Tag list',
+             models.Tag.objects.filter(company=company)
+             .order_by('-last_updated')),
+            ('Company profiles by company_identificator',
+             models.Profile.objects
+             .filter(company_identificator=company.company_id)),
+            ('Latest actions',
+             models.Action.objects.filter(account__in=accounts)
+             .order_by(*ordering)[:10]),
+            ('Latest transactions',
+             models.Transaction.objects.filter(account__in=accounts)
+             .order_by(*ordering)[:10]),
+            ('Latest transfers',
+             models.Transfer.objects
+             .filter(Q(from_account__in=accounts) |
+                     Q(to_account__in=accounts))
+             .order_by(*ordering)[:10]),
+            ('Actions in a month of some accounts',
+             models.Action.objects
+             .filter(account__in=account_ids,
+                     last_updated__range=[start, end])
+             .order_by(*ordering)),
+            ('Transactions in a month of some accounts',
+             models.Transaction.objects
+             .filter(account__in=account_ids,
+                     last_updated__range=[start, end])
+             .order_by(*ordering)),
+            ('Transfers in a month of some accounts',
+             models.Transfer.objects
+             .filter(Q(from_account__in=account_ids) |
+                     Q(to_account__in=account_ids),
+                     last_updated__range=[start, end])
+             .order_by(*ordering)),
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models
+from core.services import import_operations, read_import_rows
+
+
+class Command(BaseCommand):
+    help = 'Import actions and transactions of a profile from CSV or JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .json file')
+        parser.add_argument(
+            '--profile', type=int, required=True,
+            help='Profile id owning the accounts of the rows')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of rows saved in one transaction')
+
+    def handle(self, *args, **options):
+        try:
+            profile = models.Profile.objects.select_related('company')\
+                .get(id=options['profile'], company__isnull=False)
+        except models.Profile.DoesNotExist:
+            raise CommandError('Profile not found or not in a company')
+
+        with open(options['path'], 'rb') as file:
+            try:
+                result = import_operations(
+                    profile,
+                    read_import_rows(file, options['path']),
+                    chunk_size=options['chunk_size']
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['detail']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} operations, "
+            f"{len(result['errors'])} rows failed"))
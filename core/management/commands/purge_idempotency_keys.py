@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys of create requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of keys deleted by one query')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} keys'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import models
+from core.services import rebuild_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Recompute end of month balance checkpoints of closed months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company', type=int, action='append', dest='companies',
+            help='Company id to rebuild, may be repeated, all by default')
+        parser.add_argument(
+            '--months', type=int,
+            help='Number of the latest closed months to rebuild, '
+                 'all by default')
+
+    def handle(self, *args, **options):
+        companies = models.Company.objects.order_by('id')
+
+        if options['companies']:
+            companies = companies.filter(id__in=options['companies'])
+
+        created = 0
+
+        for company_id in companies.values_list('id', flat=True):
+            with transaction.atomic():
+                created += rebuild_checkpoints(
+                    models.Account.objects.filter(company_id=company_id),
+                    options['months']
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {created} checkpoints'))
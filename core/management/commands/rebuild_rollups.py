@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.services import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily rollups from actions, transactions and transfers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company', type=int, action='append', dest='companies',
+            help='Company id to rebuild, may be repeated, all by default')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_rollups(options['companies'])
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} rollups'))
@@ -0,0 +1,83 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import models
+from core.services import reconcile_balances
+
+
+def reconcile_chunk(company_ids, repair):
+    """Run in a worker process, it opens its own database connection"""
+    return reconcile_balances(company_ids, repair)
+
+
+class Command(BaseCommand):
+    help = 'Compare account balances with the sums of their operations ' \
+           'and optionally repair the drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company', type=int, action='append', dest='companies',
+            help='Company id to check, may be repeated, all by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Number of companies checked by one query')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes, 1 runs in this process')
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Add the drift back to the drifted balances')
+
+    def get_chunks(self, options):
+        companies = models.Company.objects.order_by('id')
+
+        if options['companies']:
+            companies = companies.filter(id__in=options['companies'])
+
+        company_ids = list(companies.values_list('id', flat=True))
+        size = options['chunk_size']
+
+        return [
+            company_ids[offset:offset + size]
+            for offset in range(0, len(company_ids), size)
+        ]
+
+    def iter_results(self, chunks, options):
+        if options['workers'] <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield reconcile_balances(chunk, options['repair'])
+
+            return
+
+        # forked workers must not share the connection of this process
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=options['workers'],
+                                 initializer=django.setup) as executor:
+            yield from executor.map(
+                reconcile_chunk, chunks, [options['repair']] * len(chunks))
+
+    def handle(self, *args, **options):
+        checked = 0
+        drifted = 0
+
+        for chunk_checked, drifts in self.iter_results(
+                self.get_chunks(options), options):
+            checked += chunk_checked
+            drifted += len(drifts)
+
+            for account_id, company_id, balance, expected in drifts:
+                self.stdout.write(
+                    f'Account {account_id} of company {company_id}: '
+                    f'balance {balance}, expected {expected}, '
+                    f'drift {balance - expected}')
+
+        repaired = f', {drifted} repaired' if options['repair'] else ''
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} accounts, {drifted} drifted{repaired}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import models
+from core.services import set_ledger_mode
+
+
+class Command(BaseCommand):
+    help = 'Switch accounts to ledger mode, for shared high-write accounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'accounts', type=int, nargs='+', help='Account ids to switch')
+        parser.add_argument(
+            '--off', action='store_true',
+            help='Switch the accounts back to balance updates')
+
+    def handle(self, *args, **options):
+        switched = set_ledger_mode(
+            models.Account.objects.filter(id__in=options['accounts']),
+            enabled=not options['off']
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Switched {switched} accounts'))
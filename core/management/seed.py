@@ -0,0 +1,118 @@
+import datetime
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from core import models
+
+
+OPERATION_MODELS = (models.Action, models.Transaction, models.Transfer)
+
+
+def create_operations(accounts, category, company, size):
+    models.Action.objects.bulk_create([
+        models.Action(account=accounts[index % len(accounts)],
+                      category=category, company=company,
+                      action_amount=index)
+        for index in range(size)
+    ])
+    models.Transaction.objects.bulk_create([
+        models.Transaction(account=accounts[index % len(accounts)],
+                           category=category, company=company,
+                           transaction_amount=index)
+        for index in range(size)
+    ])
+    models.Transfer.objects.bulk_create([
+        models.Transfer(
+            from_account=accounts[index % len(accounts)],
+            to_account=accounts[(index + 1) % len(accounts)],
+            company=company, transfer_amount=index)
+        for index in range(size)
+    ])
+
+
+def tag_operations(model, operation_ids, tags):
+    """Link every operation to two of ``tags`` in one insert"""
+    through = model.tags.through
+    field = model.tags.field.m2m_column_name()
+    links = set()
+
+    for operation_id in operation_ids:
+        for offset in range(min(len(tags), 2)):
+            tag = tags[(operation_id + offset) % len(tags)]
+            links.add((operation_id, tag.id))
+
+    through.objects.bulk_create([
+        through(**{field: operation_id, 'tag_id': tag_id})
+        for operation_id, tag_id in links
+    ])
+
+
+def seed_company(count, days, tags=0):
+    """
+    Create a company with ``count`` operations of every type spread over
+    ``days`` days back from now and refresh the planner statistics.
+
+    Used by the management commands that measure queries, they run it
+    inside a transaction rolled back afterwards.
+
+    :param tags: int, number of company tags, every action and transaction
+        is linked to two of them
+    """
+    user = get_user_model().objects.create_user(
+        username=f'seed-{uuid.uuid4().hex[:8]}')
+    company = models.Company.objects.create(company_name='Seed')
+    profile = models.Profile.objects.create(
+        user=user,
+        company=company,
+        company_identificator=company.company_id,
+        first_name='Seed',
+        last_name='Seed',
+        phone=uuid.uuid4().hex[:20],
+        is_admin=True,
+    )
+    models.Account.objects.bulk_create([
+        models.Account(profile=profile, company=company,
+                       account_name=f'Account {index}')
+        for index in range(10)
+    ])
+    accounts = list(models.Account.objects.filter(company=company))
+    category = models.Category.objects.create(
+        company=company, category_name='Seed')
+    models.Tag.objects.bulk_create([
+        models.Tag(company=company, tag_name=f'Tag {index}')
+        for index in range(tags)
+    ])
+    company_tags = list(models.Tag.objects.filter(company=company))
+
+    now = timezone.now()
+    per_day = max(count // days, 1)
+
+    for offset in range(0, count, per_day):
+        size = min(per_day, count - offset)
+        last_updated = now - datetime.timedelta(days=offset // per_day)
+        last_ids = [
+            model.objects.order_by('-id')
+            .values_list('id', flat=True).first() or 0
+            for model in OPERATION_MODELS
+        ]
+
+        create_operations(accounts, category, company, size)
+
+        for model, last_id in zip(OPERATION_MODELS, last_ids):
+            created = model.objects.filter(id__gt=last_id)
+            created.update(last_updated=last_updated)
+
+            if company_tags and model is not models.Transfer:
+                tag_operations(
+                    model,
+                    list(created.values_list('id', flat=True)),
+                    company_tags
+                )
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return company
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_auto_20231228_1249'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='company_identificator',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['company', 'last_updated'], name='account_company_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['account', 'last_updated'], name='action_account_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['company', 'last_updated'], name='category_company_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['company', 'last_updated'], name='tag_company_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'last_updated'], name='transaction_account_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['from_account', 'last_updated'], name='transfer_from_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['to_account', 'last_updated'], name='transfer_to_updated_idx'),
+        ),
+    ]
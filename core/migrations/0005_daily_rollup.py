@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('kind', models.CharField(choices=[('action', 'Action'), ('transaction', 'Transaction'), ('transfer_out', 'Outgoing transfer'), ('transfer_in', 'Incoming transfer')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Account')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.Category')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Company')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailyrollup',
+            index=models.Index(fields=['company', 'day'], name='rollup_company_day_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyrollup',
+            unique_together={('company', 'account', 'category', 'day', 'kind')},
+        ),
+    ]
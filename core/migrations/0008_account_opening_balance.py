@@ -0,0 +1,64 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:27
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def get_sums(queryset, account_field, amount_field):
+    return dict(
+        queryset.order_by()
+        .values_list(account_field)
+        .annotate(total=Sum(amount_field))
+    )
+
+
+def set_opening_balances(apps, schema_editor):
+    """
+    Start every account from the balance its operations do not explain,
+    so existing accounts reconcile until their balance drifts again.
+    """
+    Account = apps.get_model('core', 'Account')
+    Action = apps.get_model('core', 'Action')
+    Transaction = apps.get_model('core', 'Transaction')
+    Transfer = apps.get_model('core', 'Transfer')
+    LedgerEntry = apps.get_model('core', 'LedgerEntry')
+
+    parts = (
+        (get_sums(Action.objects, 'account_id', 'action_amount'), -1),
+        (get_sums(Transaction.objects, 'account_id',
+                  'transaction_amount'), 1),
+        (get_sums(Transfer.objects, 'from_account_id', 'transfer_amount'), 1),
+        (get_sums(Transfer.objects, 'to_account_id', 'transfer_amount'), -1),
+        (get_sums(LedgerEntry.objects.filter(
+            id__gt=F('account__ledger_snapshot__entry_id')),
+            'account_id', 'amount'), 1),
+    )
+    changes = {}
+
+    for sums, sign in parts:
+        for account_id, total in sums.items():
+            changes[account_id] = changes.get(account_id, 0) + total * sign
+
+    Account.objects.update(opening_balance=F('balance'))
+
+    for account_id, change in changes.items():
+        if change:
+            Account.objects.filter(id=account_id)\
+                .update(opening_balance=F('opening_balance') + change)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='opening_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.RunPython(
+            set_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_company_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companystate',
+            name='history_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_company_state_history_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companystate',
+            name='ledger_pending',
+            field=models.BooleanField(default=False),
+        ),
+    ]
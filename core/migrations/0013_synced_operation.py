@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_company_state_ledger_pending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncedOperation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=255)),
+                ('operation_type', models.CharField(max_length=20)),
+                ('operation_id', models.BigIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='synced_operations', to='core.Profile')),
+            ],
+            options={
+                'unique_together': {('profile', 'client_id')},
+            },
+        ),
+    ]
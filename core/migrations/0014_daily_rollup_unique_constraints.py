@@ -0,0 +1,52 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:01
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    """
+    Fold transfer rollups the old NULL-blind constraint let through
+    into one row per key before the new constraint is added.
+    """
+    DailyRollup = apps.get_model('core', 'DailyRollup')
+    duplicates = (
+        DailyRollup.objects.filter(category__isnull=True)
+        .order_by()
+        .values('company_id', 'account_id', 'day', 'kind')
+        .annotate(keep=Min('id'), rows=Count('id'),
+                  sum_total=Sum('total'), sum_count=Sum('count'))
+        .filter(rows__gt=1)
+    )
+
+    for row in duplicates:
+        DailyRollup.objects.filter(
+            company_id=row['company_id'], account_id=row['account_id'],
+            category__isnull=True, day=row['day'], kind=row['kind'],
+        ).exclude(id=row['keep']).delete()
+        DailyRollup.objects.filter(id=row['keep']).update(
+            total=row['sum_total'], count=row['sum_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_synced_operation'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='dailyrollup',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(category__isnull=False), fields=('company', 'account', 'category', 'day', 'kind'), name='rollup_category_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(category__isnull=True), fields=('company', 'account', 'day', 'kind'), name='rollup_no_category_unique'),
+        ),
+    ]
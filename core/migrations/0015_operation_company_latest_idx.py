@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_daily_rollup_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['company', '-last_updated', '-id'], name='action_company_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['company', '-last_updated', '-id'], name='transaction_company_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['company', '-last_updated', '-id'], name='transfer_company_latest_idx'),
+        ),
+    ]
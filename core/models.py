@@ -49,7 +49,7 @@ class Profile(models.Model):
     is_active = models.BooleanField(default=True)
 
     company_identificator = models.CharField(
-        max_length=255, null=True, blank=True)
+        max_length=255, null=True, blank=True, db_index=True)
 
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
@@ -73,13 +73,24 @@ class Account(models.Model):
 
     #  Fields
     balance = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+    # balance before the operations, with manual balance edits
+    opening_balance = models.DecimalField(
+        default=0, max_digits=20, decimal_places=2)
     account_name = models.CharField(max_length=30)
     account_color = models.CharField(max_length=30, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # balance changes are appended to LedgerEntry, balance is a projection
+    ledger_mode = models.BooleanField(default=False)
 
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'last_updated'],
+                         name='account_company_updated_idx'),
+        ]
+
     def __str__(self):
         return f'{self.account_name} (pk={self.pk})'
 
@@ -106,6 +117,14 @@ class Action(models.Model):
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'last_updated'],
+                         name='action_account_updated_idx'),
+            models.Index(fields=['company', '-last_updated', '-id'],
+                         name='action_company_latest_idx'),
+        ]
+
     def __str__(self):
         return str(self.pk)
 
@@ -129,6 +148,16 @@ class Transfer(models.Model):
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['from_account', 'last_updated'],
+                         name='transfer_from_updated_idx'),
+            models.Index(fields=['to_account', 'last_updated'],
+                         name='transfer_to_updated_idx'),
+            models.Index(fields=['company', '-last_updated', '-id'],
+                         name='transfer_company_latest_idx'),
+        ]
+
     def __str__(self):
         return str(self.pk)
 
@@ -152,6 +181,14 @@ class Transaction(models.Model):
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'last_updated'],
+                         name='transaction_account_upd_idx'),
+            models.Index(fields=['company', '-last_updated', '-id'],
+                         name='transaction_company_latest_idx'),
+        ]
+
     def __str__(self):
         return str(self.pk)
 
@@ -172,6 +209,12 @@ class Category(models.Model):
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'last_updated'],
+                         name='category_company_updated_idx'),
+        ]
+
     def __str__(self):
         return f'{self.category_name} (pk={self.pk})'
 
@@ -192,5 +235,204 @@ class Tag(models.Model):
     created = models.DateTimeField(auto_now_add=True, editable=False)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'last_updated'],
+                         name='tag_company_updated_idx'),
+        ]
+
     def __str__(self):
         return f'{self.tag_name} (pk={self.pk})'
+
+
+class DailyRollup(models.Model):
+    """Sum and count of the operations of an account for a day"""
+
+    KIND_CHOICES = (
+        ('action', 'Action'),
+        ('transaction', 'Transaction'),
+        ('transfer_out', 'Outgoing transfer'),
+        ('transfer_in', 'Incoming transfer'),
+    )
+
+    #  Relationships
+    company = models.ForeignKey(
+        'Company',
+        on_delete=models.CASCADE,
+    )
+    account = models.ForeignKey(
+        'Account',
+        on_delete=models.CASCADE,
+    )
+    category = models.ForeignKey(
+        'Category',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+    )
+
+    #  Fields
+    day = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    total = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Transfers have no category, and NULLs never collide in a
+            # unique index, so they get a constraint of their own.
+            models.UniqueConstraint(
+                fields=['company', 'account', 'category', 'day', 'kind'],
+                condition=models.Q(category__isnull=False),
+                name='rollup_category_unique'),
+            models.UniqueConstraint(
+                fields=['company', 'account', 'day', 'kind'],
+                condition=models.Q(category__isnull=True),
+                name='rollup_no_category_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'day'],
+                         name='rollup_company_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.day} (pk={self.pk})'
+
+
+class BalanceCheckpoint(models.Model):
+    """Balance of an account at the end of a closed month"""
+
+    #  Relationships
+    account = models.ForeignKey(
+        'Account',
+        related_name="checkpoints",
+        on_delete=models.CASCADE,
+    )
+
+    #  Fields
+    month = models.DateField()
+    balance = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+
+    class Meta:
+        unique_together = ('account', 'month')
+
+    def __str__(self):
+        return f'{self.account_id} {self.month} (pk={self.pk})'
+
+
+class LedgerEntry(models.Model):
+    """Immutable balance change of a ledger mode account"""
+
+    #  Relationships
+    account = models.ForeignKey(
+        'Account',
+        related_name="ledger_entries",
+        on_delete=models.CASCADE,
+    )
+
+    #  Fields
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'id'],
+                         name='ledger_account_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.account_id} {self.amount} (pk={self.pk})'
+
+
+class LedgerSnapshot(models.Model):
+    """Balance of a ledger mode account including entries up to entry_id"""
+
+    #  Relationships
+    account = models.OneToOneField(
+        'Account',
+        related_name="ledger_snapshot",
+        on_delete=models.CASCADE,
+    )
+
+    #  Fields
+    entry_id = models.BigIntegerField(default=0)
+    balance = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+
+    last_updated = models.DateTimeField(auto_now=True, editable=False)
+
+    def __str__(self):
+        return f'{self.account_id} {self.entry_id} (pk={self.pk})'
+
+
+class IdempotencyKey(models.Model):
+    """Response of a create request, replayed to retries with the same key"""
+
+    #  Relationships
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="idempotency_keys",
+        on_delete=models.CASCADE,
+    )
+
+    #  Fields
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # empty while the request is in progress
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.TextField(blank=True)
+    expires = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f'{self.key} (pk={self.pk})'
+
+
+class CompanyState(models.Model):
+    """
+    Cache versions and ledger flag of a company, kept in the database so
+    every worker process reads the same ones
+    """
+
+    #  Relationships
+    company = models.OneToOneField(
+        'Company',
+        related_name="state",
+        on_delete=models.CASCADE,
+    )
+
+    #  Fields
+    version = models.BigIntegerField(default=0)
+    # changed only when an operation is edited or deleted
+    history_version = models.BigIntegerField(default=0)
+    # ledger entries were committed since the last compaction
+    ledger_pending = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.company_id} {self.version} (pk={self.pk})'
+
+
+class SyncedOperation(models.Model):
+    """Operation created from a pushed batch item, by the item's client_id"""
+
+    #  Relationships
+    profile = models.ForeignKey(
+        'Profile',
+        related_name="synced_operations",
+        on_delete=models.CASCADE,
+    )
+
+    #  Fields
+    client_id = models.CharField(max_length=255)
+    operation_type = models.CharField(max_length=20)
+    operation_id = models.BigIntegerField()
+
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        unique_together = ('profile', 'client_id')
+
+    def __str__(self):
+        return f'{self.client_id} (pk={self.pk})'
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import decimal
+import json
+
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.pagination import LimitOffsetPagination
+
+from core.services import OPERATION_TYPES, STATEMENT_LEGS
+
+
+class TeamListPagination(LimitOffsetPagination):
+    default_limit = 50
+    max_limit = 500
+
+
+class OperationCursor:
+    """
+    Opaque position in an operation list ordered newest first.
+
+    A cursor encodes ``(last_updated, type, id)`` of the last operation
+    of a page, the next page starts right after it.
+    """
+
+    @staticmethod
+    def encode(last_updated, operation_type, operation_id):
+        position = [last_updated.isoformat(), operation_type, operation_id]
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def decode(cursor):
+        """
+        Return ``(last_updated, type, id)`` encoded in ``cursor``.
+
+        :raises ValueError: if the cursor is malformed
+        """
+        try:
+            last_updated, operation_type, operation_id = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()))
+            last_updated = parse_datetime(last_updated)
+        except (TypeError, ValueError, binascii.Error):
+            raise ValueError('Неверный курсор')
+
+        if last_updated is None or \
+                operation_type not in OPERATION_TYPES or \
+                not isinstance(operation_id, int):
+            raise ValueError('Неверный курсор')
+
+        return last_updated, operation_type, operation_id
+
+
+class StatementCursor:
+    """
+    Opaque position in an account statement ordered newest first.
+
+    A cursor encodes ``(last_updated, type, id)`` of the last leg of a
+    page and the account balance before it, the running balance of the
+    next page starts from there.
+    """
+
+    @staticmethod
+    def encode(last_updated, leg, operation_id, balance):
+        position = [last_updated.isoformat(), leg, operation_id, str(balance)]
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def decode(cursor):
+        """
+        Return ``(last_updated, type, id, balance)`` encoded in ``cursor``.
+
+        :raises ValueError: if the cursor is malformed
+        """
+        try:
+            last_updated, leg, operation_id, balance = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()))
+            last_updated = parse_datetime(last_updated)
+            balance = decimal.Decimal(balance)
+        except (TypeError, ValueError, binascii.Error,
+                decimal.InvalidOperation):
+            raise ValueError('Неверный курсор')
+
+        if last_updated is None or \
+                leg not in STATEMENT_LEGS or \
+                not isinstance(operation_id, int) or \
+                not balance.is_finite():
+            raise ValueError('Неверный курсор')
+
+        return last_updated, leg, operation_id, balance
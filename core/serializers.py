@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from . import models
+from .services import change_balances
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -55,6 +56,18 @@ class AccountSerializer(serializers.ModelSerializer):
             'id', 'profile', 'is_active',
         ]
 
+    def update(self, instance, validated_data):
+        """
+        Save only the given fields, balances changed meanwhile by
+        ``change_balances`` or ``compact_ledger`` are kept.
+        """
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+
+        instance.save(update_fields=[*validated_data, 'last_updated'])
+
+        return instance
+
 
 class CompanySerializer(serializers.ModelSerializer):
     profiles = ProfileSerializer(
@@ -117,12 +130,12 @@ class ActionSerializer(serializers.ModelSerializer):
         ]
 
     def create(self, validated_data):
+        action = super(ActionSerializer, self).create(validated_data)
+        change_balances(action.company_id, {
+            action.account_id: action.action_amount,
+        })
 
-        validated_data['account'].balance\
-            += validated_data['action_amount']
-        validated_data['account'].save()
-
-        return super(ActionSerializer, self).create(validated_data)
+        return action
 
 
 class TransferSerializer(serializers.ModelSerializer):
@@ -136,18 +149,22 @@ class TransferSerializer(serializers.ModelSerializer):
     to_account = serializers.CharField()
 
     def validate(self, data):
-        try:
-            data['from_account'] = models.Account.objects.get(
-                pk=data['from_account'])
-        except Exception as e:
-            print(e)
+        from_id, to_id = (
+            int(data[field]) if data[field].isdigit() else None
+            for field in ('from_account', 'to_account')
+        )
+        accounts = models.Account.objects\
+            .select_related('profile__user', 'profile__company')\
+            .in_bulk([from_id, to_id])
+        data['from_account'] = accounts.get(from_id)
+
+        if data['from_account'] is None:
             raise serializers.ValidationError(
                 'Счет отправителя не найден')
-        try:
-            data['to_account'] = models.Account.objects.get(
-                pk=data['to_account'])
-        except Exception as e:
-            print(e)
+
+        data['to_account'] = accounts.get(to_id)
+
+        if data['to_account'] is None:
             raise serializers.ValidationError(
                 'Счет получателя не найден')
         return data
@@ -0,0 +1,11 @@
+from .main import *
+from .operations import *
+from .balances import *
+from .totals import *
+from .reports import *
+from .rollups import *
+from .statements import *
+from .checkpoints import *
+from .imports import *
+from .ledger import *
+from .reconcile import *
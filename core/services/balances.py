@@ -0,0 +1,228 @@
+import datetime
+import decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.timezone import is_naive, make_aware, utc
+
+from core import models
+from core.cache import bump_company_version
+from core.services.ledger import append_ledger_entries
+
+
+def get_team_balances(company):
+    """
+    Return profiles of ``company`` annotated with ``balance_sum``,
+    the total balance of their accounts.
+
+    All sums are computed by one GROUP BY query however many profiles
+    the company has.
+    """
+    return company.profiles\
+        .annotate(balance_sum=Coalesce(Sum('accounts__balance'), 0))\
+        .order_by('id')
+
+
+def change_balances(company_id, changes):
+    """
+    Add signed amounts to account balances.
+
+    Every account is changed by one ``UPDATE ... SET balance = balance +
+    %s`` computed by the database, so concurrent writers never lose an
+    update. Changes of ledger mode accounts, matched by no UPDATE, are
+    appended as ledger entries instead. Updates send no signals, so
+    ``last_updated`` is set and the cached responses of the company are
+    invalidated here. Must run in the transaction writing the operations.
+
+    :param company_id: id of the Company owning the accounts
+    :param changes: dict ``{account_id: amount}``
+    """
+    now = timezone.now()
+    entries = {}
+
+    # ascending ids, so writers of the same accounts lock them in order
+    for account_id, amount in sorted(changes.items()):
+        if amount and not models.Account.objects\
+                .filter(id=account_id, ledger_mode=False)\
+                .update(balance=F('balance') + amount, last_updated=now):
+            entries[account_id] = amount
+
+    if entries:
+        append_ledger_entries(company_id, entries)
+
+    bump_company_version(company_id)
+
+
+def adjust_balance(account, change):
+    """
+    Apply a manual balance edit. It is added to the opening balance too,
+    so the balance still reconciles with the operations, and to every
+    balance checkpoint, as it moves the whole history of the account.
+    Must run in the transaction saving the edit.
+    """
+    models.Account.objects.filter(id=account.id)\
+        .update(opening_balance=F('opening_balance') + change)
+    models.BalanceCheckpoint.objects.filter(account_id=account.id)\
+        .update(balance=F('balance') + change)
+    change_balances(account.company_id, {account.id: change})
+
+
+def to_amount(value):
+    """Return a database sum as Decimal, SQLite returns floats"""
+    if not isinstance(value, decimal.Decimal):
+        value = decimal.Decimal(str(value))
+
+    return value.quantize(decimal.Decimal('0.01'))
+
+
+def to_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+
+    return value
+
+
+def to_datetime(value):
+    """Return a datetime read by raw SQL, SQLite returns naive strings"""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+
+    if settings.USE_TZ and is_naive(value):
+        value = make_aware(value, utc)
+
+    return value
+
+
+def get_delta_part(queryset, account_field, amount_field, sign):
+    """
+    Return ``queryset`` grouped into ``(delta_account, day, delta)`` rows,
+    the change of the account balance made by the operations of a day.
+    """
+    return queryset.order_by()\
+        .annotate(delta_account=F(account_field),
+                  day=TruncDate('last_updated'))\
+        .values('delta_account', 'day')\
+        .annotate(delta=Sum(amount_field) * sign)
+
+
+def get_balance_deltas(accounts, start, end=None):
+    """
+    Return one UNION ALL queryset of daily balance changes of ``accounts``
+    made by the operations since ``start`` and before ``end`` if given.
+    """
+    parts = (
+        (models.Action.objects.filter(account__in=accounts),
+         'account_id', 'action_amount', 1),
+        (models.Transaction.objects.filter(account__in=accounts),
+         'account_id', 'transaction_amount', -1),
+        (models.Transfer.objects.filter(from_account__in=accounts),
+         'from_account_id', 'transfer_amount', -1),
+        (models.Transfer.objects.filter(to_account__in=accounts),
+         'to_account_id', 'transfer_amount', 1),
+    )
+    deltas = [
+        get_delta_part(
+            queryset.filter(last_updated__gte=start, last_updated__lt=end)
+            if end else queryset.filter(last_updated__gte=start),
+            *fields
+        )
+        for queryset, *fields in parts
+    ]
+
+    return deltas[0].union(*deltas[1:], all=True)
+
+
+def get_closing_balances(accounts, start):
+    """
+    Return ``{account_id: [(day, change, balance), ...]}`` of the days
+    with operations since ``start``, oldest first, where ``balance`` is
+    the closing balance of the day.
+
+    Balances are computed back from the current ``Account.balance`` by a
+    running sum window over the daily changes, newest day first, so the
+    whole history is one query.
+
+    :param accounts: Account queryset or list of ids
+    :param start: aware datetime, first moment of the first day
+    """
+    sql, params = get_balance_deltas(accounts, start).query.sql_with_params()
+    query = f'''
+        SELECT deltas.delta_account, deltas.day, SUM(deltas.delta),
+               account.balance + SUM(deltas.delta) - SUM(SUM(deltas.delta))
+               OVER (PARTITION BY deltas.delta_account
+                     ORDER BY deltas.day DESC)
+        FROM ({sql}) deltas
+        INNER JOIN {models.Account._meta.db_table} account
+            ON account.id = deltas.delta_account
+        GROUP BY deltas.delta_account, deltas.day, account.balance
+        ORDER BY deltas.delta_account, deltas.day
+    '''
+    balances = {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+
+        for account_id, day, change, balance in cursor.fetchall():
+            balances.setdefault(account_id, []).append(
+                (to_date(day), to_amount(change), to_amount(balance)))
+
+    return balances
+
+
+def get_balance_history(accounts, start_day, end_day):
+    """
+    Return closing balances of ``accounts`` for every day of a range.
+
+    :param accounts: list of Account instances
+    :param start_day: date, first day in the current time zone
+    :param end_day: date, last day
+    :return: list of days and ``{account_id: [balance, ...]}`` with a
+        balance for every day
+    """
+    days = [
+        start_day + datetime.timedelta(days=offset)
+        for offset in range((end_day - start_day).days + 1)
+    ]
+    start = make_aware(datetime.datetime.combine(start_day, datetime.time()))
+    closing = get_closing_balances(
+        [account.id for account in accounts], start) if accounts else {}
+    history = {}
+
+    for account in accounts:
+        rows = closing.get(account.id, [])
+        balance = rows[0][2] - rows[0][1] if rows \
+            else to_amount(account.balance)
+        index = 0
+        balances = []
+
+        for day in days:
+            while index < len(rows) and rows[index][0] <= day:
+                balance = rows[index][2]
+                index += 1
+
+            balances.append(balance)
+
+        history[account.id] = balances
+
+    return days, history
+
+
+def get_balance_changes(accounts, start, end=None):
+    """
+    Return ``{account_id: change}``, the sum of balance changes made by
+    operations since ``start`` and before ``end`` if given.
+    """
+    changes = {}
+
+    for row in get_balance_deltas(accounts, start, end):
+        changes[row['delta_account']] = \
+            changes.get(row['delta_account'], 0) + row['delta']
+
+    return {
+        account_id: to_amount(change)
+        for account_id, change in changes.items()
+    }
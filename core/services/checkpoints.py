@@ -0,0 +1,208 @@
+import datetime
+
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils.timezone import localdate, make_aware
+
+from core import models
+from core.services.balances import get_balance_changes, \
+    get_closing_balances, to_amount
+from core.services.ledger import compact_ledger
+from core.services.reports import get_next_month, iter_months
+
+
+# operation type -> ((account field, amount field, sign), ...)
+CHECKPOINT_LEGS = {
+    'action': (('account_id', 'action_amount', 1),),
+    'transaction': (('account_id', 'transaction_amount', -1),),
+    'transfer': (('from_account_id', 'transfer_amount', -1),
+                 ('to_account_id', 'transfer_amount', 1)),
+}
+
+
+def get_day_start(day):
+    """Return the first moment of ``day`` in the current time zone"""
+    return make_aware(datetime.datetime.combine(day, datetime.time()))
+
+
+def get_closed_month(day=None):
+    """Return the first day of the last closed month"""
+    day = day or localdate()
+
+    return (day.replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+
+
+def get_checkpoint_changes(operation_type, instance):
+    """Yield ``(account_id, month, change)`` of the operation balances"""
+    month = localdate(instance.last_updated).replace(day=1)
+
+    for account_field, amount_field, sign in \
+            CHECKPOINT_LEGS[operation_type]:
+        yield getattr(instance, account_field), month, \
+            getattr(instance, amount_field) * sign
+
+
+def shift_checkpoints(account_id, month, change):
+    """Add ``change`` to the checkpoints of ``month`` and later months"""
+    models.BalanceCheckpoint.objects.filter(
+        account_id=account_id,
+        month__gte=month
+    ).update(balance=F('balance') + change)
+
+
+def update_checkpoints(operation_type, instance, sign=1):
+    """
+    Apply an operation to the checkpoints of the months closed since it
+    or revert it with ``sign=-1``.
+
+    Operations of the current month have no checkpoints yet, so usual
+    writes run one UPDATE matching nothing. Must run in the database
+    transaction creating or deleting the operation.
+    """
+    for account_id, month, change in \
+            get_checkpoint_changes(operation_type, instance):
+        shift_checkpoints(account_id, month, change * sign)
+
+
+def add_many_to_checkpoints(operation_type, instances):
+    """
+    Apply new operations to the checkpoints with one UPDATE per account
+    and closed month they belong to.
+
+    Must run in the database transaction creating the operations.
+    """
+    current_month = localdate().replace(day=1)
+    changes = {}
+
+    for instance in instances:
+        for account_id, month, change in \
+                get_checkpoint_changes(operation_type, instance):
+            if month < current_month:
+                changes[account_id, month] = \
+                    changes.get((account_id, month), 0) + change
+
+    for (account_id, month), change in changes.items():
+        shift_checkpoints(account_id, month, change)
+
+
+def rebuild_checkpoints(accounts, months=None):
+    """
+    Recompute checkpoints of closed months from the operations.
+
+    :param accounts: Account queryset
+    :param months: int, number of the latest closed months to rebuild,
+        all months since the account creation if None
+    :return: int, number of checkpoints created
+    """
+    compact_ledger(accounts)
+    accounts = list(accounts.order_by('id'))
+    last_month = get_closed_month()
+
+    if not accounts:
+        return 0
+
+    if months is None:
+        first_month = min(
+            localdate(account.created) for account in accounts
+        ).replace(day=1)
+    else:
+        first_month = last_month
+
+        for index in range(months - 1):
+            first_month = get_closed_month(first_month)
+
+    closed_months = list(iter_months(first_month, last_month))
+
+    if not closed_months:
+        return 0
+
+    closing = get_closing_balances(
+        [account.id for account in accounts], get_day_start(first_month))
+    checkpoints = []
+
+    for account in accounts:
+        rows = closing.get(account.id, [])
+        balance = rows[0][2] - rows[0][1] if rows \
+            else to_amount(account.balance)
+        created_month = localdate(account.created).replace(day=1)
+        index = 0
+
+        for month in closed_months:
+            next_month = get_next_month(month)
+
+            while index < len(rows) and rows[index][0] < next_month:
+                balance = rows[index][2]
+                index += 1
+
+            if month >= created_month:
+                checkpoints.append(models.BalanceCheckpoint(
+                    account=account, month=month, balance=balance))
+
+    models.BalanceCheckpoint.objects.filter(
+        account__in=accounts, month__gte=first_month).delete()
+
+    return len(models.BalanceCheckpoint.objects.bulk_create(checkpoints))
+
+
+def get_balances_as_of(accounts, day):
+    """
+    Return ``{account_id: balance}`` of ``accounts`` at the end of ``day``.
+
+    Every balance starts from the nearest checkpoint, the end of the month
+    of ``day`` or the latest month before it, and adds or subtracts the
+    changes between the checkpoint and ``day``, so at most about a month
+    of operations is read. Accounts without checkpoints are computed back
+    from the current balance.
+
+    :param accounts: list of Account instances
+    :param day: date in the current time zone
+    :return: dict of Decimal balances
+    """
+    month = day.replace(day=1)
+    end = get_day_start(day + datetime.timedelta(days=1))
+    account_ids = [account.id for account in accounts]
+    previous = models.BalanceCheckpoint.objects\
+        .filter(account=OuterRef('account'), month__lt=month)\
+        .order_by('-month')\
+        .values('month')[:1]
+    checkpoints = {}
+
+    for checkpoint in models.BalanceCheckpoint.objects\
+            .filter(account_id__in=account_ids)\
+            .filter(Q(month=month) | Q(month=Subquery(previous)))\
+            .order_by('month'):
+        checkpoints.setdefault(checkpoint.account_id, []).append(checkpoint)
+
+    # (start, end, sign) of the changes -> [(account_id, base balance)]
+    plans = {}
+
+    for account in accounts:
+        base, plan = to_amount(account.balance), (end, None, -1)
+        distance = None
+
+        for checkpoint in checkpoints.get(account.id, []):
+            checkpoint_end = get_next_month(checkpoint.month)
+            days = abs((checkpoint_end - day).days)
+
+            if distance is not None and days >= distance:
+                continue
+
+            if checkpoint.month == month:
+                candidate = (end, get_day_start(checkpoint_end), -1)
+            else:
+                candidate = (get_day_start(checkpoint_end), end, 1)
+
+            base, plan, distance = checkpoint.balance, candidate, days
+
+        plans.setdefault(plan, []).append((account.id, base))
+
+    balances = {}
+
+    for (start, stop, sign), bases in plans.items():
+        changes = get_balance_changes(
+            [account_id for account_id, base in bases], start, stop)
+
+        for account_id, base in bases:
+            balances[account_id] = to_amount(
+                base + changes.get(account_id, 0) * sign)
+
+    return balances
@@ -0,0 +1,454 @@
+import csv
+import datetime
+import decimal
+import io
+import json
+
+from itertools import islice
+
+from dateutil import parser
+
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core import models
+from core.cache import bump_company_version, bump_history_version
+from core.services.balances import change_balances
+from core.services.checkpoints import add_many_to_checkpoints
+from core.services.rollups import add_many_to_rollups
+
+
+IMPORT_MODELS = {
+    'action': models.Action,
+    'transaction': models.Transaction,
+}
+
+
+def read_import_rows(file, file_name):
+    """
+    Return an iterator of row dicts of a CSV or JSON file.
+
+    CSV files are read row by row, JSON files hold a list of objects.
+    Columns are ``type``, ``account``, ``category``, ``amount`` and the
+    optional ``tags``, comma separated ids, and ``last_updated``.
+    """
+    if file_name.lower().endswith('.json'):
+        try:
+            rows = json.load(file)
+        except ValueError:
+            raise ValueError('Неверный формат файла')
+
+        if not isinstance(rows, list):
+            raise ValueError('Неверный формат файла')
+
+        return iter(rows)
+
+    if file_name.lower().endswith('.csv'):
+        return iter_csv_rows(io.TextIOWrapper(file, encoding='utf-8-sig'))
+
+    raise ValueError('Неверный формат файла')
+
+
+def iter_csv_rows(text):
+    try:
+        yield from csv.DictReader(text)
+    except (csv.Error, UnicodeDecodeError):
+        raise ValueError('Неверный формат файла')
+
+
+def to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_row_tag_ids(row):
+    """Return tag ids of a row given as a list or comma separated ids"""
+    row_tags = row.get('tags') or []
+
+    if isinstance(row_tags, str):
+        row_tags = [tag for tag in row_tags.split(",") if tag.strip()]
+
+    if not isinstance(row_tags, list):
+        raise ValueError('Указанный тег не найден')
+
+    return list(dict.fromkeys(to_id(tag) for tag in row_tags))
+
+
+def get_allowed_ids(profile, rows=None):
+    """
+    Return sets of the account, category and tag ids rows of ``profile``
+    may use.
+
+    :param rows: list of row dicts, if given only the ids they reference
+        are read, with one IN query per model
+    """
+    accounts = models.Account.objects\
+        .filter(profile=profile, company=profile.company)
+    categories = models.Category.objects.filter(company=profile.company)
+    tags = models.Tag.objects.filter(company=profile.company)
+
+    if rows is not None:
+        rows = [row for row in rows if isinstance(row, dict)]
+        row_tags = set()
+
+        for row in rows:
+            try:
+                row_tags.update(get_row_tag_ids(row))
+            except ValueError:
+                pass
+
+        accounts = accounts.filter(
+            id__in={to_id(row.get('account')) for row in rows} - {None})
+        categories = categories.filter(
+            id__in={to_id(row.get('category')) for row in rows} - {None})
+        tags = tags.filter(id__in=row_tags - {None})
+
+    return (
+        set(accounts.values_list('id', flat=True)),
+        set(categories.values_list('id', flat=True)),
+        set(tags.values_list('id', flat=True)),
+    )
+
+
+def parse_import_date(value):
+    """Parse ISO dates without dateutil, which is slow on large files"""
+    try:
+        last_updated = parse_datetime(value)
+
+        if last_updated is None:
+            day = parse_date(value)
+            last_updated = datetime.datetime.combine(day, datetime.time()) \
+                if day else parser.parse(value)
+    except (ValueError, OverflowError):
+        raise ValueError('Неверная дата операции')
+
+    return last_updated
+
+
+def clean_import_row(row, company, accounts, categories, tags):
+    """
+    Return ``(type, instance, tag_ids)`` of a row, raise ValueError with
+    the reason if the row is invalid.
+
+    :param accounts: set of Account ids the rows may use
+    :param categories: set of Category ids of the company
+    :param tags: set of Tag ids of the company
+    """
+    if not isinstance(row, dict):
+        raise ValueError('Некорректные данные')
+
+    operation_type = row.get('type')
+
+    if operation_type not in IMPORT_MODELS:
+        raise ValueError('Неверный тип операции')
+
+    try:
+        amount = decimal.Decimal(str(row.get('amount')).strip())
+    except decimal.InvalidOperation:
+        raise ValueError('Неверная сумма операции')
+
+    if not amount.is_finite() or amount.as_tuple().exponent < -2 or \
+            abs(amount) >= 10 ** 18:
+        raise ValueError('Неверная сумма операции')
+
+    if amount < 0:
+        raise ValueError('Сумма операции должна быть положительной')
+
+    account_id = to_id(row.get('account'))
+
+    if account_id not in accounts:
+        raise ValueError('Указанный счет не найден')
+
+    category_id = to_id(row.get('category'))
+
+    if category_id not in categories:
+        raise ValueError('Указанная категория не найдена')
+
+    tag_ids = get_row_tag_ids(row)
+
+    for tag_id in tag_ids:
+        if tag_id not in tags:
+            raise ValueError('Указанный тег не найден')
+
+    last_updated = None
+
+    if row.get('last_updated'):
+        last_updated = parse_import_date(str(row['last_updated']))
+
+        if timezone.is_naive(last_updated):
+            last_updated = timezone.make_aware(last_updated)
+
+    instance = IMPORT_MODELS[operation_type](
+        company=company,
+        account_id=account_id,
+        category_id=category_id,
+        **{f'{operation_type}_amount': amount}
+    )
+    instance.last_updated = last_updated
+
+    return operation_type, instance, tag_ids
+
+
+def insert_operations(model, instances):
+    """
+    Insert ``instances`` with one batched INSERT and set their ids.
+
+    Backends that can not return ids from a bulk insert read them back
+    as the ids above the largest one before the insert, which relies on
+    the caller's transaction serializing writers, as SQLite does.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        return model.objects.bulk_create(instances)
+
+    last_id = model.objects.order_by('-id')\
+        .values_list('id', flat=True).first() or 0
+    model.objects.bulk_create(instances)
+    ids = model.objects.filter(id__gt=last_id).order_by('id')\
+        .values_list('id', flat=True)
+
+    for instance, instance_id in zip(instances, ids):
+        instance.id = instance_id
+
+    return instances
+
+
+def save_import_chunk(company, operations):
+    """
+    Create a chunk of cleaned operations in the current transaction.
+
+    Operations and their tag links are inserted in batches, balances
+    change with one UPDATE per account, rollups and checkpoints are
+    updated once per rollup and closed month.
+    """
+    balances = {}
+
+    for operation_type, model in IMPORT_MODELS.items():
+        typed = [
+            (instance, tag_ids)
+            for item_type, instance, tag_ids in operations
+            if item_type == operation_type
+        ]
+
+        if not typed:
+            continue
+
+        dates = {
+            index: instance.last_updated
+            for index, (instance, tag_ids) in enumerate(typed)
+            if instance.last_updated is not None
+        }
+        instances = insert_operations(
+            model, [instance for instance, tag_ids in typed])
+
+        # last_updated is auto_now, so imported dates are set afterwards
+        # by one UPDATE of the chunk
+        for index, last_updated in dates.items():
+            instances[index].last_updated = last_updated
+
+        if dates:
+            model.objects\
+                .filter(id__in=[instances[index].id for index in dates])\
+                .update(last_updated=Case(
+                    *(When(id=instances[index].id, then=Value(last_updated))
+                      for index, last_updated in dates.items()),
+                    output_field=DateTimeField()
+                ))
+
+        through = model.tags.through
+        through.objects.bulk_create([
+            through(**{f'{operation_type}_id': instance.id, 'tag_id': tag_id})
+            for instance, (item, tag_ids) in zip(instances, typed)
+            for tag_id in tag_ids
+        ])
+
+        sign = 1 if operation_type == 'action' else -1
+        amount_field = f'{operation_type}_amount'
+
+        for instance in instances:
+            balances[instance.account_id] = \
+                balances.get(instance.account_id, 0) + \
+                getattr(instance, amount_field) * sign
+
+        add_many_to_rollups(operation_type, instances)
+        add_many_to_checkpoints(operation_type, instances)
+
+    change_balances(company.id, balances)
+
+    return len(operations)
+
+
+def bump_import_versions(company_id, operations):
+    """
+    Invalidate cached responses of the company after saving operations,
+    bulk inserts and updates send no signals. Cached reports of past
+    months are invalidated only if an operation belongs to one.
+    """
+    bump_company_version(company_id)
+    current_month = timezone.localdate().replace(day=1)
+
+    if any(timezone.localdate(instance.last_updated) < current_month
+           for operation_type, instance, tag_ids in operations):
+        bump_history_version(company_id)
+
+
+def import_operations(profile, rows, chunk_size=1000):
+    """
+    Create actions and transactions of ``profile`` from row dicts.
+
+    Rows are validated and saved ``chunk_size`` at a time, every chunk in
+    its own transaction. Invalid rows are skipped and reported.
+
+    :param profile: Profile instance, rows may use only its accounts
+    :param rows: iterable of row dicts, see ``read_import_rows``
+    :return: dict with ``created``, the number of created operations, and
+        ``errors``, a list of ``{'row': number, 'detail': reason}``
+    """
+    company = profile.company
+    accounts, categories, tags = get_allowed_ids(profile)
+    rows = enumerate(rows, start=1)
+    created = 0
+    errors = []
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+
+        if not chunk:
+            break
+
+        operations = []
+
+        for number, row in chunk:
+            try:
+                operations.append(clean_import_row(
+                    row, company, accounts, categories, tags))
+            except ValueError as e:
+                errors.append({'row': number, 'detail': str(e)})
+
+        if not operations:
+            continue
+
+        with transaction.atomic():
+            created += save_import_chunk(company, operations)
+
+        bump_import_versions(company.id, operations)
+
+    return {
+        'created': created,
+        'errors': errors,
+    }
+
+
+def clean_client_id(client_id, client_ids):
+    """
+    Return ``client_id`` of a batch item as a string.
+
+    :param client_ids: set of the client ids of the previous items
+    """
+    if not isinstance(client_id, (str, int)) or isinstance(client_id, bool):
+        raise ValueError('Неверный идентификатор операции')
+
+    client_id = str(client_id)
+
+    if not client_id or len(client_id) > 255 or client_id in client_ids:
+        raise ValueError('Неверный идентификатор операции')
+
+    return client_id
+
+
+def create_operation_batch(profile, items):
+    """
+    Create a batch of actions and transactions pushed by a client.
+
+    Items are rows as in ``import_operations`` with a ``client_id``
+    unique in the batch. Client ids are kept per profile, items synced by
+    an earlier batch are reported as existing and not created again, a
+    lock on the profile row makes a retry wait for the batch in flight.
+    References of all items are checked with one query per model and
+    valid items are saved in one transaction with one balance update per
+    account.
+
+    :param profile: Profile instance, items may use only its accounts
+    :param items: list of item dicts
+    :return: list of results in the order of ``items``, either
+        ``{'client_id', 'status': 'created' or 'exists', 'type', 'id'}``
+        or ``{'client_id', 'status': 'error', 'detail'}``
+    """
+    client_ids = set()
+    operations = []
+    results = []
+
+    with transaction.atomic():
+        list(models.Profile.objects.select_for_update()
+             .filter(id=profile.id).values_list('id', flat=True))
+        synced = {
+            client_id: (operation_type, operation_id)
+            for client_id, operation_type, operation_id
+            in models.SyncedOperation.objects.filter(
+                profile=profile,
+                client_id__in={
+                    str(item.get('client_id')) for item in items
+                    if isinstance(item, dict)
+                }
+            ).values_list('client_id', 'operation_type', 'operation_id')
+        }
+        accounts, categories, tags = get_allowed_ids(profile, items)
+
+        for item in items:
+            client_id = item.get('client_id') if isinstance(item, dict) \
+                else None
+
+            try:
+                key = clean_client_id(client_id, client_ids)
+                client_ids.add(key)
+
+                if key in synced:
+                    results.append({
+                        'client_id': client_id,
+                        'status': 'exists',
+                        'type': synced[key][0],
+                        'id': synced[key][1],
+                    })
+                    continue
+
+                operation = clean_import_row(
+                    item, profile.company, accounts, categories, tags)
+            except ValueError as e:
+                results.append({
+                    'client_id': client_id,
+                    'status': 'error',
+                    'detail': str(e),
+                })
+                continue
+
+            operations.append(operation)
+            results.append({
+                'client_id': client_id,
+                'status': 'created',
+                'type': operation[0],
+                'instance': operation[1],
+            })
+
+        if operations:
+            save_import_chunk(profile.company, operations)
+            models.SyncedOperation.objects.bulk_create([
+                models.SyncedOperation(
+                    profile=profile,
+                    client_id=str(result['client_id']),
+                    operation_type=result['type'],
+                    operation_id=result['instance'].id,
+                )
+                for result in results if 'instance' in result
+            ])
+
+    if operations:
+        bump_import_versions(profile.company_id, operations)
+
+    for result in results:
+        if 'instance' in result:
+            result['id'] = result.pop('instance').id
+
+    return results
@@ -0,0 +1,154 @@
+from django.db import connection, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from core import models
+from core.cache import bump_company_version, mark_ledger_pending, \
+    take_ledger_pending
+
+
+def share_lock_accounts(account_ids):
+    """
+    Lock the accounts FOR KEY SHARE until the transaction ends.
+
+    Foreign keys are created DEFERRABLE INITIALLY DEFERRED, so inserting
+    an entry locks its account only at COMMIT. Taken before the entry ids
+    are drawn, the lock makes ``compact_ledger`` wait for every entry
+    numbered below the ones it can see. SQLite serializes writers anyway.
+    """
+    if connection.vendor != 'postgresql':
+        return
+
+    account_ids = sorted(account_ids)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {models.Account._meta.db_table} '
+            f'WHERE id IN ({", ".join(["%s"] * len(account_ids))}) '
+            f'ORDER BY id FOR KEY SHARE',
+            account_ids
+        )
+
+
+def append_ledger_entries(company_id, changes):
+    """
+    Append balance changes of ledger mode accounts as ledger entries.
+
+    Writers insert rows only, the account rows are changed later by
+    ``compact_ledger``. Must run in the transaction writing the operations.
+
+    :param changes: dict ``{account_id: amount}``
+    """
+    share_lock_accounts(changes)
+    models.LedgerEntry.objects.bulk_create([
+        models.LedgerEntry(account_id=account_id, amount=amount)
+        for account_id, amount in sorted(changes.items())
+    ])
+    mark_ledger_pending(company_id)
+
+
+def compact_ledger(accounts):
+    """
+    Fold ledger entries newer than the snapshots of ``accounts`` into the
+    snapshots and the ``Account.balance`` projection.
+
+    Accounts are locked by SELECT ... FOR UPDATE first. Writers hold FOR
+    KEY SHARE on the accounts from before their entries are numbered until
+    they commit, see ``share_lock_accounts``, so the lock waits for writers
+    with uncommitted entries and holds back new ones until the snapshots
+    are saved, an entry committed out of id order is never skipped.
+
+    :param accounts: Account queryset
+    :return: int, number of accounts whose snapshot advanced
+    """
+    with transaction.atomic():
+        locked = dict(
+            accounts.filter(ledger_snapshot__isnull=False)
+            .select_for_update()
+            .order_by('id')
+            .values_list('id', 'company_id')
+        )
+
+        if not locked:
+            return 0
+
+        pending = list(
+            models.LedgerEntry.objects
+            .filter(account_id__in=locked,
+                    id__gt=F('account__ledger_snapshot__entry_id'))
+            .values('account_id')
+            .annotate(change=Sum('amount'), last_entry=Max('id'))
+            .order_by('account_id')
+        )
+        now = timezone.now()
+
+        for row in pending:
+            models.LedgerSnapshot.objects\
+                .filter(account_id=row['account_id'])\
+                .update(entry_id=row['last_entry'],
+                        balance=F('balance') + row['change'],
+                        last_updated=now)
+            models.Account.objects.filter(id=row['account_id'])\
+                .update(balance=F('balance') + row['change'],
+                        last_updated=now)
+
+    for company_id in {locked[row['account_id']] for row in pending}:
+        bump_company_version(company_id)
+
+    return len(pending)
+
+
+def refresh_ledger_balances(company_id):
+    """
+    Compact the ledger of the company if writers appended entries since
+    the last refresh, call before reading balances of its accounts.
+
+    Companies without pending entries cost one UPDATE matching no row.
+    The flag is shared by every worker process, see
+    ``CompanyState.ledger_pending``, and cleared in the compaction
+    transaction, so a failed compaction leaves it set. Inside an outer
+    transaction no savepoint is made, the outer one is rolled back then.
+    """
+    if company_id is None:
+        return 0
+
+    with transaction.atomic(savepoint=False):
+        if not take_ledger_pending(company_id):
+            return 0
+
+        return compact_ledger(
+            models.Account.objects.filter(company_id=company_id))
+
+
+def set_ledger_mode(accounts, enabled=True):
+    """
+    Switch ``accounts`` to or from ledger mode.
+
+    Enabled accounts start from a snapshot of their current balance.
+    Disabled accounts keep their snapshot, so entries of writers that
+    still saw them in ledger mode are folded by the next compaction.
+
+    :param accounts: Account queryset
+    :return: int, number of accounts switched
+    """
+    with transaction.atomic():
+        compact_ledger(accounts)
+        switched = list(
+            accounts.filter(ledger_mode=not enabled)
+            .select_for_update()
+            .order_by('id')
+        )
+
+        if enabled:
+            for account in switched:
+                models.LedgerSnapshot.objects.update_or_create(
+                    account=account, defaults={'balance': account.balance})
+
+        models.Account.objects\
+            .filter(id__in=[account.id for account in switched])\
+            .update(ledger_mode=enabled)
+
+    for company_id in {account.company_id for account in switched}:
+        bump_company_version(company_id)
+
+    return len(switched)
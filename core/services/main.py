@@ -0,0 +1,99 @@
+from django.db import OperationalError, connection, transaction
+from dateutil.parser import parse
+
+from core import models
+from core.services.balances import change_balances
+from core.services.checkpoints import update_checkpoints
+from core.services.rollups import update_rollups
+
+
+# serialization_failure and deadlock_detected, safe to run again
+RETRY_PGCODES = ('40001', '40P01')
+
+
+def is_retryable(error):
+    """Return whether a database error aborted a transaction worth retrying"""
+    return getattr(error.__cause__, 'pgcode', None) in RETRY_PGCODES
+
+
+def apply_transfer(profile, from_account_id, to_account_id,
+                   transfer_amount):
+    """
+    Create a transfer in the current transaction.
+
+    Both accounts are validated and locked by one SELECT ... FOR UPDATE
+    ordered by id, so transfers crossing the same accounts in opposite
+    directions wait for each other instead of deadlocking.
+    """
+    accounts = {
+        account.id: account
+        for account in models.Account.objects
+        .select_for_update()
+        .filter(id__in=(from_account_id, to_account_id),
+                company_id=profile.company_id)
+        .order_by('id')
+    }
+    from_account = accounts.get(from_account_id)
+
+    if from_account is None or from_account.profile_id != profile.id:
+        raise ValueError('Указанный счет не найден')
+
+    if to_account_id not in accounts:
+        raise ValueError('To_account is not in your company!')
+
+    transfer = models.Transfer.objects.create(
+        from_account_id=from_account_id,
+        to_account_id=to_account_id,
+        company_id=profile.company_id,
+        transfer_amount=transfer_amount,
+    )
+    change_balances(profile.company_id, {
+        from_account_id: -transfer.transfer_amount,
+        to_account_id: transfer.transfer_amount,
+    })
+    update_rollups('transfer', transfer)
+    update_checkpoints('transfer', transfer)
+
+    return transfer
+
+
+def make_transfer(profile, from_account_id, to_account_id, transfer_amount,
+                  retries=3):
+    """
+    Move ``transfer_amount`` between two accounts of the company.
+
+    The transfer row, both balances, rollups and checkpoints are written
+    in one transaction, retried up to ``retries`` times if the database
+    aborts it on a serialization failure or a deadlock. Retries are
+    impossible inside an outer transaction, the error is raised then.
+
+    :param profile: Profile sending the transfer, owner of from_account
+    :return: created Transfer
+    """
+    if from_account_id == to_account_id:
+        raise ValueError('Выберите другой счет')
+
+    for attempt in range(retries):
+        try:
+            with transaction.atomic():
+                return apply_transfer(profile, from_account_id,
+                                      to_account_id, transfer_amount)
+        except OperationalError as e:
+            if not is_retryable(e) or connection.in_atomic_block or \
+                    attempt == retries - 1:
+                raise
+
+
+def is_date(string, fuzzy=False):
+    """
+    Return whether the string can be interpreted as a date.
+
+    :param string: str, string to check for date
+    :param fuzzy: bool, ignore unknown tokens in string if True
+    """
+    try:
+        parse(string, fuzzy=fuzzy)
+        return True
+
+    except ValueError:
+        return False
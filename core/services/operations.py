@@ -0,0 +1,293 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+
+from core import models
+
+
+OPERATION_TYPES = ('action', 'transaction', 'transfer')
+
+
+def operation_sort_key(operation):
+    """
+    Return the ordering key of a ``(type, instance)`` operation pair.
+
+    Operations are ordered by ``last_updated``, then by type and ``id`` so
+    that rows from different tables never compare equal.
+    """
+    operation_type, instance = operation
+    return (
+        instance.last_updated,
+        OPERATION_TYPES.index(operation_type),
+        instance.id,
+    )
+
+
+def tag_operations(operation_type, queryset):
+    """Yield ``(type, instance)`` pairs for every row of ``queryset``"""
+    for instance in queryset:
+        yield operation_type, instance
+
+
+def delete_operation(instance):
+    """
+    Delete an action, transaction or transfer and return whether this call
+    deleted its row.
+
+    Concurrent deletes of one operation both load it, only the one whose
+    DELETE matched the row may reverse its balance change.
+    """
+    deleted = type(instance).objects.filter(id=instance.id).delete()[1]
+
+    return deleted.get(instance._meta.label) == 1
+
+
+def merge_operations(*streams, limit=None):
+    """
+    Lazily merge operation streams ordered newest first.
+
+    :param streams: iterables of ``(type, instance)`` pairs, each already
+        ordered by ``-last_updated, -id``
+    :param limit: int, stop after this many operations if given
+    """
+    merged = heapq.merge(*streams, key=operation_sort_key, reverse=True)
+
+    if limit is None:
+        return merged
+
+    return islice(merged, limit)
+
+
+def get_operation_querysets(accounts):
+    """
+    Return ``(type, queryset)`` pairs of all operations touching ``accounts``
+    ordered newest first.
+    """
+    ordering = ('-last_updated', '-id')
+
+    return (
+        ('action', models.Action.objects
+         .filter(account__in=accounts)
+         .order_by(*ordering)),
+        ('transaction', models.Transaction.objects
+         .filter(account__in=accounts)
+         .order_by(*ordering)),
+        ('transfer', models.Transfer.objects
+         .filter(Q(from_account__in=accounts) | Q(to_account__in=accounts))
+         .order_by(*ordering)),
+    )
+
+
+def annotate_day(queryset):
+    """
+    Annotate operations with ``day``, the date of ``last_updated`` in the
+    current time zone computed by the database.
+    """
+    return queryset.annotate(day=TruncDate('last_updated'))
+
+
+def filter_after(queryset, rank, last_updated, last_rank, last_id):
+    """
+    Keep only rows of ``rank`` ordered after a position newest first,
+    rows are ordered by ``last_updated``, then rank and ``id``.
+    """
+    if rank < last_rank:
+        return queryset.filter(last_updated__lte=last_updated)
+
+    if rank > last_rank:
+        return queryset.filter(last_updated__lt=last_updated)
+
+    return queryset.filter(
+        Q(last_updated__lt=last_updated) |
+        Q(last_updated=last_updated, id__lt=last_id)
+    )
+
+
+def filter_operations_after(operation_type, queryset, position):
+    """
+    Keep only operations ordered after ``position`` newest first.
+
+    :param operation_type: str, type of the operations in ``queryset``
+    :param queryset: Action, Transaction or Transfer queryset
+    :param position: ``(last_updated, type, id)`` of the last seen operation
+    """
+    last_updated, last_type, last_id = position
+
+    return filter_after(
+        queryset,
+        OPERATION_TYPES.index(operation_type),
+        last_updated,
+        OPERATION_TYPES.index(last_type),
+        last_id
+    )
+
+
+def latest_operations(company_id, limit=10):
+    """
+    Return the ``limit`` most recent operations of a company.
+
+    Every table is filtered by ``company`` and ordered like its
+    ``(company, -last_updated, -id)`` index, so each query reads at most
+    ``limit`` index entries regardless of the company history size.
+
+    :param company_id: int, id of the company
+    :param limit: int, number of operations to return
+    :return: list of ``(type, instance)`` pairs, newest first
+    """
+    ordering = ('-last_updated', '-id')
+    querysets = (
+        ('action', models.Action.objects),
+        ('transaction', models.Transaction.objects),
+        ('transfer', models.Transfer.objects),
+    )
+    streams = [
+        tag_operations(
+            operation_type,
+            queryset.filter(company_id=company_id).order_by(*ordering)[:limit]
+        )
+        for operation_type, queryset in querysets
+    ]
+
+    return list(merge_operations(*streams, limit=limit))
+
+
+class AccountNames:
+    """
+    Display names of the accounts listed in operations.
+
+    All accounts are fetched together with their profiles in one query,
+    so building names costs nothing per operation row.
+    """
+
+    def __init__(self, account_ids, with_profile=False):
+        """
+        :param account_ids: iterable of Account ids to resolve
+        :param with_profile: bool, prefix names with the profile initials,
+            used when the company has more than one profile
+        """
+        self.accounts = models.Account.objects\
+            .select_related('profile')\
+            .in_bulk(set(account_ids))
+        self.with_profile = with_profile
+
+    def name(self, account_id):
+        account = self.accounts[account_id]
+
+        if self.with_profile:
+            return (f"{account.profile.first_name[:1]}. "
+                    f"{account.profile.last_name} ({account.account_name})")
+
+        return account.account_name
+
+    def transfer_name(self, from_account_id, to_account_id):
+        return (f"{self.name(from_account_id)} => "
+                f"{self.name(to_account_id)}")
+
+    def label(self, account_id):
+        account = self.accounts[account_id]
+        return f"{account.account_name} (pk={account.id})"
+
+
+def get_operation_account_ids(operations):
+    """Return ids of all accounts touched by ``(type, instance)`` pairs"""
+    account_ids = set()
+
+    for operation_type, instance in operations:
+        if operation_type == 'transfer':
+            account_ids.add(instance.from_account_id)
+            account_ids.add(instance.to_account_id)
+        else:
+            account_ids.add(instance.account_id)
+
+    return account_ids
+
+
+def get_operation_tags(operation_type, operation_ids):
+    """
+    Return ``{operation_id: [tag_id, ...]}`` for actions or transactions
+    read from the tags through table in one query.
+
+    :param operation_ids: list of ids or a queryset of ``id`` values, the
+        latter is sent as a subquery whatever the number of operations
+    """
+    model = models.Action if operation_type == 'action' \
+        else models.Transaction
+    field = model.tags.field.m2m_field_name()
+    through = model.tags.through
+
+    tags = defaultdict(list)
+
+    if isinstance(operation_ids, list) and not operation_ids:
+        return tags
+
+    rows = through.objects\
+        .filter(**{f'{field}__in': operation_ids})\
+        .values_list(field, 'tag_id')\
+        .order_by(field, 'tag_id')
+
+    for operation_id, tag_id in rows:
+        tags[operation_id].append(tag_id)
+
+    return tags
+
+
+def attach_operation_tags(operations, querysets=None):
+    """
+    Set ``tag_ids`` on every action and transaction of ``(type, instance)``
+    pairs using one query per operation type.
+
+    :param querysets: ``{type: queryset}`` the operations were read from,
+        when given tags are selected by a subquery instead of a list of
+        ids, which suits lists of any size
+    """
+    for operation_type in ('action', 'transaction'):
+        instances = [
+            instance for item_type, instance in operations
+            if item_type == operation_type
+        ]
+
+        if querysets is not None:
+            operation_ids = querysets[operation_type].order_by().values('id')
+        else:
+            operation_ids = [instance.id for instance in instances]
+
+        tags = get_operation_tags(operation_type, operation_ids)
+
+        for instance in instances:
+            instance.tag_ids = tags[instance.id]
+
+
+def get_daily_totals(actions, transactions, transfers, days=None):
+    """
+    Return ``{day: {'action': sum, 'transaction': sum, 'transfer': sum}}``
+    summed by the database.
+
+    The querysets must be annotated with ``day``, the operation date in
+    the current time zone, as done by ``annotate_day``.
+
+    :param days: iterable of dates to restrict the sums to
+    """
+    totals = defaultdict(
+        lambda: {'action': 0, 'transaction': 0, 'transfer': 0})
+    amounts = (
+        ('action', actions, 'action_amount'),
+        ('transaction', transactions, 'transaction_amount'),
+        ('transfer', transfers, 'transfer_amount'),
+    )
+
+    for operation_type, queryset, field in amounts:
+        if days is not None:
+            queryset = queryset.filter(day__in=days)
+
+        rows = queryset.order_by()\
+            .values('day')\
+            .annotate(total=Sum(field))\
+            .values_list('day', 'total')
+
+        for day, total in rows:
+            totals[day][operation_type] = total
+
+    return totals
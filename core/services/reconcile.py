@@ -0,0 +1,109 @@
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from core import models
+from core.services.balances import change_balances, to_amount
+
+
+def get_sum_part(queryset, account_field, amount_field):
+    """Return SQL and params of ``(sum_account, total)`` rows of a table"""
+    return queryset.order_by()\
+        .annotate(sum_account=F(account_field))\
+        .values('sum_account')\
+        .annotate(total=Sum(amount_field))\
+        .query.sql_with_params()
+
+
+def get_balance_drift(company_ids):
+    """
+    Return ``(checked, drifts)`` of the accounts of ``company_ids``.
+
+    Expected balances are the opening balance plus one aggregate of every
+    operation table, read with the balances by one statement, so writers
+    committing meanwhile never show up as drift. Balances of ledger mode
+    accounts include their pending entries.
+
+    :param company_ids: list of Company ids
+    :return: number of accounts checked and a list of ``(account_id,
+        company_id, balance, expected)`` of the drifted accounts
+    """
+    accounts = models.Account.objects.filter(company_id__in=company_ids)
+    parts = (
+        get_sum_part(models.Action.objects.filter(account__in=accounts),
+                     'account_id', 'action_amount'),
+        get_sum_part(models.Transaction.objects.filter(account__in=accounts),
+                     'account_id', 'transaction_amount'),
+        get_sum_part(models.Transfer.objects.filter(from_account__in=accounts),
+                     'from_account_id', 'transfer_amount'),
+        get_sum_part(models.Transfer.objects.filter(to_account__in=accounts),
+                     'to_account_id', 'transfer_amount'),
+        get_sum_part(
+            models.LedgerEntry.objects.filter(
+                account__in=accounts,
+                id__gt=F('account__ledger_snapshot__entry_id')),
+            'account_id', 'amount'),
+    )
+    joins = '\n'.join(
+        f'LEFT JOIN ({sql}) part{index} '
+        f'ON part{index}.sum_account = account.id'
+        for index, (sql, params) in enumerate(parts)
+    )
+    query = f'''
+        SELECT account.id, account.company_id,
+               account.balance + COALESCE(part4.total, 0),
+               account.opening_balance + COALESCE(part0.total, 0)
+               - COALESCE(part1.total, 0) - COALESCE(part2.total, 0)
+               + COALESCE(part3.total, 0)
+        FROM {models.Account._meta.db_table} account
+        {joins}
+        WHERE account.company_id IN ({', '.join(['%s'] * len(company_ids))})
+        ORDER BY account.id
+    '''
+    params = [param for sql, part_params in parts for param in part_params]
+    checked = 0
+    drifts = []
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, (*params, *company_ids))
+
+        for account_id, company_id, balance, expected in cursor.fetchall():
+            checked += 1
+            balance, expected = to_amount(balance), to_amount(expected)
+
+            if balance != expected:
+                drifts.append((account_id, company_id, balance, expected))
+
+    return checked, drifts
+
+
+def repair_balance_drift(drifts):
+    """
+    Add the drift back to the balances, one transaction per company.
+
+    Balances are changed by the difference, not set, so operations saved
+    since the drift was read are kept. Ledger mode accounts get an entry.
+
+    :param drifts: list of ``(account_id, company_id, balance, expected)``
+    """
+    changes = {}
+
+    for account_id, company_id, balance, expected in drifts:
+        changes.setdefault(company_id, {})[account_id] = expected - balance
+
+    for company_id, company_changes in changes.items():
+        with transaction.atomic():
+            change_balances(company_id, company_changes)
+
+
+def reconcile_balances(company_ids, repair=False):
+    """
+    Check and, if ``repair``, fix the balances of the companies' accounts.
+
+    :return: ``(checked, drifts)``, see ``get_balance_drift``
+    """
+    checked, drifts = get_balance_drift(company_ids)
+
+    if repair:
+        repair_balance_drift(drifts)
+
+    return checked, drifts
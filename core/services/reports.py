@@ -0,0 +1,109 @@
+import datetime
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+REPORT_GROUPS = {
+    'category': 'category_id',
+    'account': 'account_id',
+    'profile': 'account__profile_id',
+}
+
+
+def get_next_month(month):
+    """Return the first day of the month after ``month``"""
+    return (month.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def iter_months(first_month, last_month):
+    """Yield the first day of every month up to ``last_month``"""
+    month = first_month.replace(day=1)
+
+    while month <= last_month:
+        yield month
+        month = get_next_month(month)
+
+
+def get_empty_month(month):
+    return {
+        'month': month.strftime('%Y-%m'),
+        'total_action': 0,
+        'total_transaction': 0,
+        'action': [],
+        'transaction': [],
+    }
+
+
+def add_report_rows(report, operation_type, rows, groups):
+    fields = [REPORT_GROUPS[group] for group in groups]
+
+    for row in rows:
+        section = report.get(row['month'])
+
+        if section is None:
+            continue
+
+        section[f'total_{operation_type}'] += row['total']
+        section[operation_type].append({
+            **{group: row[field] for group, field in zip(groups, fields)},
+            'total': row['total'],
+            'count': row['count'],
+        })
+
+
+def get_monthly_report(actions, transactions, groups, months):
+    """
+    Return ``{month: section}`` of monthly sums of actions and transactions.
+
+    Every model is read with one GROUP BY over the month of
+    ``last_updated`` in the current time zone and the ``groups`` fields.
+
+    :param actions: Action queryset, rows outside ``months`` are skipped
+    :param transactions: Transaction queryset, same as ``actions``
+    :param groups: list of ``REPORT_GROUPS`` keys
+    :param months: list of month start dates to return sections for
+    """
+    report = {month: get_empty_month(month) for month in months}
+    fields = [REPORT_GROUPS[group] for group in groups]
+
+    for operation_type, queryset in (('action', actions),
+                                     ('transaction', transactions)):
+        rows = queryset.order_by()\
+            .annotate(month=TruncMonth(
+                'last_updated', output_field=DateField()))\
+            .values('month', *fields)\
+            .annotate(total=Sum(f'{operation_type}_amount'),
+                      count=Count('id'))\
+            .order_by('month', *fields)
+
+        add_report_rows(report, operation_type, rows, groups)
+
+    return report
+
+
+def get_rollup_monthly_report(rollups, groups, months):
+    """
+    Return the same sections as ``get_monthly_report`` summing daily
+    rollups, which reads one row per account, category and day instead
+    of one row per operation.
+
+    :param rollups: DailyRollup queryset
+    """
+    report = {month: get_empty_month(month) for month in months}
+    fields = [REPORT_GROUPS[group] for group in groups]
+
+    rows = rollups.filter(kind__in=('action', 'transaction'))\
+        .order_by()\
+        .annotate(month=TruncMonth('day'))\
+        .values('kind', 'month', *fields)\
+        .annotate(amount=Sum('total'), operations=Sum('count'))\
+        .order_by('kind', 'month', *fields)
+
+    for operation_type in ('action', 'transaction'):
+        add_report_rows(report, operation_type, (
+            {**row, 'total': row['amount'], 'count': row['operations']}
+            for row in rows if row['kind'] == operation_type
+        ), groups)
+
+    return report
@@ -0,0 +1,180 @@
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localdate
+
+from core import models
+
+
+# kind -> (model, account field, category field, amount field)
+ROLLUP_SOURCES = {
+    'action': (models.Action, 'account_id', 'category_id', 'action_amount'),
+    'transaction': (models.Transaction, 'account_id', 'category_id',
+                    'transaction_amount'),
+    'transfer_out': (models.Transfer, 'from_account_id', None,
+                     'transfer_amount'),
+    'transfer_in': (models.Transfer, 'to_account_id', None,
+                    'transfer_amount'),
+}
+
+
+def get_rollup_kinds(operation_type):
+    if operation_type == 'transfer':
+        return ('transfer_out', 'transfer_in')
+
+    return (operation_type,)
+
+
+def add_to_rollup(company_id, account_id, category_id, day, kind, total,
+                  count):
+    """Add ``total`` and ``count`` to a rollup creating it if needed"""
+    rollup, created = models.DailyRollup.objects.get_or_create(
+        company_id=company_id,
+        account_id=account_id,
+        category_id=category_id,
+        day=day,
+        kind=kind,
+    )
+    models.DailyRollup.objects.filter(id=rollup.id).update(
+        total=F('total') + total,
+        count=F('count') + count,
+    )
+
+
+def get_rollup_keys(operation_type, instance):
+    """
+    Yield ``(key, amount)`` of every rollup the operation belongs to, the
+    key being ``(company_id, account_id, category_id, day, kind)``.
+    """
+    day = localdate(instance.last_updated)
+
+    for kind in get_rollup_kinds(operation_type):
+        model, account_field, category_field, amount_field = \
+            ROLLUP_SOURCES[kind]
+        yield (
+            instance.company_id,
+            getattr(instance, account_field),
+            getattr(instance, category_field) if category_field else None,
+            day,
+            kind,
+        ), getattr(instance, amount_field)
+
+
+def update_rollups(operation_type, instance, sign=1):
+    """
+    Add an operation to the rollups of its day or remove it with
+    ``sign=-1``.
+
+    Must run in the database transaction creating or deleting the
+    operation, so rollups never disagree with the operations.
+    """
+    for key, amount in get_rollup_keys(operation_type, instance):
+        add_to_rollup(*key, amount * sign, sign)
+
+
+def add_many_to_rollups(operation_type, instances):
+    """
+    Add new operations to their rollups summed in memory first.
+
+    Missing rollups are created with one batched INSERT and all of them
+    are incremented with one UPDATE statement run for every rollup, so
+    the number of queries does not depend on the number of rollups.
+    Must run in the database transaction creating the operations.
+    """
+    sums = {}
+
+    for instance in instances:
+        for key, amount in get_rollup_keys(operation_type, instance):
+            total, count = sums.get(key, (0, 0))
+            sums[key] = (total + amount, count + 1)
+
+    if not sums:
+        return
+
+    ids = get_rollup_ids(sums)
+    missing = [key for key in sums if key not in ids]
+
+    if missing:
+        models.DailyRollup.objects.bulk_create([
+            models.DailyRollup(
+                company_id=company_id,
+                account_id=account_id,
+                category_id=category_id,
+                day=day,
+                kind=kind,
+            )
+            for company_id, account_id, category_id, day, kind in missing
+        ], ignore_conflicts=True)
+        ids = get_rollup_ids(sums)
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {models.DailyRollup._meta.db_table} '
+            f'SET total = total + %s, count = count + %s WHERE id = %s',
+            [
+                (connection.ops.adapt_decimalfield_value(total, 20, 2),
+                 count, ids[key])
+                for key, (total, count) in sums.items()
+            ]
+        )
+
+
+def get_rollup_ids(keys):
+    """Return ``{key: id}`` of the existing rollups of ``keys``"""
+    rollups = models.DailyRollup.objects.filter(
+        company_id__in={key[0] for key in keys},
+        account_id__in={key[1] for key in keys},
+        day__in={key[3] for key in keys},
+        kind__in={key[4] for key in keys},
+    ).values_list('company_id', 'account_id', 'category_id', 'day', 'kind',
+                  'id')
+
+    return {tuple(row[:5]): row[5] for row in rollups if row[:5] in keys}
+
+
+def rebuild_rollups(company_ids=None):
+    """
+    Recompute rollups from the operations.
+
+    :param company_ids: list of Company ids to rebuild, all if None
+    :return: int, number of rollups created
+    """
+    rollups = models.DailyRollup.objects.all()
+
+    if company_ids is not None:
+        rollups = rollups.filter(company_id__in=company_ids)
+
+    rollups.delete()
+    created = 0
+
+    for kind, source in ROLLUP_SOURCES.items():
+        model, account_field, category_field, amount_field = source
+        operations = model.objects.all()
+
+        if company_ids is not None:
+            operations = operations.filter(company_id__in=company_ids)
+
+        fields = ['company_id', account_field]
+
+        if category_field:
+            fields.append(category_field)
+
+        rows = operations.order_by()\
+            .annotate(day=TruncDate('last_updated'))\
+            .values('day', *fields)\
+            .annotate(total=Sum(amount_field), count=Count('id'))
+
+        created += len(models.DailyRollup.objects.bulk_create((
+            models.DailyRollup(
+                company_id=row['company_id'],
+                account_id=row[account_field],
+                category_id=row[category_field] if category_field else None,
+                day=row['day'],
+                kind=kind,
+                total=row['total'],
+                count=row['count'],
+            )
+            for row in rows.iterator()
+        )))
+
+    return created
@@ -0,0 +1,123 @@
+from django.db import connection
+from django.db.models import CharField, F, IntegerField, Value
+
+from core import models
+from core.services.balances import to_amount, to_datetime
+from core.services.operations import filter_after
+
+
+# legs of an account statement, the index is the rank in the ordering
+STATEMENT_LEGS = ('action', 'transaction', 'transfer_out', 'transfer_in')
+
+
+def get_statement_part(account, leg):
+    """
+    Return operations of ``leg`` on ``account`` as rows of
+    ``(id, leg, leg_rank, last_updated, amount, category, other_account)``
+    where ``amount`` is the signed change of the account balance.
+    """
+    no_id = Value(None, output_field=IntegerField())
+
+    if leg == 'action':
+        queryset = models.Action.objects.filter(account=account)
+        amount, category, other_account = \
+            F('action_amount'), F('category_id'), no_id
+    elif leg == 'transaction':
+        queryset = models.Transaction.objects.filter(account=account)
+        amount, category, other_account = \
+            F('transaction_amount') * -1, F('category_id'), no_id
+    elif leg == 'transfer_out':
+        queryset = models.Transfer.objects.filter(from_account=account)
+        amount, category, other_account = \
+            F('transfer_amount') * -1, no_id, F('to_account_id')
+    else:
+        queryset = models.Transfer.objects.filter(to_account=account)
+        amount, category, other_account = \
+            F('transfer_amount'), no_id, F('from_account_id')
+
+    return queryset.order_by().annotate(
+        leg=Value(leg, output_field=CharField()),
+        leg_rank=Value(STATEMENT_LEGS.index(leg), output_field=IntegerField()),
+        amount=amount,
+        category_key=category,
+        other_account=other_account,
+    )
+
+
+def get_statement(account, limit, position=None):
+    """
+    Return up to ``limit`` operations on ``account`` newest first, each
+    with the account balance right after it.
+
+    Every leg is limited to its newest ``limit`` rows by its own index
+    before the union, so the running sum window subtracting the signed
+    amounts from the anchor balance covers at most ``4 * limit`` rows
+    whatever the length of the history.
+
+    :param account: Account instance
+    :param limit: int, page size
+    :param position: ``(last_updated, leg, id, balance)`` of the last leg
+        of the previous page, ``balance`` being the balance before it
+    :return: list of row dicts with ``balance``
+    """
+    if position is None:
+        anchor = account.balance
+        parts = [get_statement_part(account, leg) for leg in STATEMENT_LEGS]
+    else:
+        last_updated, last_leg, last_id, anchor = position
+        parts = [
+            filter_after(
+                get_statement_part(account, leg),
+                STATEMENT_LEGS.index(leg),
+                last_updated,
+                STATEMENT_LEGS.index(last_leg),
+                last_id
+            )
+            for leg in STATEMENT_LEGS
+        ]
+
+    parts = [
+        part.values('id', 'leg', 'leg_rank', 'last_updated', 'amount',
+                    'category_key', 'other_account')
+        .order_by('-last_updated', '-id')[:limit]
+        .query.sql_with_params()
+        for part in parts
+    ]
+    # SQLite refuses ORDER BY and LIMIT directly in compound statements
+    sql = ' UNION ALL '.join(
+        f'SELECT * FROM ({part_sql}) leg{index}'
+        for index, (part_sql, part_params) in enumerate(parts)
+    )
+    params = [param for part_sql, part_params in parts
+              for param in part_params]
+    query = f'''
+        SELECT legs.id, legs.leg, legs.last_updated, legs.amount,
+               legs.category_key, legs.other_account,
+               %s - SUM(legs.amount) OVER (
+                   ORDER BY legs.last_updated DESC, legs.leg_rank DESC,
+                            legs.id DESC
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+               ) + legs.amount
+        FROM ({sql}) legs
+        ORDER BY legs.last_updated DESC, legs.leg_rank DESC, legs.id DESC
+        LIMIT %s
+    '''
+    rows = []
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, (anchor, *params, limit))
+
+        for row in cursor.fetchall():
+            operation_id, leg, last_updated, amount, category, \
+                other_account, balance = row
+            rows.append({
+                'id': operation_id,
+                'type': leg,
+                'last_updated': to_datetime(last_updated),
+                'amount': to_amount(amount),
+                'category': category,
+                'other_account': other_account,
+                'balance': to_amount(balance),
+            })
+
+    return rows
@@ -0,0 +1,136 @@
+from django.db.models import CharField, Count, F, IntegerField, Sum, Value
+from django.db.models.query import EmptyQuerySet
+
+
+# breakdown -> (response key, ((type, grouping field), ...))
+TOTAL_BREAKDOWNS = {
+    'category': ('categories', (
+        ('action', 'category_id'),
+        ('transaction', 'category_id'),
+    )),
+    'account': ('accounts', (
+        ('action', 'account_id'),
+        ('transaction', 'account_id'),
+        ('transfer_out', 'from_account_id'),
+        ('transfer_in', 'to_account_id'),
+    )),
+}
+
+
+def get_totals_part(queryset, amount_field, kind, key=None,
+                    count_field=None):
+    """
+    Return ``queryset`` grouped into ``(part, key, part_total,
+    part_count)`` rows, named apart from the DailyRollup fields.
+
+    :param amount_field: str, field to sum
+    :param kind: str, label of the rows in the combined result
+    :param key: str, field to group by or None for a single row
+    :param count_field: str, field to sum as the count, rows are counted
+        if None
+    """
+    key = F(key) if key else Value(None, output_field=IntegerField())
+    count = Sum(count_field) if count_field else Count('id')
+
+    return queryset.order_by()\
+        .annotate(part=Value(kind, output_field=CharField()), key=key)\
+        .values('part', 'key')\
+        .annotate(part_total=Sum(amount_field), part_count=count)
+
+
+def get_empty_totals(operation_types):
+    totals = {}
+
+    for operation_type in operation_types:
+        totals[f'total_{operation_type}'] = 0
+        totals[f'count_{operation_type}'] = 0
+
+    return totals
+
+
+def get_operation_totals(actions, transactions, transfers, breakdowns=(),
+                         rollups=None):
+    """
+    Return sums and counts of actions, transactions and transfers.
+
+    Every total and every requested breakdown is a grouped part of one
+    UNION ALL query, so the database is asked once. Querysets must not
+    join multi-valued relations, otherwise rows would be summed twice.
+
+    With ``rollups`` action and transaction parts sum DailyRollup rows
+    instead of operations. Transfer parts always read operations, a
+    transfer between two visible accounts has two rollups but is one
+    transfer, and rollups of accounts the user can not see are missing.
+
+    :param breakdowns: iterable of ``TOTAL_BREAKDOWNS`` keys to add
+        per-category and per-account subtotals
+    :param rollups: DailyRollup queryset matching the operation
+        querysets, see ``OperationFilter.get_rollups``
+    :return: dict with ``total_<type>`` and ``count_<type>`` keys plus
+        a list of subtotals under ``categories`` and ``accounts`` when
+        requested
+    """
+    querysets = {
+        'action': (actions, 'action_amount', None),
+        'transaction': (transactions, 'transaction_amount', None),
+        'transfer': (transfers, 'transfer_amount', None),
+        'transfer_out': (transfers, 'transfer_amount', None),
+        'transfer_in': (transfers, 'transfer_amount', None),
+    }
+
+    if rollups is not None:
+        # rollups of deleted operations are kept with a zero count
+        rollups = rollups.filter(count__gt=0)
+
+        for operation_type in ('action', 'transaction'):
+            querysets[operation_type] = (
+                rollups.filter(kind=operation_type), 'total', 'count')
+
+    def get_part(operation_type, kind, key=None):
+        queryset, amount_field, count_field = querysets[operation_type]
+
+        return get_totals_part(
+            queryset, amount_field, kind, key, count_field)
+
+    parts = [
+        get_part(operation_type, kind=operation_type)
+        for operation_type in ('action', 'transaction', 'transfer')
+    ]
+
+    for breakdown in breakdowns:
+        for operation_type, key in TOTAL_BREAKDOWNS[breakdown][1]:
+            parts.append(get_part(
+                operation_type,
+                kind=f'{breakdown}:{operation_type}',
+                key=key
+            ))
+
+    parts = [part for part in parts if not isinstance(part, EmptyQuerySet)]
+    rows = parts[0].union(*parts[1:], all=True) if parts else []
+
+    totals = get_empty_totals(('action', 'transaction', 'transfer'))
+    subtotals = {breakdown: {} for breakdown in breakdowns}
+
+    for row in rows:
+        if ':' in row['part']:
+            breakdown, operation_type = row['part'].split(':')
+            item = subtotals[breakdown].get(row['key'])
+
+            if item is None:
+                item = {'id': row['key']}
+                item.update(get_empty_totals(
+                    kind for kind, key in TOTAL_BREAKDOWNS[breakdown][1]))
+                subtotals[breakdown][row['key']] = item
+        else:
+            operation_type = row['part']
+            item = totals
+
+        item[f'total_{operation_type}'] = row['part_total'] or 0
+        item[f'count_{operation_type}'] = row['part_count']
+
+    for breakdown, items in subtotals.items():
+        totals[TOTAL_BREAKDOWNS[breakdown][0]] = [
+            items[key] for key in sorted(items)
+        ]
+
+    return totals
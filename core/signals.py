@@ -0,0 +1,57 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import bump_company_version, bump_history_version
+from core import models
+
+
+COMPANY_MODELS = (
+    models.Account,
+    models.Action,
+    models.Transaction,
+    models.Transfer,
+    models.Category,
+    models.Tag,
+)
+
+
+def company_changed(sender, instance, **kwargs):
+    """Invalidate cached responses of the company owning ``instance``"""
+    bump_company_version(instance.company_id)
+
+
+for model in COMPANY_MODELS:
+    post_save.connect(company_changed, sender=model)
+    post_delete.connect(company_changed, sender=model)
+
+
+@receiver(post_save, sender=models.Action)
+@receiver(post_save, sender=models.Transaction)
+@receiver(post_delete, sender=models.Action)
+@receiver(post_delete, sender=models.Transaction)
+def history_changed(sender, instance, created=False, **kwargs):
+    """
+    Invalidate cached reports of past months.
+
+    A new operation belongs to the current month which is never cached,
+    only edits and deletes can change the past.
+    """
+    if not created:
+        bump_history_version(instance.company_id)
+
+
+@receiver(post_init, sender=models.Profile)
+def remember_profile_company(sender, instance, **kwargs):
+    instance._loaded_company_id = instance.company_id
+
+
+@receiver(post_save, sender=models.Profile)
+@receiver(post_delete, sender=models.Profile)
+def profile_changed(sender, instance, **kwargs):
+    """Invalidate both the company the profile left and the one it joined"""
+    bump_company_version(instance._loaded_company_id)
+
+    if instance.company_id != instance._loaded_company_id:
+        bump_company_version(instance.company_id)
+
+    instance._loaded_company_id = instance.company_id
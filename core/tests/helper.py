@@ -20,7 +20,15 @@ JOIN_COMPANY_URL = '/api/v1/join-profile-to-company/'
 REMOVE_COMPANY_URL = '/api/v1/remove-profile-from-company/'
 
 HOMELIST_URL = '/api/v1/home-list/'
+TEAMLIST_URL = '/api/v1/team-list/'
 OPERATION_URL = '/api/v1/operation-list/'
+OPERATION_TOTALS_URL = '/api/v1/operation-list/totals/'
+OPERATION_EXPORT_URL = '/api/v1/export/operations.csv'
+REPORT_URL = '/api/v1/reports/monthly/'
+BALANCE_HISTORY_URL = '/api/v1/balance-history/'
+BALANCE_AS_OF_URL = '/api/v1/balances/as-of/'
+IMPORT_URL = '/api/v1/import/operations/'
+OPERATION_BATCH_URL = '/api/v1/operation-batch/'
 
 
 def phn():
@@ -1,11 +1,15 @@
+import datetime
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Account
+from core.models import Account, Action, Category, Transaction, Transfer
 from core.serializers import AccountSerializer
+from core.services import get_balance_drift
 from .helper import sample_profile, sample_company, sample_account, ACCOUNT_URL
 
 
@@ -82,6 +86,32 @@ class PrivateCustomerApiTests(TestCase):
         res = self.client.put(url, payload)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_balance_edits_reconcile(self):
+        sample_profile(self.user)
+        company = sample_company(self)
+        res = self.client.post(ACCOUNT_URL, {
+            "balance": 100,
+            "account_name": "string",
+        })
+        url = ACCOUNT_URL + str(res.data['id']) + '/'
+        Action.objects.create(
+            account_id=res.data['id'],
+            company=company,
+            category=Category.objects.create(
+                category_name='test', company=company),
+            action_amount=50
+        )
+        Account.objects.filter(id=res.data['id']).update(balance=150)
+
+        res = self.client.put(url, {
+            "balance": 500,
+            "account_name": "string",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['balance'], '500.00')
+        self.assertEqual(get_balance_drift([company.id]), (1, []))
+
     def test_admin_not_access_account_other_team_member(self):
         """Test unauthenticated recipe API request"""
 
@@ -114,3 +144,125 @@ class PrivateCustomerApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+
+class AccountStatementApiTests(TestCase):
+    """Test account statement with running balances"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@n1kko777-dev.ru',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self, self.profile, self.company, balance=100)
+        self.account2 = sample_account(self, self.profile, self.company)
+
+        self.add_operation(Action.objects.create(
+            account=self.account, category=self.category,
+            company=self.company, action_amount=50), 1)
+        self.add_operation(Transaction.objects.create(
+            account=self.account, category=self.category,
+            company=self.company, transaction_amount=20), 2)
+        self.add_operation(Transfer.objects.create(
+            from_account=self.account, to_account=self.account2,
+            company=self.company, transfer_amount=10), 3)
+        self.add_operation(Transfer.objects.create(
+            from_account=self.account2, to_account=self.account,
+            company=self.company, transfer_amount=5), 4)
+        self.add_operation(Action.objects.create(
+            account=self.account, category=self.category,
+            company=self.company, action_amount=15), 5)
+
+        self.url = f'{ACCOUNT_URL}{self.account.id}/statement/'
+
+    def add_operation(self, operation, day):
+        type(operation).objects.filter(id=operation.id).update(
+            last_updated=datetime.datetime(
+                2020, 3, day, 12, tzinfo=datetime.timezone.utc))
+
+    def test_get_statement(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(
+            [(item['type'], item['amount'], item['balance'])
+             for item in res.data['results']],
+            [
+                ('action', Decimal(15), Decimal(100)),
+                ('transfer_in', Decimal(5), Decimal(85)),
+                ('transfer_out', Decimal(-10), Decimal(80)),
+                ('transaction', Decimal(-20), Decimal(90)),
+                ('action', Decimal(50), Decimal(110)),
+            ]
+        )
+        self.assertEqual(
+            res.data['results'][1]['other_account'], self.account2.id)
+
+    def test_get_statement_pages(self):
+        first = self.client.get(f'{self.url}?limit=2')
+
+        Action.objects.create(
+            account=self.account, category=self.category,
+            company=self.company, action_amount=1000)
+
+        second = self.client.get(
+            f"{self.url}?limit=2&cursor={first.data['next']}")
+        third = self.client.get(
+            f"{self.url}?limit=2&cursor={second.data['next']}")
+
+        self.assertEqual(
+            [item['balance'] for item in first.data['results']],
+            [Decimal(100), Decimal(85)]
+        )
+        self.assertEqual(
+            [item['balance'] for item in second.data['results']],
+            [Decimal(80), Decimal(90)]
+        )
+        self.assertEqual(
+            [item['balance'] for item in third.data['results']],
+            [Decimal(110)]
+        )
+        self.assertIsNone(third.data['next'])
+
+    def test_get_statement_single_row_pages(self):
+        balances = []
+        url = f'{self.url}?limit=1'
+
+        while url:
+            res = self.client.get(url)
+            balances += [item['balance'] for item in res.data['results']]
+            url = res.data['next'] and \
+                f"{self.url}?limit=1&cursor={res.data['next']}"
+
+        self.assertEqual(balances, [
+            Decimal(100), Decimal(85), Decimal(80), Decimal(90), Decimal(110)
+        ])
+
+    def test_get_statement_invalid_cursor(self):
+        res = self.client.get(f'{self.url}?cursor=invalid')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_statement_other_company(self):
+        user2 = get_user_model().objects.create_user(
+            email='other@n1kko777-dev.ru',
+            password='testpass',
+            username='other'
+        )
+        client2 = APIClient()
+        client2.force_authenticate(user=user2)
+        sample_profile(user2)
+        client2.post('/api/v1/company/', {'company_name': 'Other'})
+
+        res = client2.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,15 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipIf
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Action, Category, Tag
+from core.models import Account, Action, Category, Tag, DailyRollup
 from core.serializers import ActionSerializer
+from core.views import ActionViewSet
 from .helper import sample_profile, \
     sample_company, \
     sample_account, \
-    ACTION_URL
+    ACTION_URL, \
+    TRANSACTION_URL
 
 
 class PublicCoreApiTest(TestCase):
@@ -73,6 +79,50 @@ class PrivateCustomerApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_filter_actions(self):
+        tag = Tag.objects.create(tag_name="tag", company=self.company)
+        other_tag = Tag.objects.create(tag_name="other", company=self.company)
+        other_category = Category.objects.create(
+            category_name="other category", company=self.company)
+
+        tagged = Action.objects.create(
+            account=self.account,
+            company=self.company,
+            action_amount=500,
+            category=self.category,
+        )
+        tagged.tags.set([tag, other_tag])
+        Action.objects.create(
+            account=self.account,
+            company=self.company,
+            action_amount=50,
+            category=other_category,
+        )
+
+        res = self.client.get(f'{ACTION_URL}?tag={tag.id},{other_tag.id}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [tagged.id])
+
+        res = self.client.get(
+            f'{ACTION_URL}?category={other_category.id}&max_amount=100')
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['category'], other_category.id)
+
+        res = self.client.get(f'{ACTION_URL}?min_amount=1000')
+
+        self.assertEqual(res.data, [])
+
+    def test_filter_actions_invalid(self):
+        res = self.client.get(f'{ACTION_URL}?account=first')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(f'{ACTION_URL}?min_amount=10&max_amount=1')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_make_deposit(self):
         payload = {
             "account": self.account.id,
@@ -99,6 +149,63 @@ class PrivateCustomerApiTests(TestCase):
         self.assertEqual(payload['account'], action.account.id)
         self.assertEqual(payload['action_amount'], action.action_amount)
 
+    def test_action_rollups(self):
+        payload = {
+            "account": self.account.id,
+            "action_amount": 100,
+            "company": self.company.id,
+            "category": self.category.id
+        }
+
+        first = self.client.post(ACTION_URL, payload)
+        self.client.post(ACTION_URL, payload)
+
+        rollup = DailyRollup.objects.get(kind='action')
+
+        self.assertEqual(rollup.account_id, self.account.id)
+        self.assertEqual(rollup.category_id, self.category.id)
+        self.assertEqual(rollup.total, 200)
+        self.assertEqual(rollup.count, 2)
+
+        res = self.client.delete(f"{ACTION_URL}{first.data['id']}/")
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        rollup.refresh_from_db()
+
+        self.assertEqual(rollup.total, 100)
+        self.assertEqual(rollup.count, 1)
+
+    def test_delete_action_restores_balance(self):
+        res = self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 100,
+            "category": self.category.id
+        })
+        last_updated = Account.objects.get(id=self.account.id).last_updated
+
+        self.client.delete(f"{ACTION_URL}{res.data['id']}/")
+
+        account = Account.objects.get(id=self.account.id)
+
+        self.assertEqual(account.balance, 1000)
+        self.assertGreater(account.last_updated, last_updated)
+
+    def test_delete_deleted_action(self):
+        res = self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 100,
+            "category": self.category.id
+        })
+        # loaded by a concurrent request before the action was deleted
+        action = Action.objects.get(id=res.data['id'])
+
+        self.client.delete(f"{ACTION_URL}{res.data['id']}/")
+        ActionViewSet().perform_destroy(action)
+
+        self.assertEqual(Account.objects.get(id=self.account.id).balance, 1000)
+        self.assertEqual(DailyRollup.objects.get(kind='action').total, 0)
+
     def test_make_withdraw(self):
         payload = {
             "account": self.account.id,
@@ -148,3 +255,61 @@ class PrivateCustomerApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite serializes writers')
+class ConcurrentBalanceApiTests(TransactionTestCase):
+    """Test balances under concurrent writes to one account"""
+
+    writers = 200
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=1000
+        )
+
+    def write(self, index):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        try:
+            if index % 2:
+                return client.post(ACTION_URL, {
+                    "account": self.account.id,
+                    "action_amount": 3,
+                    "category": self.category.id
+                }).status_code
+
+            return client.post(TRANSACTION_URL, {
+                "account": self.account.id,
+                "transaction_amount": 1,
+                "category": self.category.id
+            }).status_code
+        finally:
+            connection.close()
+
+    def test_concurrent_writes(self):
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            codes = list(executor.map(self.write, range(self.writers)))
+
+        self.account.refresh_from_db()
+
+        self.assertEqual(codes, [status.HTTP_201_CREATED] * self.writers)
+        self.assertEqual(
+            self.account.balance,
+            1000 + self.writers // 2 * 3 - self.writers // 2
+        )
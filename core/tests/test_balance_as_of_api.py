@@ -0,0 +1,171 @@
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.timezone import localdate
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Account, Category, Action, Transaction, Transfer, \
+    BalanceCheckpoint
+from core.services import rebuild_checkpoints
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    ACCOUNT_URL, \
+    BALANCE_AS_OF_URL, \
+    TRANSACTION_URL
+
+
+class PublicCoreApiTest(TestCase):
+    """Test unauthenticated recipe API request"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_balance_as_of_auth_required(self):
+        res = self.client.get(BALANCE_AS_OF_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCustomerApiTests(TestCase):
+    """Test authenticated API access"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=100
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=30
+        )
+        Account.objects.update(created=datetime.datetime(
+            2019, 12, 1, tzinfo=datetime.timezone.utc))
+
+        self.add_operation(Action.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            action_amount=50
+        ), 1, 10)
+        self.transaction = self.add_operation(Transaction.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            transaction_amount=20
+        ), 2, 5)
+        self.add_operation(Transfer.objects.create(
+            from_account=self.account,
+            to_account=self.account2,
+            company=self.company,
+            transfer_amount=10
+        ), 2, 20)
+        self.add_operation(Action.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            action_amount=5
+        ), 3, 10)
+
+    def add_operation(self, operation, month, day):
+        type(operation).objects.filter(id=operation.id).update(
+            last_updated=datetime.datetime(
+                2020, month, day, 12, tzinfo=datetime.timezone.utc))
+        return operation
+
+    def get_balances(self, date):
+        return self.client.get(f'{BALANCE_AS_OF_URL}?date={date}')
+
+    def assertBalances(self, date, *balances):
+        res = self.get_balances(date)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [account['balance'] for account in res.data['accounts']],
+            [Decimal(balance) for balance in balances]
+        )
+        self.assertEqual(res.data['total'], Decimal(sum(balances)))
+
+    def test_get_balances_without_checkpoints(self):
+        self.assertBalances('2020-01-05', 75, 20)
+        self.assertBalances('2020-02-10', 105, 20)
+        self.assertBalances('2020-03-31', 100, 30)
+
+    def test_get_balances_from_checkpoints(self):
+        rebuild_checkpoints(Account.objects.filter(company=self.company))
+
+        self.assertEqual(
+            BalanceCheckpoint.objects.get(
+                account=self.account, month=datetime.date(2020, 2, 1)
+            ).balance,
+            95
+        )
+        self.assertBalances('2020-01-05', 75, 20)
+        self.assertBalances('2020-02-10', 105, 20)
+        self.assertBalances('2020-02-25', 95, 30)
+        self.assertBalances('2020-03-31', 100, 30)
+
+        with self.assertNumQueries(5):
+            self.get_balances('2020-02-10')
+
+    def test_balance_edit_shifts_checkpoints(self):
+        rebuild_checkpoints(Account.objects.filter(company=self.company))
+
+        res = self.client.put(f'{ACCOUNT_URL}{self.account.id}/', {
+            "balance": 1100,
+            "account_name": "renamed",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertBalances(localdate().isoformat(), 1100, 30)
+        self.assertBalances('2020-02-25', 1095, 30)
+
+    def test_delete_operation_updates_checkpoints(self):
+        rebuild_checkpoints(Account.objects.filter(company=self.company))
+
+        res = self.client.delete(f'{TRANSACTION_URL}{self.transaction.id}/')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            BalanceCheckpoint.objects.get(
+                account=self.account, month=datetime.date(2020, 2, 1)
+            ).balance,
+            115
+        )
+        self.assertBalances('2020-02-10', 125, 20)
+
+    def test_get_balances_skips_new_accounts(self):
+        Account.objects.filter(id=self.account2.id).update(
+            created=datetime.datetime(
+                2020, 3, 1, tzinfo=datetime.timezone.utc))
+
+        res = self.get_balances('2020-02-10')
+
+        self.assertEqual(
+            [account['id'] for account in res.data['accounts']],
+            [self.account.id]
+        )
+
+    def test_get_balances_invalid_date(self):
+        res = self.client.get(BALANCE_AS_OF_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.get_balances('2999-01-01')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,132 @@
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Category, Action, Transaction, Transfer
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    BALANCE_HISTORY_URL
+
+
+class PublicCoreApiTest(TestCase):
+    """Test unauthenticated recipe API request"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_balance_history_auth_required(self):
+        res = self.client.get(BALANCE_HISTORY_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCustomerApiTests(TestCase):
+    """Test authenticated API access"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=100
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=30
+        )
+
+        self.add_operation(Action.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            action_amount=50
+        ), 1)
+        self.add_operation(Transaction.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            transaction_amount=20
+        ), 3)
+        self.add_operation(Transfer.objects.create(
+            from_account=self.account,
+            to_account=self.account2,
+            company=self.company,
+            transfer_amount=10
+        ), 3)
+        self.add_operation(Action.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            action_amount=5
+        ), 10)
+
+    def add_operation(self, operation, day):
+        type(operation).objects.filter(id=operation.id).update(
+            last_updated=datetime.datetime(
+                2020, 3, day, 12, tzinfo=datetime.timezone.utc))
+
+    def get_history(self, **params):
+        params.setdefault('start_date', '2020-03-01')
+        params.setdefault('end_date', '2020-03-04')
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+
+        return self.client.get(f'{BALANCE_HISTORY_URL}?{query}')
+
+    def test_get_balance_history(self):
+        res = self.get_history()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['days'], [
+            datetime.date(2020, 3, day) for day in range(1, 5)
+        ])
+        self.assertEqual(res.data['accounts'][0]['id'], self.account.id)
+        self.assertEqual(
+            res.data['accounts'][0]['data'],
+            [Decimal(125), Decimal(125), Decimal(95), Decimal(95)]
+        )
+        self.assertEqual(
+            res.data['accounts'][1]['data'],
+            [Decimal(20), Decimal(20), Decimal(30), Decimal(30)]
+        )
+        self.assertEqual(
+            res.data['total'],
+            [Decimal(145), Decimal(145), Decimal(125), Decimal(125)]
+        )
+
+    def test_get_balance_history_without_operations(self):
+        res = self.get_history(
+            start_date='2020-04-01', end_date='2020-04-02',
+            account=self.account2.id)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['accounts']), 1)
+        self.assertEqual(
+            res.data['accounts'][0]['data'], [Decimal(30), Decimal(30)])
+
+    def test_get_balance_history_one_query(self):
+        with self.assertNumQueries(4):
+            self.get_history()
+
+    def test_get_balance_history_invalid_range(self):
+        res = self.get_history(start_date='2020-03-04', end_date='2020-03-01')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.get_history(start_date='2010-01-01')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
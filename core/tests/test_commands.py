@@ -0,0 +1,206 @@
+import datetime
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models
+from core.management.seed import seed_company
+from core.services import change_balances, get_balance_changes, \
+    get_closed_month, get_day_start, get_next_month
+
+
+class ExplainHotQueriesCommandTests(TestCase):
+    """Test the explain_hot_queries command"""
+
+    def test_explain_seeded_queries(self):
+        out = StringIO()
+
+        call_command('explain_hot_queries', seed=30, days=10, stdout=out)
+
+        self.assertIn('Latest actions', out.getvalue())
+        self.assertIn('action_account_updated_idx', out.getvalue())
+        self.assertFalse(models.Company.objects.exists())
+        self.assertFalse(models.Action.objects.exists())
+
+
+class BenchmarkOperationTagsCommandTests(TestCase):
+    """Test the benchmark_operation_tags command"""
+
+    def test_benchmark_seeded_operations(self):
+        out = StringIO()
+
+        call_command('benchmark_operation_tags', operations=60, tags=3,
+                     repeat=1, stdout=out)
+
+        self.assertIn('through table', out.getvalue())
+        self.assertFalse(models.Tag.objects.exists())
+        self.assertFalse(models.Action.objects.exists())
+
+
+class RebuildRollupsCommandTests(TestCase):
+    """Test the rebuild_rollups command"""
+
+    def test_rebuild_seeded_operations(self):
+        company = seed_company(30, days=3)
+        models.DailyRollup.objects.all().delete()
+        out = StringIO()
+
+        call_command('rebuild_rollups', company=[company.id], stdout=out)
+
+        rollups = models.DailyRollup.objects.filter(company=company)
+
+        self.assertIn('Created', out.getvalue())
+        self.assertEqual(
+            rollups.filter(kind='action').aggregate(
+                total=Sum('total'), count=Sum('count')),
+            models.Action.objects.filter(company=company).aggregate(
+                total=Sum('action_amount'), count=Count('id'))
+        )
+        self.assertEqual(
+            rollups.filter(kind='transfer_in').aggregate(count=Sum('count')),
+            {'count': 30}
+        )
+
+
+class RebuildBalanceCheckpointsCommandTests(TestCase):
+    """Test the rebuild_balance_checkpoints command"""
+
+    def test_rebuild_seeded_operations(self):
+        company = seed_company(30, days=90)
+        models.Account.objects.update(
+            created=timezone.now() - datetime.timedelta(days=100))
+        out = StringIO()
+
+        call_command('rebuild_balance_checkpoints', company=[company.id],
+                     months=2, stdout=out)
+
+        last_month = get_closed_month()
+        account = models.Account.objects.filter(company=company).first()
+        checkpoint = models.BalanceCheckpoint.objects.get(
+            account=account, month=last_month)
+        changes = get_balance_changes(
+            [account.id], get_day_start(get_next_month(last_month)))
+
+        self.assertIn('Created 20 checkpoints', out.getvalue())
+        self.assertEqual(
+            checkpoint.balance,
+            account.balance - changes.get(account.id, 0)
+        )
+
+
+class ImportOperationsCommandTests(TestCase):
+    """Test the import_operations command"""
+
+    def test_import_csv_file(self):
+        company = seed_company(3, days=1)
+        profile = models.Profile.objects.get(company=company)
+        account = models.Account.objects.filter(company=company).first()
+        category = models.Category.objects.get(company=company)
+        out = StringIO()
+        err = StringIO()
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('type,account,category,amount\n')
+            file.write(f'action,{account.id},{category.id},10\n')
+            file.write(f'transaction,{account.id},0,10\n')
+            file.flush()
+
+            call_command('import_operations', file.name, profile=profile.id,
+                         stdout=out, stderr=err)
+
+        self.assertIn('Created 1 operations, 1 rows failed', out.getvalue())
+        self.assertIn('Row 2', err.getvalue())
+        self.assertEqual(
+            models.Account.objects.get(id=account.id).balance,
+            account.balance + 10
+        )
+
+
+class LedgerCommandsTests(TestCase):
+    """Test the set_ledger_mode and compact_ledger commands"""
+
+    def test_compact_pending_entries(self):
+        company = seed_company(3, days=1)
+        account = models.Account.objects.filter(company=company).first()
+        out = StringIO()
+
+        call_command('set_ledger_mode', account.id, stdout=out)
+        change_balances(company.id, {account.id: 25})
+        call_command('compact_ledger', company=[company.id], stdout=out)
+
+        self.assertIn('Switched 1 accounts', out.getvalue())
+        self.assertIn('Compacted 1 accounts', out.getvalue())
+        self.assertEqual(
+            models.Account.objects.get(id=account.id).balance,
+            account.balance + 25
+        )
+
+        call_command('set_ledger_mode', account.id, off=True, stdout=out)
+        change_balances(company.id, {account.id: 5})
+
+        self.assertEqual(models.LedgerEntry.objects.count(), 1)
+        self.assertEqual(
+            models.Account.objects.get(id=account.id).balance,
+            account.balance + 30
+        )
+
+
+class ReconcileBalancesCommandTests(TestCase):
+    """Test the reconcile_balances command"""
+
+    def test_reconcile_seeded_operations(self):
+        # seeded operations leave the balances at 0
+        company = seed_company(30, days=3)
+        account = models.Account.objects.filter(company=company).first()
+        expected = account.opening_balance + get_balance_changes(
+            [account.id], get_day_start(get_closed_month()) -
+            datetime.timedelta(days=365))[account.id]
+        out = StringIO()
+
+        call_command('reconcile_balances', company=[company.id], workers=1,
+                     stdout=out)
+
+        self.assertIn('Checked 10 accounts, 10 drifted', out.getvalue())
+        self.assertIn(f'Account {account.id} of company {company.id}: '
+                      f'balance 0.00, expected {expected}', out.getvalue())
+        self.assertEqual(models.Account.objects.get(id=account.id).balance, 0)
+
+        call_command('reconcile_balances', company=[company.id], workers=1,
+                     repair=True, stdout=out)
+        call_command('reconcile_balances', company=[company.id], workers=1,
+                     stdout=out)
+
+        self.assertIn('10 drifted, 10 repaired', out.getvalue())
+        self.assertIn('Checked 10 accounts, 0 drifted', out.getvalue())
+        self.assertEqual(
+            models.Account.objects.get(id=account.id).balance, expected)
+
+
+class PurgeIdempotencyKeysCommandTests(TestCase):
+    """Test the purge_idempotency_keys command"""
+
+    def test_purge_expired_keys(self):
+        user = get_user_model().objects.create_user(username='test')
+        now = timezone.now()
+        models.IdempotencyKey.objects.bulk_create([
+            models.IdempotencyKey(
+                user=user, key=f'key-{index}', request_hash='',
+                status_code=201, response='{}',
+                expires=now + datetime.timedelta(hours=index * 2 - 5))
+            for index in range(5)
+        ])
+        out = StringIO()
+
+        call_command('purge_idempotency_keys', batch_size=2, stdout=out)
+
+        self.assertIn('Deleted 3 keys', out.getvalue())
+        self.assertEqual(
+            sorted(models.IdempotencyKey.objects.values_list(
+                'key', flat=True)),
+            ['key-3', 'key-4']
+        )
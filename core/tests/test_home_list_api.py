@@ -1,9 +1,16 @@
+import datetime
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Category
+from core.models import Account, Category, Action, Transaction, Transfer, \
+    CompanyState
+from core.services import set_ledger_mode
 from .helper import sample_profile, \
     sample_company, \
     sample_account, \
@@ -28,6 +35,7 @@ class PrivateCustomerApiTests(TestCase):
     """Test authenticated API access"""
 
     def setUp(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             email='test@londonappdev.com',
             password='testpass',
@@ -153,3 +161,245 @@ class PrivateCustomerApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['balance'],
                          self.account.balance + account2.balance)
+
+    def test_get_home_list_latest_operations(self):
+        account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+        now = timezone.now()
+
+        for day in range(12):
+            action = Action.objects.create(
+                account=self.account,
+                category=self.category,
+                company=self.company,
+                action_amount=day
+            )
+            Action.objects.filter(id=action.id).update(
+                last_updated=now - datetime.timedelta(days=day * 3))
+
+        transaction = Transaction.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            transaction_amount=10
+        )
+        Transaction.objects.filter(id=transaction.id).update(
+            last_updated=now - datetime.timedelta(days=1))
+
+        transfer = Transfer.objects.create(
+            from_account=account2,
+            to_account=self.account,
+            company=self.company,
+            transfer_amount=10
+        )
+        Transfer.objects.filter(id=transfer.id).update(
+            last_updated=now - datetime.timedelta(days=2))
+
+        res = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        operations = res.data['data'][-1]['data']
+
+        self.assertEqual(len(operations), 10)
+        self.assertEqual(
+            [(item['type'], item['id']) for item in operations[:4]],
+            [
+                ('action', Action.objects.get(action_amount=0).id),
+                ('transaction', transaction.id),
+                ('transfer', transfer.id),
+                ('action', Action.objects.get(action_amount=1).id),
+            ]
+        )
+        self.assertEqual(
+            [item['last_updated'] for item in operations],
+            sorted([item['last_updated'] for item in operations],
+                   reverse=True)
+        )
+
+    def test_get_home_list_constant_queries(self):
+        user2 = get_user_model().objects.create_user(
+            email='other@gleb.com',
+            password='otherpass',
+            username='test_1'
+        )
+        profile2 = sample_profile(user=user2)
+        self.client.post('/api/v1/join-profile-to-company/', {
+            'profile_id': profile2.id,
+            'profile_phone': profile2.phone
+        }, format="json")
+        accounts = [self.account] + [
+            sample_account(
+                self=self,
+                profile=profile2,
+                company=self.company,
+                account_name=f"account {index}"
+            )
+            for index in range(3)
+        ]
+
+        def add_operations(count):
+            for index in range(count):
+                account = accounts[index % len(accounts)]
+                Action.objects.create(
+                    account=account,
+                    category=self.category,
+                    company=self.company,
+                    action_amount=1
+                )
+                Transaction.objects.create(
+                    account=account,
+                    category=self.category,
+                    company=self.company,
+                    transaction_amount=1
+                )
+                Transfer.objects.create(
+                    from_account=account,
+                    to_account=accounts[(index + 1) % len(accounts)],
+                    company=self.company,
+                    transfer_amount=1
+                )
+
+        self.client.get(HOMELIST_URL)
+        add_operations(1)
+        # operations saved by the test are not committed to bump the version
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as few:
+            res = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        add_operations(20)
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['data'][-1]['data']), 10)
+        self.assertEqual(len(few), len(many))
+
+    def test_get_home_list_cached(self):
+        res = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(3):
+            cached = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_get_home_list_cache_per_profile(self):
+        user2 = get_user_model().objects.create_user(
+            email='other@gleb.com',
+            password='otherpass',
+            username='test_1'
+        )
+        profile2 = sample_profile(user=user2)
+        self.client.post('/api/v1/join-profile-to-company/', {
+            'profile_id': profile2.id,
+            'profile_phone': profile2.phone
+        }, format="json")
+
+        client2 = APIClient()
+        client2.force_authenticate(user=user2)
+
+        admin_res = self.client.get(HOMELIST_URL)
+        member_res = client2.get(HOMELIST_URL)
+
+        self.assertEqual(
+            [section['title'] for section in admin_res.data['data']],
+            ['Счета', 'Команда', 'Категории', 'Теги', 'Последние операции']
+        )
+        self.assertEqual(
+            [section['title'] for section in member_res.data['data']],
+            ['Счета', 'Категории', 'Теги', 'Последние операции']
+        )
+
+
+class CacheInvalidationApiTests(TransactionTestCase):
+    """Test cached home lists are invalidated once changes are committed"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+
+    def test_get_home_list_cache_invalidated(self):
+        self.client.get(HOMELIST_URL)
+
+        action = Action.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            action_amount=100
+        )
+
+        res = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.data['data'][-1]['data'][0]['id'], action.id)
+
+        self.account.balance = 500
+        self.account.save()
+
+        res = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.data['balance'], 500)
+
+    def test_compacted_home_list_cached_under_new_version(self):
+        set_ledger_mode(Account.objects.filter(id=self.account.id))
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 50,
+            "category": self.category.id
+        })
+
+        res = self.client.get(HOMELIST_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(HOMELIST_URL)
+
+        self.assertEqual(res.data['balance'], self.account.balance + 50)
+        self.assertEqual(cached.data, res.data)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'core_account' in query['sql']
+        ])
+
+    def test_version_bumped_on_commit(self):
+        def get_version():
+            return CompanyState.objects.filter(company=self.company)\
+                .values_list('version', flat=True).first()
+
+        version = get_version()
+
+        with transaction.atomic():
+            Action.objects.create(
+                account=self.account,
+                category=self.category,
+                company=self.company,
+                action_amount=100
+            )
+
+            self.assertEqual(get_version(), version)
+
+        self.assertEqual(get_version(), (version or 0) + 1)
@@ -0,0 +1,262 @@
+import datetime
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import DatabaseError, connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Account, Action, Category, Company, \
+    IdempotencyKey, Transfer
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    ACTION_URL, \
+    TRANSFER_URL, \
+    OPERATION_BATCH_URL
+
+
+class IdempotencyTestMixin:
+    """Account of a company member"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=100
+        )
+
+
+class PrivateCustomerApiTests(IdempotencyTestMixin, TestCase):
+    """Test create requests retried with an Idempotency-Key header"""
+
+    def post_action(self, key, amount=10):
+        return self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": amount,
+            "category": self.category.id
+        }, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_response(self):
+        res = self.post_action('key-1')
+        retry = self.post_action('key-1')
+
+        self.account.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, res.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Action.objects.count(), 1)
+        self.assertEqual(self.account.balance, 110)
+
+    def test_replay_does_not_touch_accounts(self):
+        self.post_action('key-1')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post_action('key-1')
+
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'core_account' in query['sql']
+        ])
+
+    def test_other_keys_create(self):
+        self.post_action('key-1')
+        self.post_action('key-2')
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 10,
+            "category": self.category.id
+        })
+
+        self.assertEqual(Action.objects.count(), 3)
+
+    def test_key_reused_for_other_request(self):
+        self.post_action('key-1')
+        res = self.post_action('key-1', amount=20)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Action.objects.count(), 1)
+
+    def test_released_key_claimed_again(self):
+        IdempotencyKey.objects.create(
+            user=self.user, key='key-1', request_hash='other',
+            expires=timezone.now() + datetime.timedelta(hours=1))
+        get = QuerySet.get
+        calls = []
+
+        def release_key(queryset, *args, **kwargs):
+            if not calls:
+                IdempotencyKey.objects.all().delete()
+            calls.append(kwargs)
+            return get(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'get', autospec=True,
+                          side_effect=release_key):
+            res = self.post_action('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Action.objects.count(), 1)
+
+    def test_failed_store_rolls_back_operation(self):
+        with patch('core.idempotency.store_response',
+                   side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            self.post_action('key-1')
+
+        self.account.refresh_from_db()
+
+        self.assertFalse(Action.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.account.balance, 100)
+
+    def test_key_in_progress(self):
+        res = self.post_action('key-1')
+        IdempotencyKey.objects.update(status_code=None)
+
+        res = self.post_action('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_stale_key_in_progress_taken_over(self):
+        self.post_action('key-1')
+        IdempotencyKey.objects.update(
+            status_code=None,
+            expires=timezone.now() - datetime.timedelta(seconds=1))
+
+        res = self.post_action('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Action.objects.count(), 2)
+        self.assertGreater(
+            IdempotencyKey.objects.get().expires,
+            timezone.now() + datetime.timedelta(
+                seconds=settings.IDEMPOTENCY_LEASE_TIMEOUT)
+        )
+
+    def test_invalid_request_releases_key(self):
+        res = self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "category": self.category.id
+        }, HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_error_response_releases_key(self):
+        res = self.client.post(TRANSFER_URL, {
+            "from_account": self.account.id,
+            "to_account": self.account.id,
+            "transfer_amount": 0,
+        }, HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_runs_again(self):
+        self.post_action('key-1')
+        IdempotencyKey.objects.update(
+            expires=timezone.now() - datetime.timedelta(seconds=1))
+
+        res = self.post_action('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(res.has_header('Idempotent-Replayed'))
+        self.assertEqual(Action.objects.count(), 2)
+
+    def test_invalid_key(self):
+        res = self.post_action('k' * 256)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Action.objects.exists())
+
+    def test_batch_retry_replays_results(self):
+        payload = {"operations": [{
+            "client_id": 1,
+            "type": "action",
+            "account": self.account.id,
+            "category": self.category.id,
+            "amount": "10",
+        }]}
+
+        res = self.client.post(OPERATION_BATCH_URL, payload, format='json',
+                               HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.client.post(OPERATION_BATCH_URL, payload, format='json',
+                                 HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(retry.data, res.data)
+        self.assertEqual(Action.objects.count(), 1)
+
+
+class TransferMailApiTests(IdempotencyTestMixin, TransactionTestCase):
+    """Test transfer mails, sent once the transfer is committed"""
+
+    def setUp(self):
+        super().setUp()
+        user2 = get_user_model().objects.create_user(
+            email='other@gleb.com',
+            password='otherpass',
+            username='test_1'
+        )
+        profile2 = sample_profile(user=user2)
+        self.account2 = sample_account(
+            self=self,
+            profile=profile2,
+            company=self.company
+        )
+        self.client.post('/api/v1/join-profile-to-company/', {
+            'profile_id': profile2.id,
+            'profile_phone': profile2.phone
+        }, format="json")
+        mail.outbox = []
+
+    def test_transfer_retry_sends_one_mail(self):
+        payload = {
+            "from_account": self.account.id,
+            "to_account": self.account2.id,
+            "transfer_amount": 10,
+        }
+
+        self.client.post(TRANSFER_URL, payload, HTTP_IDEMPOTENCY_KEY='key-1')
+        res = self.client.post(TRANSFER_URL, payload,
+                               HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Transfer.objects.count(), 1)
+        self.assertEqual(
+            Account.objects.get(id=self.account2.id).balance, 10)
+
+    def test_failed_transfer_sends_no_mail(self):
+        Account.objects.filter(id=self.account2.id).update(
+            company=Company.objects.create(company_name="other"))
+
+        res = self.client.post(TRANSFER_URL, {
+            "from_account": self.account.id,
+            "to_account": self.account2.id,
+            "transfer_amount": 10,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(mail.outbox, [])
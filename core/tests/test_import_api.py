@@ -0,0 +1,173 @@
+import datetime
+import json
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Account, Category, Action, Transaction, Tag, \
+    DailyRollup, BalanceCheckpoint
+from core.services import rebuild_checkpoints
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    IMPORT_URL
+
+
+class PublicCoreApiTest(TestCase):
+    """Test unauthenticated recipe API request"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_import_auth_required(self):
+        res = self.client.post(IMPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCustomerApiTests(TestCase):
+    """Test authenticated API access"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.tag = Tag.objects.create(tag_name="tag", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=100
+        )
+
+    def upload(self, name, content):
+        return self.client.post(IMPORT_URL, {
+            'file': SimpleUploadedFile(name, content.encode()),
+        }, format='multipart')
+
+    def get_csv(self, rows):
+        lines = ['type,account,category,amount,tags,last_updated']
+        lines += [','.join(str(value) for value in row) for row in rows]
+        return '\n'.join(lines)
+
+    def test_import_csv(self):
+        res = self.upload('operations.csv', self.get_csv([
+            ('action', self.account.id, self.category.id, '50.50',
+             f'"{self.tag.id}"', '2020-03-10T12:00:00+00:00'),
+            ('transaction', self.account.id, self.category.id, 20, '', ''),
+            ('action', 0, self.category.id, 10, '', ''),
+        ]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['errors'], [
+            {'row': 3, 'detail': 'Указанный счет не найден'},
+        ])
+
+        action = Action.objects.get()
+
+        self.assertEqual(action.action_amount, Decimal('50.50'))
+        self.assertEqual(list(action.tags.all()), [self.tag])
+        self.assertEqual(
+            action.last_updated,
+            datetime.datetime(2020, 3, 10, 12, tzinfo=datetime.timezone.utc)
+        )
+        self.assertTrue(Transaction.objects.exists())
+        self.assertEqual(
+            Account.objects.get(id=self.account.id).balance,
+            Decimal('130.50')
+        )
+        self.assertEqual(
+            DailyRollup.objects.get(kind='action').day,
+            datetime.date(2020, 3, 10)
+        )
+
+    def test_import_json(self):
+        res = self.upload('operations.json', json.dumps([
+            {'type': 'action', 'account': self.account.id,
+             'category': self.category.id, 'amount': 5,
+             'tags': [self.tag.id]},
+            {'type': 'transfer', 'account': self.account.id},
+            {'type': 'action', 'account': self.account.id,
+             'category': self.category.id, 'amount': -5},
+        ]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(
+            [error['row'] for error in res.data['errors']], [2, 3])
+        self.assertEqual(
+            Action.objects.get().tags.get().id, self.tag.id)
+
+    def test_import_updates_checkpoints(self):
+        Account.objects.update(created=datetime.datetime(
+            2020, 1, 1, tzinfo=datetime.timezone.utc))
+        rebuild_checkpoints(Account.objects.filter(id=self.account.id))
+
+        self.upload('operations.csv', self.get_csv([
+            ('action', self.account.id, self.category.id, 10, '',
+             '2020-02-10T12:00:00+00:00'),
+        ]))
+
+        checkpoint = BalanceCheckpoint.objects.get(
+            account=self.account, month=datetime.date(2020, 2, 1))
+
+        self.assertEqual(checkpoint.balance, 110)
+        self.assertEqual(
+            BalanceCheckpoint.objects.get(
+                account=self.account, month=datetime.date(2020, 1, 1)
+            ).balance,
+            100
+        )
+
+    def test_import_constant_queries(self):
+        def get_rows(count):
+            return self.get_csv([
+                ('action', self.account.id, self.category.id, 1,
+                 f'"{self.tag.id}"', '2020-03-10T12:00:00+00:00')
+            ] * count)
+
+        self.upload('operations.csv', get_rows(1))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.upload('operations.csv', get_rows(5))
+
+        with self.assertNumQueries(len(queries)):
+            res = self.upload('operations.csv', get_rows(50))
+
+        self.assertEqual(res.data['created'], 50)
+        self.assertEqual(Action.objects.count(), 56)
+
+    def test_import_many_rows(self):
+        res = self.upload('operations.csv', self.get_csv([
+            ('action', self.account.id, self.category.id, 1, '', '')
+        ] * 1200))
+
+        self.assertEqual(res.data['created'], 1200)
+        self.assertEqual(
+            Account.objects.get(id=self.account.id).balance, 1300)
+        self.assertEqual(DailyRollup.objects.get().count, 1200)
+
+    def test_import_invalid_file(self):
+        res = self.upload('operations.txt', 'text')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.upload('operations.json', '{"type": "action"}')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(IMPORT_URL, {}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
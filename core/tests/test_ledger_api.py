@@ -0,0 +1,186 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TransactionTestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Account, Category, CompanyState, LedgerEntry, \
+    LedgerSnapshot
+from core.services import get_balance_drift, set_ledger_mode
+from core.services.ledger import refresh_ledger_balances
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    ACCOUNT_URL, \
+    ACTION_URL, \
+    TRANSACTION_URL, \
+    TRANSFER_URL, \
+    TEAMLIST_URL
+
+
+class PrivateCustomerApiTests(TransactionTestCase):
+    """
+    Test operations on ledger mode accounts, the pending flag is set once
+    the entries are committed
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=100,
+            opening_balance=100
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+
+        set_ledger_mode(Account.objects.filter(id=self.account.id))
+
+    def get_balance(self, account):
+        res = self.client.get(f'{ACCOUNT_URL}{account.id}/')
+
+        return Decimal(res.data['balance'])
+
+    def test_action_appends_entry(self):
+        res = self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 50,
+            "category": self.category.id
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(LedgerEntry.objects.values_list('account_id', 'amount')),
+            [(self.account.id, 50)]
+        )
+        self.assertEqual(Account.objects.get(id=self.account.id).balance, 100)
+
+        self.assertEqual(self.get_balance(self.account), 150)
+
+        snapshot = LedgerSnapshot.objects.get(account=self.account)
+
+        self.assertEqual(snapshot.entry_id, LedgerEntry.objects.get().id)
+        self.assertEqual(snapshot.balance, 150)
+
+    def test_pending_entries_reconcile(self):
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 50,
+            "category": self.category.id
+        })
+
+        self.assertEqual(get_balance_drift([self.company.id]), (2, []))
+
+    def test_delete_transaction_appends_entry(self):
+        res = self.client.post(TRANSACTION_URL, {
+            "account": self.account.id,
+            "transaction_amount": 30,
+            "category": self.category.id
+        })
+
+        self.assertEqual(self.get_balance(self.account), 70)
+
+        self.client.delete(f"{TRANSACTION_URL}{res.data['id']}/")
+
+        self.assertEqual(
+            list(LedgerEntry.objects.order_by('id')
+                 .values_list('amount', flat=True)),
+            [-30, 30]
+        )
+        self.assertEqual(self.get_balance(self.account), 100)
+
+    def test_transfer_to_plain_account(self):
+        res = self.client.post(TRANSFER_URL, {
+            "from_account": self.account.id,
+            "to_account": self.account2.id,
+            "transfer_amount": 40,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(LedgerEntry.objects.values_list('account_id', 'amount')),
+            [(self.account.id, -40)]
+        )
+        self.assertEqual(
+            Account.objects.get(id=self.account2.id).balance, 40)
+        self.assertEqual(self.get_balance(self.account), 60)
+
+    def test_update_balance_appends_entry(self):
+        res = self.client.put(f'{ACCOUNT_URL}{self.account.id}/', {
+            "balance": 500,
+            "account_name": "renamed",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(LedgerEntry.objects.get().amount, 400)
+
+        account = Account.objects.get(id=self.account.id)
+
+        self.assertEqual(account.account_name, 'renamed')
+        self.assertEqual(self.get_balance(self.account), 500)
+
+    def test_team_list_reads_compacted_balances(self):
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 50,
+            "category": self.category.id
+        })
+
+        res = self.client.get(TEAMLIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['balance'], 150)
+
+    def test_failed_compaction_keeps_pending_flag(self):
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 50,
+            "category": self.category.id
+        })
+
+        with patch('core.services.ledger.compact_ledger',
+                   side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            refresh_ledger_balances(self.company.id)
+
+        self.assertTrue(
+            CompanyState.objects.get(company=self.company).ledger_pending)
+        self.assertEqual(refresh_ledger_balances(self.company.id), 1)
+        self.assertEqual(Account.objects.get(id=self.account.id).balance, 150)
+
+    def test_disable_ledger_mode(self):
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 50,
+            "category": self.category.id
+        })
+
+        set_ledger_mode(
+            Account.objects.filter(id=self.account.id), enabled=False)
+        self.client.post(ACTION_URL, {
+            "account": self.account.id,
+            "action_amount": 5,
+            "category": self.category.id
+        })
+
+        self.assertEqual(LedgerEntry.objects.count(), 1)
+        self.assertEqual(Account.objects.get(id=self.account.id).balance, 155)
@@ -0,0 +1,161 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Account, Category, Company, Action, \
+    Transaction, Tag
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    OPERATION_BATCH_URL
+
+
+class PublicCoreApiTest(TestCase):
+    """Test unauthenticated recipe API request"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_operation_batch_auth_required(self):
+        res = self.client.post(OPERATION_BATCH_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCustomerApiTests(TestCase):
+    """Test authenticated API access"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.tag = Tag.objects.create(tag_name="tag", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=100
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=10
+        )
+
+    def push(self, operations):
+        return self.client.post(
+            OPERATION_BATCH_URL, {'operations': operations}, format='json')
+
+    def get_item(self, client_id, **params):
+        item = {
+            'client_id': client_id,
+            'type': 'action',
+            'account': self.account.id,
+            'category': self.category.id,
+            'amount': 10,
+        }
+        item.update(params)
+        return item
+
+    def test_push_operation_batch(self):
+        res = self.push([
+            self.get_item('a', tags=[self.tag.id]),
+            self.get_item('b', type='transaction', amount='2.50'),
+            self.get_item('c', account=0),
+            self.get_item('a'),
+            self.get_item('d', account=self.account2.id, amount=5),
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        results = res.data['results']
+        action = Action.objects.get(account=self.account)
+
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'created', 'error', 'error', 'created']
+        )
+        self.assertEqual(results[0]['id'], action.id)
+        self.assertEqual(results[0]['type'], 'action')
+        self.assertEqual(
+            results[1]['id'], Transaction.objects.get().id)
+        self.assertEqual(results[2]['detail'], 'Указанный счет не найден')
+        self.assertEqual(
+            results[3]['detail'], 'Неверный идентификатор операции')
+        self.assertEqual(list(action.tags.all()), [self.tag])
+        self.assertEqual(
+            Account.objects.get(id=self.account.id).balance,
+            Decimal('107.50')
+        )
+        self.assertEqual(
+            Account.objects.get(id=self.account2.id).balance, 15)
+
+    def test_push_operation_batch_again(self):
+        first = self.push([self.get_item('a'), self.get_item(1)])
+        res = self.push([
+            self.get_item('a'),
+            self.get_item('1', type='transaction'),
+            self.get_item('b'),
+        ])
+
+        self.assertEqual(
+            [(result['status'], result.get('type'), result.get('id'))
+             for result in res.data['results']],
+            [
+                ('exists', 'action', first.data['results'][0]['id']),
+                ('exists', 'action', first.data['results'][1]['id']),
+                ('created', 'action', Action.objects.latest('id').id),
+            ]
+        )
+        self.assertEqual(Action.objects.count(), 3)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(
+            Account.objects.get(id=self.account.id).balance, 130)
+
+    def test_push_operation_batch_other_company(self):
+        other_category = Category.objects.create(
+            category_name="other",
+            company=Company.objects.create(company_name="other"))
+
+        res = self.push([self.get_item('a', category=other_category.id)])
+
+        self.assertEqual(res.data['results'][0]['status'], 'error')
+        self.assertFalse(Action.objects.exists())
+
+    def test_push_operation_batch_constant_queries(self):
+        self.push([self.get_item('warm')])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.push([
+                self.get_item(index, tags=[self.tag.id])
+                for index in range(2)
+            ])
+
+        with self.assertNumQueries(len(queries)):
+            res = self.push([
+                self.get_item(index, tags=[self.tag.id])
+                for index in range(40)
+            ])
+
+        self.assertEqual(len(res.data['results']), 40)
+
+    def test_push_operation_batch_invalid(self):
+        res = self.push([])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.push([self.get_item(index) for index in range(501)])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Action.objects.exists())
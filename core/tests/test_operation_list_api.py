@@ -1,14 +1,25 @@
+import csv
 import datetime
+import io
+import json
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localtime
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Category, Transaction
+from unittest.mock import patch
+from core.views import OperationListView
+from core.models import Category, Action, Transaction, Transfer, Tag
+from core.services import rebuild_rollups
 from .helper import sample_profile, \
     sample_company, \
     sample_account, \
     fake, \
     OPERATION_URL, \
+    OPERATION_TOTALS_URL, \
+    OPERATION_EXPORT_URL, \
     TRANSACTION_URL, \
     COMPANY_URL
 
@@ -204,6 +215,410 @@ class PrivateCustomerApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertTrue(len(res.data['data']) > 0)
-        self.assertEqual(trans.last_updated.strftime(
+        self.assertEqual(localtime(trans.last_updated).strftime(
             '%d.%m.%Y'), res.data['data'][0]['title'])
         self.assertEqual(trans.id, res.data['data'][0]['data'][0]['id'])
+
+    def test_get_operation_list_constant_queries(self):
+        user2 = get_user_model().objects.create_user(
+            email='other@gleb.com',
+            password='otherpass',
+            username='test_1'
+        )
+        profile2 = sample_profile(user=user2)
+        self.client.post('/api/v1/join-profile-to-company/', {
+            'profile_id': profile2.id,
+            'profile_phone': profile2.phone
+        }, format="json")
+        accounts = [self.account] + [
+            sample_account(
+                self=self,
+                profile=profile2,
+                company=self.company,
+                account_name=f"account {index}"
+            )
+            for index in range(3)
+        ]
+
+        def add_transfers(count):
+            for index in range(count):
+                Transfer.objects.create(
+                    from_account=accounts[index % len(accounts)],
+                    to_account=accounts[(index + 1) % len(accounts)],
+                    company=self.company,
+                    transfer_amount=1
+                )
+
+        today = datetime.datetime.utcnow()
+        yesterday = today - datetime.timedelta(days=1)
+        tomorrow = today + datetime.timedelta(days=1)
+        url = (f'{OPERATION_URL}?start_date={yesterday}'
+               f'&end_date={tomorrow}&type=transfer')
+
+        add_transfers(1)
+
+        with CaptureQueriesContext(connection) as few:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        add_transfers(20)
+
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['data'][0]['data']), 21)
+        self.assertEqual(
+            res.data['data'][0]['data'][0]['name'],
+            f"{profile2.first_name[:1]}. {profile2.last_name} "
+            f"({accounts[3].account_name}) => "
+            f"{self.profile.first_name[:1]}. {self.profile.last_name} "
+            f"({self.account.account_name})"
+        )
+        self.assertEqual(len(few), len(many))
+
+
+class OperationListPaginationApiTests(TestCase):
+    """Test cursor pagination of operation list"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.tag = Tag.objects.create(tag_name="tag", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+
+        noon = datetime.datetime(2020, 3, 10, 12, tzinfo=datetime.timezone.utc)
+        self.start_date = '2020-03-01'
+        self.end_date = '2020-03-31'
+        self.operations = []
+
+        for day in range(3):
+            last_updated = noon - datetime.timedelta(days=day)
+            action = Action.objects.create(
+                account=self.account,
+                category=self.category,
+                company=self.company,
+                action_amount=10
+            )
+            action.tags.add(self.tag)
+            transaction = Transaction.objects.create(
+                account=self.account,
+                category=self.category,
+                company=self.company,
+                transaction_amount=3
+            )
+            transfer = Transfer.objects.create(
+                from_account=self.account,
+                to_account=self.account2,
+                company=self.company,
+                transfer_amount=1
+            )
+            Action.objects.filter(id=action.id).update(
+                last_updated=last_updated)
+            Transaction.objects.filter(id=transaction.id).update(
+                last_updated=last_updated)
+            Transfer.objects.filter(id=transfer.id).update(
+                last_updated=last_updated)
+            self.operations += [
+                ('transfer', transfer.id),
+                ('transaction', transaction.id),
+                ('action', action.id),
+            ]
+
+    def get_page(self, **params):
+        params.setdefault('start_date', self.start_date)
+        params.setdefault('end_date', self.end_date)
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+
+        return self.client.get(f'{OPERATION_URL}?{query}')
+
+    def test_get_operation_list_pages(self):
+        res = self.get_page(limit=4)
+        pages = [res.data]
+
+        while res.data['next']:
+            res = self.get_page(limit=4, cursor=res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data)
+
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn('total_action', pages[0])
+        self.assertEqual(
+            [
+                (item['type'], item['id'])
+                for page in pages
+                for group in page['data']
+                for item in group['data']
+            ],
+            self.operations
+        )
+        self.assertEqual(
+            [group['title'] for group in pages[1]['data']],
+            ['09.03.2020', '08.03.2020']
+        )
+        self.assertNotIn('continued', pages[0]['data'][0])
+        self.assertTrue(pages[1]['data'][0]['continued'])
+        self.assertTrue(pages[2]['data'][0]['continued'])
+        self.assertEqual(pages[0]['data'][0]['data'][2]['tags'],
+                         [self.tag.id])
+
+    def test_get_operation_list_page_new_day(self):
+        res = self.get_page(limit=3)
+        res = self.get_page(limit=3, cursor=res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data'][0]['title'], '09.03.2020')
+        self.assertFalse(res.data['data'][0]['continued'])
+
+    @patch.object(OperationListView, 'stream_chunk_size', 2)
+    def test_get_operation_list_stream(self):
+        res = self.get_page(stream='true')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+
+        data = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual(
+            [group['title'] for group in data['data']],
+            ['10.03.2020', '09.03.2020', '08.03.2020']
+        )
+        self.assertEqual(
+            [
+                (item['type'], item['id'])
+                for group in data['data']
+                for item in group['data']
+            ],
+            self.operations
+        )
+        self.assertEqual(data['data'][0]['data'][2]['tags'], [self.tag.id])
+        self.assertEqual(data['total_action'], 30)
+        self.assertEqual(data['total_transaction'], 9)
+
+    def test_get_operation_list_stream_empty(self):
+        res = self.get_page(stream='true', start_date='2019-01-01',
+                            end_date='2019-01-31')
+
+        data = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual(data, {
+            'data': [],
+            'total_action': 0,
+            'count_action': 0,
+            'total_transaction': 0,
+            'count_transaction': 0,
+            'total_transfer': 0,
+            'count_transfer': 0,
+        })
+
+    def get_export(self, **params):
+        params.setdefault('start_date', self.start_date)
+        params.setdefault('end_date', self.end_date)
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        res = self.client.get(f'{OPERATION_EXPORT_URL}?{query}')
+
+        return res, list(csv.DictReader(io.StringIO(
+            b''.join(res.streaming_content).decode())))
+
+    @patch.object(OperationListView, 'stream_chunk_size', 2)
+    def test_export_operations_csv(self):
+        res, rows = self.get_export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        self.assertEqual(
+            [(row['type'], int(row['id'])) for row in rows],
+            self.operations
+        )
+        self.assertEqual(rows[1]['category'], 'test category')
+        self.assertEqual(rows[1]['tags'], '')
+        self.assertEqual(rows[2]['tags'], 'tag')
+        self.assertEqual(rows[2]['account'], self.account.account_name)
+        self.assertEqual(rows[0]['to_account'], self.account2.account_name)
+
+    def test_export_operations_csv_filtered(self):
+        res, rows = self.get_export(type='transaction')
+
+        self.assertEqual(
+            [(row['type'], int(row['id'])) for row in rows],
+            [operation for operation in self.operations
+             if operation[0] == 'transaction']
+        )
+
+    def test_export_operations_csv_constant_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_export()
+
+        Action.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            action_amount=10
+        )
+
+        with self.assertNumQueries(len(queries)):
+            self.get_export(end_date='2099-01-01')
+
+    def test_get_operation_list_day_totals(self):
+        late_evening = datetime.datetime(
+            2020, 3, 10, 20, tzinfo=datetime.timezone.utc)
+        transaction = Transaction.objects.create(
+            account=self.account,
+            category=self.category,
+            company=self.company,
+            transaction_amount=5
+        )
+        Transaction.objects.filter(id=transaction.id).update(
+            last_updated=late_evening)
+
+        res = self.get_page(limit=50)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [group['title'] for group in res.data['data']],
+            ['11.03.2020', '10.03.2020', '09.03.2020', '08.03.2020']
+        )
+        self.assertEqual(
+            res.data['data'][0]['totals'],
+            {'action': 0, 'transaction': 5, 'transfer': 0}
+        )
+        self.assertEqual(
+            res.data['data'][1]['totals'],
+            {'action': 10, 'transaction': 3, 'transfer': 1}
+        )
+
+    def test_get_operation_list_invalid_cursor(self):
+        res = self.get_page(limit=4, cursor='invalid')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_operation_list_totals(self):
+        res = self.client.get(
+            f'{OPERATION_TOTALS_URL}?start_date={self.start_date}'
+            f'&end_date={self.end_date}&tag={self.tag.id}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['total_action'], 30)
+        self.assertEqual(res.data['total_transaction'], 0)
+
+    def test_get_operation_list_totals_tags_counted_once(self):
+        other_tag = Tag.objects.create(
+            tag_name="other tag", company=self.company)
+
+        for action in Action.objects.all():
+            action.tags.add(other_tag)
+
+        res = self.client.get(
+            f'{OPERATION_TOTALS_URL}?start_date={self.start_date}'
+            f'&end_date={self.end_date}&tag={self.tag.id},{other_tag.id}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['total_action'], 30)
+        self.assertEqual(res.data['count_action'], 3)
+
+    def test_get_operation_list_totals_breakdown(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                f'{OPERATION_TOTALS_URL}?start_date={self.start_date}'
+                f'&end_date={self.end_date}&breakdown=category,account'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            len([query for query in queries
+                 if 'UNION ALL' in query['sql']]), 1)
+        self.assertEqual(res.data['total_action'], 30)
+        self.assertEqual(res.data['total_transaction'], 9)
+        self.assertEqual(res.data['total_transfer'], 3)
+        self.assertEqual(res.data['count_transfer'], 3)
+        self.assertEqual(res.data['categories'], [{
+            'id': self.category.id,
+            'total_action': 30,
+            'count_action': 3,
+            'total_transaction': 9,
+            'count_transaction': 3,
+        }])
+        self.assertEqual(res.data['accounts'], [
+            {
+                'id': self.account.id,
+                'total_action': 30,
+                'count_action': 3,
+                'total_transaction': 9,
+                'count_transaction': 3,
+                'total_transfer_out': 3,
+                'count_transfer_out': 3,
+                'total_transfer_in': 0,
+                'count_transfer_in': 0,
+            },
+            {
+                'id': self.account2.id,
+                'total_action': 0,
+                'count_action': 0,
+                'total_transaction': 0,
+                'count_transaction': 0,
+                'total_transfer_out': 0,
+                'count_transfer_out': 0,
+                'total_transfer_in': 3,
+                'count_transfer_in': 3,
+            },
+        ])
+
+    def test_get_operation_list_totals_from_rollups(self):
+        url = f'{OPERATION_TOTALS_URL}?start_date={self.start_date}' \
+              f'&end_date={self.end_date}&breakdown=category,account'
+        expected = self.client.get(url).data
+        rebuild_rollups([self.company.id])
+
+        with self.settings(REPORTS_FROM_ROLLUPS=True), \
+                CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, expected)
+        self.assertEqual(
+            len([query for query in queries
+                 if 'core_dailyrollup' in query['sql']]), 1)
+
+    def test_get_operation_list_totals_invalid_breakdown(self):
+        res = self.client.get(
+            f'{OPERATION_TOTALS_URL}?start_date={self.start_date}'
+            f'&end_date={self.end_date}&breakdown=profile'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_operation_list_filter_type_and_amount(self):
+        res = self.get_page(limit=50, type='action,transaction', min_amount=5)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item['type'] for group in res.data['data']
+             for item in group['data']},
+            {'action'}
+        )
+
+    def test_get_operation_list_invalid_filter(self):
+        res = self.get_page(limit=50, type='loan')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
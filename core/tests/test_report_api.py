@@ -0,0 +1,181 @@
+import datetime
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Category, Action, Transaction, Tag
+from core.services import rebuild_rollups
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    REPORT_URL
+
+
+class PublicCoreApiTest(TestCase):
+    """Test unauthenticated recipe API request"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_report_auth_required(self):
+        res = self.client.get(REPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ReportTestMixin:
+    """Operations of the tested months"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.category = Category.objects.create(
+            category_name="test category", company=self.company)
+        self.category2 = Category.objects.create(
+            category_name="other category", company=self.company)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+
+        self.actions = [
+            self.add_action(self.account, self.category, 10, 2020, 1),
+            self.add_action(self.account2, self.category, 20, 2020, 1),
+            self.add_action(self.account, self.category2, 5, 2020, 3),
+        ]
+        self.add_transaction(self.account, self.category2, 7, 2020, 3)
+
+    def set_month(self, model, instance, year, month):
+        model.objects.filter(id=instance.id).update(
+            last_updated=datetime.datetime(
+                year, month, 15, 12, tzinfo=datetime.timezone.utc))
+
+    def add_action(self, account, category, amount, year, month):
+        action = Action.objects.create(
+            account=account,
+            category=category,
+            company=self.company,
+            action_amount=amount
+        )
+        self.set_month(Action, action, year, month)
+        return action
+
+    def add_transaction(self, account, category, amount, year, month):
+        transaction = Transaction.objects.create(
+            account=account,
+            category=category,
+            company=self.company,
+            transaction_amount=amount
+        )
+        self.set_month(Transaction, transaction, year, month)
+        return transaction
+
+    def get_report(self, **params):
+        params.setdefault('start_date', '2020-01-20')
+        params.setdefault('end_date', '2020-03-01')
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+
+        return self.client.get(f'{REPORT_URL}?{query}')
+
+
+class PrivateCustomerApiTests(ReportTestMixin, TestCase):
+    """Test authenticated API access"""
+
+    def test_get_report_by_category(self):
+        res = self.get_report()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [section['month'] for section in res.data['data']],
+            ['2020-01', '2020-02', '2020-03']
+        )
+
+        january, february, march = res.data['data']
+
+        self.assertEqual(january['total_action'], 30)
+        self.assertEqual(january['action'], [
+            {'category': self.category.id, 'total': 30, 'count': 2},
+        ])
+        self.assertEqual(february['action'], [])
+        self.assertEqual(march['total_transaction'], 7)
+        self.assertEqual(march['transaction'], [
+            {'category': self.category2.id, 'total': 7, 'count': 1},
+        ])
+
+    def test_get_report_by_account_and_profile(self):
+        res = self.get_report(group='account,profile')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data'][0]['action'], [
+            {'account': self.account.id, 'profile': self.profile.id,
+             'total': 10, 'count': 1},
+            {'account': self.account2.id, 'profile': self.profile.id,
+             'total': 20, 'count': 1},
+        ])
+
+    def test_get_report_filtered_by_tag(self):
+        tag = Tag.objects.create(tag_name="tag", company=self.company)
+        other_tag = Tag.objects.create(tag_name="other", company=self.company)
+        self.actions[0].tags.set([tag, other_tag])
+
+        res = self.get_report(tag=f'{tag.id},{other_tag.id}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data'][0]['action'], [
+            {'category': self.category.id, 'total': 10, 'count': 1},
+        ])
+        self.assertEqual(res.data['data'][2]['transaction'], [])
+
+    def test_get_report_past_months_cached(self):
+        self.get_report()
+
+        with self.assertNumQueries(1):
+            res = self.get_report()
+
+        self.assertEqual(res.data['data'][0]['total_action'], 30)
+
+    def test_get_report_invalid_params(self):
+        res = self.get_report(group='tag')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(REPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_report_from_rollups(self):
+        expected = self.get_report(group='account,profile').data
+        cache.clear()
+        rebuild_rollups([self.company.id])
+
+        with self.settings(REPORTS_FROM_ROLLUPS=True):
+            res = self.get_report(group='account,profile')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, expected)
+
+
+class CacheInvalidationApiTests(ReportTestMixin, TransactionTestCase):
+    """Test cached reports are invalidated once changes are committed"""
+
+    def test_get_report_cache_invalidated(self):
+        self.get_report()
+
+        Action.objects.get(id=self.actions[1].id).delete()
+        res = self.get_report()
+
+        self.assertEqual(res.data['data'][0]['total_action'], 10)
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from .helper import sample_profile, \
+    sample_company, \
+    sample_account, \
+    TEAMLIST_URL
+
+
+class PublicCoreApiTest(TestCase):
+    """Test unauthenticated recipe API request"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_team_list_auth_required(self):
+        res = self.client.get(TEAMLIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCustomerApiTests(TestCase):
+    """Test authenticated API access"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.account = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=1000
+        )
+
+    def add_team_member(self, index, balances):
+        user = get_user_model().objects.create_user(
+            email=f'member{index}@gleb.com',
+            password='otherpass',
+            username=f'member_{index}'
+        )
+        profile = sample_profile(user=user)
+        self.client.post('/api/v1/join-profile-to-company/', {
+            'profile_id': profile.id,
+            'profile_phone': profile.phone
+        }, format="json")
+
+        for balance in balances:
+            sample_account(
+                self=self,
+                profile=profile,
+                company=self.company,
+                balance=balance
+            )
+
+        return profile
+
+    def test_get_team_list_not_admin(self):
+        profile2 = self.add_team_member(1, [])
+
+        client2 = APIClient()
+        client2.force_authenticate(user=profile2.user)
+
+        res = client2.get(TEAMLIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_team_list_data(self):
+        profile2 = self.add_team_member(1, [100, 50])
+        profile3 = self.add_team_member(2, [])
+
+        res = self.client.get(TEAMLIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(
+            [(item['id'], item['balance']) for item in res.data['results']],
+            [
+                (self.profile.id, 1000),
+                (profile2.id, 150),
+                (profile3.id, 0),
+            ]
+        )
+
+    def test_get_team_list_paginated(self):
+        for index in range(6):
+            self.add_team_member(index, [index])
+
+        with CaptureQueriesContext(connection) as first_page:
+            res = self.client.get(f'{TEAMLIST_URL}?limit=2')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 7)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+        with CaptureQueriesContext(connection) as last_page:
+            res = self.client.get(f'{TEAMLIST_URL}?limit=5&offset=5')
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(len(first_page), len(last_page))
@@ -1,11 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipIf
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import IntegrityError, OperationalError, connection, \
+    transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils.timezone import localdate
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Transfer
+from core.models import Company, Transfer, DailyRollup
 from core.serializers import TransferSerializer
+from core.services import main as services
+from core.services.rollups import add_to_rollup
 from .helper import sample_profile, \
     sample_company, \
     sample_account, \
@@ -69,6 +78,43 @@ class PrivateCustomerApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_filter_transfers_by_account(self):
+        account3 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+        outgoing = Transfer.objects.create(
+            from_account=self.account1,
+            to_account=self.account2,
+            transfer_amount=100,
+            company=self.company,
+        )
+        incoming = Transfer.objects.create(
+            from_account=account3,
+            to_account=self.account1,
+            transfer_amount=100,
+            company=self.company,
+        )
+        Transfer.objects.create(
+            from_account=self.account2,
+            to_account=account3,
+            transfer_amount=100,
+            company=self.company,
+        )
+
+        res = self.client.get(f'{TRANSFER_URL}?account={self.account1.id}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(item['id'] for item in res.data),
+            [outgoing.id, incoming.id]
+        )
+
+        res = self.client.get(f'{TRANSFER_URL}?tag=1')
+
+        self.assertEqual(res.data, [])
+
     def test_make_transfer_other_self(self):
         """ Transfer from self account to another self account """
 
@@ -120,6 +166,93 @@ class PrivateCustomerApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_transfer_rollups(self):
+        payload = {
+            "from_account": self.account1.id,
+            "to_account": self.account2.id,
+            "transfer_amount": 10,
+            "company": self.company.id
+        }
+
+        res = self.client.post(TRANSFER_URL, payload)
+
+        self.assertEqual(
+            sorted(DailyRollup.objects.values_list(
+                'kind', 'account_id', 'total', 'count')),
+            [
+                ('transfer_in', self.account2.id, 10, 1),
+                ('transfer_out', self.account1.id, 10, 1),
+            ]
+        )
+
+        self.client.delete(f"{TRANSFER_URL}{res.data['id']}/")
+
+        self.assertEqual(
+            list(DailyRollup.objects.values_list('total', 'count')),
+            [(0, 0), (0, 0)]
+        )
+
+    def test_transfer_rollup_is_unique(self):
+        day = localdate()
+
+        for _ in range(2):
+            add_to_rollup(self.company.id, self.account1.id, None, day,
+                          'transfer_out', 10, 1)
+
+        self.assertEqual(
+            list(DailyRollup.objects.values_list('category', 'total',
+                                                 'count')),
+            [(None, 20, 2)]
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyRollup.objects.create(
+                company=self.company, account=self.account1, day=day,
+                kind='transfer_out')
+
+    def test_delete_transfer_restores_balances(self):
+        res = self.client.post(TRANSFER_URL, {
+            "from_account": self.account1.id,
+            "to_account": self.account2.id,
+            "transfer_amount": 10,
+        })
+
+        self.client.delete(f"{TRANSFER_URL}{res.data['id']}/")
+
+        self.account1.refresh_from_db()
+        self.account2.refresh_from_db()
+
+        self.assertEqual(self.account1.balance, 1000)
+        self.assertEqual(self.account2.balance, 0)
+
+    def test_make_transfer_other_company(self):
+        """ Transfer to an account of another company """
+        user2 = get_user_model().objects.create_user(
+            email='other@gleb.com',
+            password='otherpass',
+            username='test_1'
+        )
+        profile2 = sample_profile(user=user2)
+        company2 = Company.objects.create(company_name='other')
+        account2 = sample_account(
+            self=self,
+            profile=profile2,
+            company=company2
+        )
+
+        res = self.client.post(TRANSFER_URL, {
+            "from_account": self.account1.id,
+            "to_account": account2.id,
+            "transfer_amount": 10,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transfer.objects.exists())
+
+        self.account1.refresh_from_db()
+
+        self.assertEqual(self.account1.balance, 1000)
+
     def test_make_transfer_same_self(self):
         """ Transfer from self account to same self account """
 
@@ -221,3 +354,137 @@ class PrivateCustomerApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+
+class TransferRetryTests(TransactionTestCase):
+    """Test transfers retried after the database aborts them"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.account1 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=1000
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company
+        )
+        self.profile.refresh_from_db()
+
+    def get_error(self, pgcode):
+        cause = Exception('deadlock detected')
+        cause.pgcode = pgcode
+        error = OperationalError(*cause.args)
+        error.__cause__ = cause
+
+        return error
+
+    def test_transfer_retried_on_deadlock(self):
+        apply_transfer = services.apply_transfer
+        errors = [self.get_error('40P01')]
+
+        def fail_once(*args):
+            if errors:
+                raise errors.pop()
+
+            return apply_transfer(*args)
+
+        with patch.object(services, 'apply_transfer',
+                          side_effect=fail_once) as mock:
+            transfer = services.make_transfer(
+                self.profile, self.account1.id, self.account2.id, 10)
+
+        self.account1.refresh_from_db()
+
+        self.assertEqual(mock.call_count, 2)
+        self.assertEqual(Transfer.objects.get().id, transfer.id)
+        self.assertEqual(self.account1.balance, 990)
+
+    def test_transfer_not_retried_on_other_errors(self):
+        with patch.object(services, 'apply_transfer',
+                          side_effect=self.get_error(None)) as mock:
+            with self.assertRaises(OperationalError):
+                services.make_transfer(
+                    self.profile, self.account1.id, self.account2.id, 10)
+
+        self.assertEqual(mock.call_count, 1)
+
+    def test_transfer_retries_exhausted(self):
+        with patch.object(services, 'apply_transfer',
+                          side_effect=self.get_error('40001')) as mock:
+            with self.assertRaises(OperationalError):
+                services.make_transfer(
+                    self.profile, self.account1.id, self.account2.id, 10,
+                    retries=2)
+
+        self.assertEqual(mock.call_count, 2)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite serializes all writers')
+class ConcurrentTransferApiTests(TransactionTestCase):
+    """Test transfers crossing the same accounts in both directions"""
+
+    transfers = 200
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            username='test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.profile = sample_profile(user=self.user)
+        self.company = sample_company(self)
+        self.account1 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=1000
+        )
+        self.account2 = sample_account(
+            self=self,
+            profile=self.profile,
+            company=self.company,
+            balance=1000
+        )
+
+    def write(self, index):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        accounts = (self.account1.id, self.account2.id)
+
+        if index % 2:
+            accounts = accounts[::-1]
+
+        try:
+            return client.post(TRANSFER_URL, {
+                "from_account": accounts[0],
+                "to_account": accounts[1],
+                "transfer_amount": 1 + index % 2,
+            }).status_code
+        finally:
+            connection.close()
+
+    def test_crossing_transfers(self):
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            codes = list(executor.map(self.write, range(self.transfers)))
+
+        self.account1.refresh_from_db()
+        self.account2.refresh_from_db()
+
+        self.assertEqual(codes, [status.HTTP_201_CREATED] * self.transfers)
+        # every pair moves 1 from account1 and 2 back to it
+        self.assertEqual(self.account1.balance, 1000 + self.transfers // 2)
+        self.assertEqual(self.account2.balance, 1000 - self.transfers // 2)
@@ -19,7 +19,21 @@ router.register("transaction", views.TransactionViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('home-list/', views.home_list.HomeListView.as_view()),
+    path('team-list/', views.team_list.TeamListView.as_view()),
     path('operation-list/', views.operation_list.OperationListView.as_view()),
+    path('operation-list/totals/',
+         views.operation_list.OperationTotalsView.as_view()),
+    path('export/operations.csv',
+         views.operation_list.OperationExportView.as_view()),
+    path('operation-batch/',
+         views.imports.OperationBatchView.as_view()),
+    path('import/operations/',
+         views.imports.OperationImportView.as_view()),
+    path('balance-history/',
+         views.balance_history.BalanceHistoryView.as_view()),
+    path('balances/as-of/',
+         views.balance_history.BalanceAsOfView.as_view()),
+    path('reports/monthly/', views.reports.MonthlyReportView.as_view()),
     path('join-profile-to-company/', views.JoinProfileToCompany.as_view()),
     path('remove-profile-from-company/',
          views.RemoveProfileFromCompany.as_view())
@@ -1,3 +1,7 @@
 from .main import *
 from .operation_list import *
 from .home_list import *
+from .team_list import *
+from .reports import *
+from .balance_history import *
+from .imports import *
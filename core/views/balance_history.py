@@ -0,0 +1,186 @@
+from django.utils.timezone import localdate
+
+from rest_framework import status, schemas
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+import coreapi
+import coreschema
+
+from core.filters import parse_date, parse_ids
+from core.mixins import ServiceExceptionHandlerMixin
+from core.services import get_balance_history, get_balances_as_of, \
+    refresh_ledger_balances
+from core import models
+
+
+class BalanceHistoryViewSchema(schemas.AutoSchema):
+
+    def get_manual_fields(self, path, method):
+        extra_fields = []
+
+        if method.lower() in ['get', ]:
+            extra_fields = [
+                coreapi.Field(
+                    'start_date',
+                    required=True,
+                    location='query',
+                    schema=coreschema.String()
+                ),
+                coreapi.Field(
+                    'end_date',
+                    required=True,
+                    location='query',
+                    schema=coreschema.String()
+                ),
+                coreapi.Field(
+                    'account',
+                    location='query',
+                    schema=coreschema.Array()
+                ),
+            ]
+
+        manual_fields = super().get_manual_fields(path, method)
+        return manual_fields + extra_fields
+
+
+class BalanceHistoryView(ServiceExceptionHandlerMixin, APIView):
+    """
+    Custom View to get closing balances of accounts for every day
+
+    ``data`` of every account and ``total`` of all of them are aligned
+    with ``days``.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    schema = BalanceHistoryViewSchema()
+
+    max_days = 1096
+
+    def get_days(self, request):
+        start_date = parse_date(request.query_params.get('start_date'))
+        end_date = parse_date(request.query_params.get('end_date'))
+
+        if start_date is None or end_date is None:
+            raise ValueError('Неверный диапазон дат')
+
+        start_day = localdate(start_date)
+        end_day = min(localdate(end_date), localdate())
+
+        if start_day > end_day or \
+                (end_day - start_day).days >= self.max_days:
+            raise ValueError('Неверный диапазон дат')
+
+        return start_day, end_day
+
+    def get(self, request):
+        profile = models.Profile.objects.select_related('company')\
+            .get(user=self.request.user)
+
+        if profile.company is None:
+            return Response(
+                {"detail": "Сначала необходимо создать компанию "
+                           "или присоединиться к ней."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start_day, end_day = self.get_days(request)
+        account_ids = parse_ids(request.query_params.get('account', ''))
+
+        refresh_ledger_balances(profile.company_id)
+        accounts = models.Account.objects.filter(company=profile.company) \
+            if profile.is_admin \
+            else models.Account.objects.filter(profile=profile)
+
+        if account_ids:
+            accounts = accounts.filter(id__in=account_ids)
+
+        accounts = list(accounts.order_by('id'))
+        days, history = get_balance_history(accounts, start_day, end_day)
+
+        return Response({
+            'days': days,
+            'accounts': [
+                {
+                    'id': account.id,
+                    'name': account.account_name,
+                    'data': history[account.id],
+                }
+                for account in accounts
+            ],
+            'total': [sum(balances) for balances in zip(*history.values())]
+            if history else [0 for day in days],
+        }, status=status.HTTP_200_OK)
+
+
+class BalanceAsOfViewSchema(schemas.AutoSchema):
+
+    def get_manual_fields(self, path, method):
+        extra_fields = []
+
+        if method.lower() in ['get', ]:
+            extra_fields = [
+                coreapi.Field(
+                    'date',
+                    required=True,
+                    location='query',
+                    schema=coreschema.String()
+                ),
+            ]
+
+        manual_fields = super().get_manual_fields(path, method)
+        return manual_fields + extra_fields
+
+
+class BalanceAsOfView(ServiceExceptionHandlerMixin, APIView):
+    """
+    Custom View to get closing balances of accounts at the end of a day
+
+    Balances are read from the nearest monthly checkpoint, see
+    ``rebuild_balance_checkpoints``. Accounts created after ``date`` are
+    left out.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    schema = BalanceAsOfViewSchema()
+
+    def get(self, request):
+        profile = models.Profile.objects.select_related('company')\
+            .get(user=self.request.user)
+
+        if profile.company is None:
+            return Response(
+                {"detail": "Сначала необходимо создать компанию "
+                           "или присоединиться к ней."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        date = parse_date(request.query_params.get('date'), end_of_day=True)
+
+        if date is None or localdate(date) > localdate():
+            raise ValueError('Неверная дата')
+
+        refresh_ledger_balances(profile.company_id)
+        accounts = models.Account.objects.filter(company=profile.company) \
+            if profile.is_admin \
+            else models.Account.objects.filter(profile=profile)
+
+        accounts = list(accounts.filter(created__lte=date).order_by('id'))
+        balances = get_balances_as_of(accounts, localdate(date))
+
+        return Response({
+            'date': localdate(date),
+            'accounts': [
+                {
+                    'id': account.id,
+                    'name': account.account_name,
+                    'balance': balances[account.id],
+                }
+                for account in accounts
+            ],
+            'total': sum(balances.values()),
+        }, status=status.HTTP_200_OK)
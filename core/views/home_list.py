@@ -7,12 +7,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from operator import itemgetter
-
 import coreapi
 import coreschema
 
+from core.cache import get_home_list_cache_key, get_home_list, \
+    set_home_list
 from core.mixins import ServiceExceptionHandlerMixin
+from core.services import latest_operations, get_operation_account_ids, \
+    get_team_balances, refresh_ledger_balances, AccountNames
 from core import models
 
 
@@ -44,28 +46,22 @@ class HomeListView(ServiceExceptionHandlerMixin, APIView):
             "detail": detail
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    def get_action_name(self, action):
-        if action.account.profile.company.profiles.count() > 1:
-            return f"{action.account.profile.first_name[:1]}. {action.account.profile.last_name} ({action.account.account_name})"
-        else:
-            return action.account.account_name
+    def get(self, request):
+        # Compacting the ledger bumps the company version, so it is done
+        # before the version is read into the cache key.
+        refresh_ledger_balances(
+            models.Profile.objects.filter(user=request.user)
+            .values_list('company_id', flat=True).first()
+        )
+        cache_key = get_home_list_cache_key(
+            request.user, request.query_params.get('profile_id'))
 
-    def get_transaction_name(self, transaction):
-        if transaction.account.profile.company.profiles.count() > 1:
-            return f"{transaction.account.profile.first_name[:1]}. {transaction.account.profile.last_name} ({transaction.account.account_name})"
-        else:
-            return transaction.account.account_name
-
-    def get_transfer_name(self, transfer):
-        if transfer.from_account.profile.company.profiles.count() > 1:
-            return (f"{transfer.from_account.profile.first_name[:1]}. {transfer.from_account.profile.last_name} "
-                    f"({transfer.from_account.account_name}) => "
-                    f"{transfer.to_account.profile.first_name[:1]}. {transfer.to_account.profile.last_name} "
-                    f"({transfer.to_account.account_name})")
-        else:
-            return f"{transfer.from_account.account_name} => {transfer.to_account.account_name}"
+        if cache_key is not None:
+            home_data = get_home_list(cache_key)
+
+            if home_data is not None:
+                return Response(home_data, status=status.HTTP_200_OK)
 
-    def get(self, request):
         req_profile = None
         profile_queryset = models.Profile.objects.select_related('company')
 
@@ -110,24 +106,22 @@ class HomeListView(ServiceExceptionHandlerMixin, APIView):
 
         data = [account_data]
 
-        if 'profile_id' not in request.query_params and req_profile.is_admin and company.profiles.count() > 1:
+        team_size = company.profiles.count()
+
+        if 'profile_id' not in request.query_params and req_profile.is_admin and team_size > 1:
             profile_data = {
                 'navigate': "CreateTeam",
                 'title': "Команда",
                 'data': [],
             }
 
-            profiles = company.profiles.order_by('id')[:5]
+            profiles = get_team_balances(company)[:5]
 
             for item in profiles:
-                balance_sum = models.Account.objects.filter(profile=item).aggregate(
-                    balance__sum=Coalesce(Sum('balance'), 0)
-                )['balance__sum']
-
                 new_item = {
                     'id': item.id,
                     'name': f"{item.first_name} {item.last_name}",
-                    'balance': balance_sum,
+                    'balance': item.balance_sum,
                     'last_updated': item.last_updated,
                     'type': "profile",
                 }
@@ -182,53 +176,42 @@ class HomeListView(ServiceExceptionHandlerMixin, APIView):
             'data': [],
         }
 
-        actions = models.Action.objects.filter(account__in=accounts)
-
-        for item in actions:
-            new_item = {
-                'id': item.id,
-                'name': self.get_action_name(item),
-                'balance': item.action_amount, 'last_updated': item.last_updated, 'type': "action", }
-            operation_data['data'].append(new_item)
-
-        transactions = models.Transaction.objects.filter(
-            account__in=accounts)
-
-        for item in transactions:
-            new_item = {
-                'id': item.id,
-                'name': self.get_transaction_name(item),
-                'balance': item.transaction_amount,
-                'last_updated': item.last_updated,
-                'type': "transaction",
-            }
-            operation_data['data'].append(new_item)
-
-        transfers_list = [*models.Transfer.objects.filter(
-            from_account__in=accounts
-        ), *models.Transfer.objects.filter(
-            to_account__in=accounts
-        )]
-
-        transfers = [i for n, i in enumerate(
-            transfers_list) if i not in transfers_list[n + 1:]]
+        operations = latest_operations(company.id, limit=10)
+        names = AccountNames(
+            get_operation_account_ids(operations),
+            with_profile=team_size > 1
+        )
 
-        for item in transfers:
-            new_item = {
-                'id': item.id,
-                'name': self.get_transfer_name(item),
-                'balance': item.transfer_amount,
-                'last_updated': item.last_updated,
-                'from_account': f"{item.from_account.account_name} (pk={item.from_account.id})",
-                'to_account': f"{item.to_account.account_name} (pk={item.to_account.id})",
-                'type': "transfer",
-            }
+        for operation_type, item in operations:
+            if operation_type == 'action':
+                new_item = {
+                    'id': item.id,
+                    'name': names.name(item.account_id),
+                    'balance': item.action_amount,
+                    'last_updated': item.last_updated,
+                    'type': "action",
+                }
+            elif operation_type == 'transaction':
+                new_item = {
+                    'id': item.id,
+                    'name': names.name(item.account_id),
+                    'balance': item.transaction_amount,
+                    'last_updated': item.last_updated,
+                    'type': "transaction",
+                }
+            else:
+                new_item = {
+                    'id': item.id,
+                    'name': names.transfer_name(
+                        item.from_account_id, item.to_account_id),
+                    'balance': item.transfer_amount,
+                    'last_updated': item.last_updated,
+                    'from_account': names.label(item.from_account_id),
+                    'to_account': names.label(item.to_account_id),
+                    'type': "transfer",
+                }
             operation_data['data'].append(new_item)
 
-        operation_data['data'].sort(
-            key=itemgetter('last_updated'), reverse=True)
-        operation_data['data'] = operation_data['data'][:10]
-
         data.append(operation_data)
 
         home_data = {
@@ -236,4 +219,7 @@ class HomeListView(ServiceExceptionHandlerMixin, APIView):
             "data": data
         }
 
+        if cache_key is not None:
+            set_home_list(cache_key, home_data)
+
         return Response(home_data, status=status.HTTP_200_OK)
@@ -0,0 +1,94 @@
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.idempotency import idempotent
+from core.mixins import ServiceExceptionHandlerMixin
+from core.services import import_operations, read_import_rows, \
+    create_operation_batch
+from core import models
+
+
+class OperationImportView(ServiceExceptionHandlerMixin, APIView):
+    """
+    Custom View to import actions and transactions from a CSV or JSON file
+
+    The ``file`` may use only the accounts of the user. Valid rows are
+    created in chunks, invalid ones are returned in ``errors`` with
+    their row number.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser,)
+
+    chunk_size = 1000
+
+    def post(self, request):
+        profile = models.Profile.objects.select_related('company')\
+            .get(user=self.request.user)
+
+        if profile.company is None:
+            return Response(
+                {"detail": 'Вы не являетесь сотрудником компании'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file = request.FILES.get('file')
+
+        if file is None:
+            return Response(
+                {"detail": 'Файл не найден'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = import_operations(
+            profile,
+            read_import_rows(file, file.name),
+            chunk_size=self.chunk_size
+        )
+
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class OperationBatchView(ServiceExceptionHandlerMixin, APIView):
+    """
+    Custom View to create a batch of actions and transactions at once
+
+    Takes ``operations``, a list of items with a ``client_id``, ``type``,
+    ``account``, ``category``, ``amount`` and optional ``tags`` and
+    ``last_updated``. Returns a result for every item in the same order,
+    valid items are created even if others fail. Items whose ``client_id``
+    was pushed before are reported as existing.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    max_batch_size = 500
+
+    @idempotent
+    def post(self, request):
+        profile = models.Profile.objects.select_related('company')\
+            .get(user=self.request.user)
+
+        if profile.company is None:
+            return Response(
+                {"detail": 'Вы не являетесь сотрудником компании'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items = request.data.get('operations') \
+            if isinstance(request.data, dict) else None
+
+        if not isinstance(items, list) or not items or \
+                len(items) > self.max_batch_size:
+            return Response(
+                {"detail": 'Некорректные данные'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'results': create_operation_batch(profile, items),
+        }, status=status.HTTP_200_OK)
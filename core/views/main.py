@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.utils.timezone import make_aware
 from django.core.mail import send_mail
+from django.db import transaction
 from django.db.models import Sum
 from django.db.models.functions import Coalesce
 
@@ -9,13 +10,18 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 
-import decimal
 import coreapi
 import coreschema
 
-from core.services import make_transfer, is_date
+from core.services import make_transfer, is_date, update_rollups, \
+    update_checkpoints, change_balances, adjust_balance, get_statement, \
+    refresh_ledger_balances, delete_operation
+from core.pagination import StatementCursor
+from core.filters import OperationFilter
+from core.idempotency import idempotent
 from core.mixins import ServiceExceptionHandlerMixin
 from core import serializers, models
 
@@ -197,12 +203,16 @@ class AccountViewSet(viewsets.ModelViewSet):
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated, )
 
+    statement_default_limit = 50
+    statement_max_limit = 500
+
     def get_queryset(self):
         if models.Profile.objects\
                 .filter(user=self.request.user,
                         company__isnull=False).exists():
             profile = models.Profile.objects\
                 .filter(user=self.request.user)[0]
+            refresh_ledger_balances(profile.company_id)
 
             return models.Account.objects\
                 .filter(profile=profile, company=profile.company)\
@@ -211,7 +221,8 @@ class AccountViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(profile=models.Profile.objects.get(
             user=self.request.user), company=models.Profile.objects.get(
-            user=self.request.user).company)
+            user=self.request.user).company,
+            opening_balance=serializer.validated_data.get('balance', 0))
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -247,8 +258,17 @@ class AccountViewSet(viewsets.ModelViewSet):
             headers=headers
         )
 
+    @transaction.atomic
     def perform_update(self, serializer, pk=None):
+        instance = serializer.instance
+        balance = serializer.validated_data.pop('balance', instance.balance)
+
+        # edits are changes, so concurrent writers and the ledger are kept
+        if balance != instance.balance:
+            adjust_balance(instance, balance - instance.balance)
+
         serializer.save()
+        instance.balance = balance
 
     def update(self, request, pk=None):
         instance = self.get_object()
@@ -274,6 +294,54 @@ class AccountViewSet(viewsets.ModelViewSet):
             headers=headers
         )
 
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """
+        Operations on the account newest first, each with the account
+        balance right after it, paginated by ``cursor`` and ``limit``
+        """
+        profile = models.Profile.objects.get(user=self.request.user)
+
+        if profile.company is None:
+            content = {"detail": 'Вы не являетесь сотрудником компании'}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+
+        refresh_ledger_balances(profile.company_id)
+        accounts = models.Account.objects.filter(company=profile.company) \
+            if profile.is_admin \
+            else models.Account.objects.filter(profile=profile)
+        account = get_object_or_404(accounts, pk=pk)
+
+        try:
+            limit = min(int(request.query_params.get(
+                'limit', self.statement_default_limit)),
+                self.statement_max_limit)
+            position = StatementCursor.decode(
+                request.query_params['cursor']) \
+                if request.query_params.get('cursor') else None
+        except ValueError:
+            content = {"detail": 'Неверные параметры страницы'}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+
+        if limit < 1:
+            content = {"detail": 'Неверные параметры страницы'}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = get_statement(account, limit + 1, position)
+        next_cursor = None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = StatementCursor.encode(
+                last['last_updated'], last['type'], last['id'],
+                last['balance'] - last['amount'])
+
+        return Response({
+            'next': next_cursor,
+            'results': rows,
+        }, status=status.HTTP_200_OK)
+
     def destroy(self, request, pk=None):
         instance = self.get_object()
 
@@ -298,7 +366,8 @@ class AccountViewSet(viewsets.ModelViewSet):
             )
 
 
-class ActionViewSet(mixins.CreateModelMixin,
+class ActionViewSet(ServiceExceptionHandlerMixin,
+                    mixins.CreateModelMixin,
                     mixins.RetrieveModelMixin,
                     mixins.DestroyModelMixin,
                     mixins.ListModelMixin,
@@ -324,7 +393,10 @@ class ActionViewSet(mixins.CreateModelMixin,
                 accounts = models.Account.objects\
                     .filter(profile=profile, company=profile.company)
 
-            return self.queryset.filter(account__in=accounts)\
+            operation_filter = OperationFilter.from_query_params(
+                self.request.query_params)
+
+            return operation_filter.get_queryset('action', accounts)\
                 .order_by('-last_updated')
 
     def perform_create(self, serializer):
@@ -334,7 +406,11 @@ class ActionViewSet(mixins.CreateModelMixin,
             .get(pk=self.request.data['account'])
         serializer.save(account=account,
                         company=profile.company)
+        update_rollups('action', serializer.instance)
+        update_checkpoints('action', serializer.instance)
 
+    @idempotent
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -362,17 +438,24 @@ class ActionViewSet(mixins.CreateModelMixin,
         return Response(serializer.data, status=status.HTTP_201_CREATED,
                         headers=headers)
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        account = models.Account.objects.get(id=instance.account.id)
+    def perform_destroy(self, instance):
+        if not delete_operation(instance):
+            return
 
-        account.balance -= instance.action_amount
-        account.save()
+        change_balances(instance.company_id, {
+            instance.account_id: -instance.action_amount,
+        })
+        update_rollups('action', instance, sign=-1)
+        update_checkpoints('action', instance, sign=-1)
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
         return super(ActionViewSet, self)\
             .destroy(request, *args, **kwargs)
 
 
-class TransferViewSet(mixins.CreateModelMixin,
+class TransferViewSet(ServiceExceptionHandlerMixin,
+                      mixins.CreateModelMixin,
                       mixins.RetrieveModelMixin,
                       mixins.DestroyModelMixin,
                       mixins.ListModelMixin,
@@ -399,15 +482,13 @@ class TransferViewSet(mixins.CreateModelMixin,
                 accounts = models.Account.objects\
                     .filter(profile=profile, company=profile.company)
 
-            return self.queryset.filter(from_account__in=accounts)\
-                .order_by('-last_updated') \
-                or self.queryset.filter(to_account__in=accounts)\
-                .order_by('-last_updated')
+            operation_filter = OperationFilter.from_query_params(
+                self.request.query_params)
 
-    def perform_create(self, serializer):
-        serializer.save(company=models.Profile.objects.get(
-            user=self.request.user).company)
+            return operation_filter.get_queryset('transfer', accounts)\
+                .order_by('-last_updated')
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -416,85 +497,79 @@ class TransferViewSet(mixins.CreateModelMixin,
             content = {"detail": 'Сумма операции должна быть положительной'}
             return Response(content, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            profile = models.Profile.objects\
-                .all().filter(user=self.request.user)[0]
-            transfer_from_account = models.Account\
-                .objects.filter(profile=profile)\
-                .get(
-                    pk=self.request.data['from_account']
-                )
-        except Exception as e:
-            print(e)
+        transfer_from_account = serializer.validated_data['from_account']
+        transfer_to_account = serializer.validated_data['to_account']
+        profile = transfer_from_account.profile
+
+        if profile.user_id != self.request.user.id:
             content = {"detail": 'Указанный счет не найден'}
             return Response(content, status=status.HTTP_400_BAD_REQUEST)
 
-        if models.Profile.objects.get(
-                user=self.request.user).company is None:
+        if profile.company_id is None:
             content = {"detail": 'Вы не являетесь сотрудником компании'}
             return Response(content, status=status.HTTP_400_BAD_REQUEST)
 
-        transfer_to_account = models.Account.objects.get(
-            pk=self.request.data['to_account']
-        )
-
         try:
-            if transfer_from_account.profile != transfer_to_account.profile:
-                send_mail(
-                    'Подтвердите перевод в ' +
-                    transfer_from_account.profile.company.company_name,
-                    transfer_from_account.profile.first_name +
-                    " " +
-                    transfer_from_account.profile.last_name +
-                    " перевел Вам " +
-                    str(self.request.data['transfer_amount']) +
-                    " ₽. Если Вы не получили данную" +
-                    " сумму денежных средств, перейдите в " +
-                    "приложение и удалите операцию.",
-                    'Команда Mncntrl.ru <service@mncntrl.ru>',
-                    [models.Account.objects.get(
-                        pk=self.request.data["to_account"]
-                    ).profile.user.email, ],
-                    fail_silently=False,
-                )
-        except Exception as e:
-            print(e)
-            return Response(
-                {
-                    "detail":
-                    'Произошла ошибка на сервере. Повторите попытку позже.'
-                },
-                status=status.HTTP_400_BAD_REQUEST
+            serializer.instance = make_transfer(
+                profile,
+                transfer_from_account.id,
+                transfer_to_account.id,
+                serializer.validated_data['transfer_amount']
             )
-
-        try:
-            make_transfer(**serializer.validated_data)
         except ValueError as e:
             content = {
                 "detail": str(e)
             }
             return Response(content, status=status.HTTP_400_BAD_REQUEST)
 
-        self.perform_create(serializer)
+        if profile != transfer_to_account.profile:
+            transaction.on_commit(lambda: self.send_transfer_mail(
+                transfer_from_account, transfer_to_account))
+
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED,
                         headers=headers)
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        to_account = models.Account.objects.get(id=instance.to_account.id)
+    def send_transfer_mail(self, from_account, to_account):
+        """Notify the receiver, the transfer is saved even if it fails"""
+        try:
+            send_mail(
+                'Подтвердите перевод в ' +
+                from_account.profile.company.company_name,
+                from_account.profile.first_name +
+                " " +
+                from_account.profile.last_name +
+                " перевел Вам " +
+                str(self.request.data['transfer_amount']) +
+                " ₽. Если Вы не получили данную" +
+                " сумму денежных средств, перейдите в " +
+                "приложение и удалите операцию.",
+                'Команда Mncntrl.ru <service@mncntrl.ru>',
+                [to_account.profile.user.email, ],
+                fail_silently=False,
+            )
+        except Exception as e:
+            print(e)
 
-        to_account.balance -= instance.transfer_amount
-        to_account.save()
+    def perform_destroy(self, instance):
+        if not delete_operation(instance):
+            return
 
-        from_account = models.Account.objects.get(id=instance.from_account.id)
-        from_account.balance += instance.transfer_amount
-        from_account.save()
+        change_balances(instance.company_id, {
+            instance.from_account_id: instance.transfer_amount,
+            instance.to_account_id: -instance.transfer_amount,
+        })
+        update_rollups('transfer', instance, sign=-1)
+        update_checkpoints('transfer', instance, sign=-1)
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
         return super(TransferViewSet, self)\
             .destroy(request, *args, **kwargs)
 
 
-class TransactionViewSet(mixins.CreateModelMixin,
+class TransactionViewSet(ServiceExceptionHandlerMixin,
+                         mixins.CreateModelMixin,
                          mixins.RetrieveModelMixin,
                          mixins.DestroyModelMixin,
                          mixins.ListModelMixin,
@@ -520,13 +595,24 @@ class TransactionViewSet(mixins.CreateModelMixin,
                 accounts = models.Account.objects\
                     .filter(profile=profile, company=profile.company)
 
-            return self.queryset.filter(account__in=accounts)\
+            operation_filter = OperationFilter.from_query_params(
+                self.request.query_params)
+
+            return operation_filter.get_queryset('transaction', accounts)\
                 .order_by('-last_updated')
 
     def perform_create(self, serializer):
         serializer.save(company=models.Profile.objects.get(
             user=self.request.user).company)
-
+        change_balances(serializer.instance.company_id, {
+            serializer.instance.account_id:
+            -serializer.instance.transaction_amount,
+        })
+        update_rollups('transaction', serializer.instance)
+        update_checkpoints('transaction', serializer.instance)
+
+    @idempotent
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -550,28 +636,23 @@ class TransactionViewSet(mixins.CreateModelMixin,
             content = {"detail": 'Вы не являетесь сотрудником компании'}
             return Response(content, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            account = models.Account.objects.get(
-                id=self.request.data['account']
-            )
-            account.balance = account.balance - \
-                decimal.Decimal(self.request.data['transaction_amount'])
-            account.save()
-
-        except ValueError:
-            content = {"detail": 'Некорректные данные'}
-            return Response(content, status=status.HTTP_400_BAD_REQUEST)
-
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED,
                         headers=headers)
 
+    def perform_destroy(self, instance):
+        if not delete_operation(instance):
+            return
+
+        change_balances(instance.company_id, {
+            instance.account_id: instance.transaction_amount,
+        })
+        update_rollups('transaction', instance, sign=-1)
+        update_checkpoints('transaction', instance, sign=-1)
+
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        account = models.Account.objects.get(id=instance.account.id)
-        account.balance += instance.transaction_amount
-        account.save()
         return super(TransactionViewSet, self)\
             .destroy(request, *args, **kwargs)
 
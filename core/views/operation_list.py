@@ -1,24 +1,31 @@
-from django.db.models import Sum, Q
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models.functions import Coalesce
-from django.utils.timezone import make_aware
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.timezone import localtime
 
 from rest_framework import status, schemas
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from operator import itemgetter
-from collections import defaultdict
+from itertools import groupby, islice
+
+import csv
+import json
 
 from dateutil import parser
 
 import coreapi
 import coreschema
 
-from core.services import is_date
+from core.services import is_date, get_operation_account_ids, \
+    attach_operation_tags, filter_operations_after, merge_operations, \
+    tag_operations, annotate_day, get_daily_totals, get_operation_totals, \
+    AccountNames, TOTAL_BREAKDOWNS
+from core.filters import OperationFilter
 from core.mixins import ServiceExceptionHandlerMixin
+from core.pagination import OperationCursor
 from core import models
 
 
@@ -30,6 +37,125 @@ def is_date(date_str):
         return False
 
 
+def get_day_title(day):
+    return day.strftime('%d.%m.%Y')
+
+
+def iter_day_groups(operations, names, daily_totals):
+    """
+    Yield day sections of ``(type, instance)`` pairs ordered newest first.
+
+    Instances are annotated with ``day`` by the database, every section
+    carries the day ``totals`` from ``daily_totals``.
+    """
+    for day, day_operations in groupby(
+            operations, key=lambda operation: operation[1].day):
+        yield {
+            "title": get_day_title(day),
+            "totals": daily_totals[day],
+            "data": [
+                get_operation_item(operation_type, item, names)
+                for operation_type, item in day_operations
+            ],
+        }
+
+
+def to_json(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False,
+                      separators=(',', ':'))
+
+
+def get_action_item(item, names):
+    return {
+        'id': item.id,
+        'name': names.name(item.account_id),
+        'account': item.account_id,
+        'style': "color-success-600",
+        'balance': item.action_amount,
+        'last_updated': item.last_updated,
+        'category': item.category_id,
+        'tags': item.tag_ids,
+        'type': "action",
+    }
+
+
+def get_transaction_item(item, names):
+    return {
+        'id': item.id,
+        'name': names.name(item.account_id),
+        'account': item.account_id,
+        'style': "color-danger-600",
+        'balance': item.transaction_amount,
+        'last_updated': item.last_updated,
+        'category': item.category_id,
+        'tags': item.tag_ids,
+        'type': "transaction",
+    }
+
+
+def get_transfer_item(item, names):
+    return {
+        'id': item.id,
+        'name': names.transfer_name(item.from_account_id, item.to_account_id),
+        'balance': item.transfer_amount,
+        'last_updated': item.last_updated,
+        'from_account': names.label(item.from_account_id),
+        'from_account_id': item.from_account_id,
+        'to_account': names.label(item.to_account_id),
+        'to_account_id': item.to_account_id,
+        'type': "transfer",
+    }
+
+
+def get_operation_item(operation_type, item, names):
+    if operation_type == 'action':
+        return get_action_item(item, names)
+
+    if operation_type == 'transaction':
+        return get_transaction_item(item, names)
+
+    return get_transfer_item(item, names)
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+EXPORT_COLUMNS = ('id', 'type', 'last_updated', 'amount', 'account',
+                  'category', 'tags', 'from_account', 'to_account')
+
+
+def get_export_row(operation_type, item, names, categories, tags):
+    """Return a CSV row of ``EXPORT_COLUMNS`` resolving names from maps"""
+    if operation_type == 'transfer':
+        return (
+            item.id,
+            operation_type,
+            localtime(item.last_updated).isoformat(),
+            item.transfer_amount,
+            '',
+            '',
+            '',
+            names.name(item.from_account_id),
+            names.name(item.to_account_id),
+        )
+
+    return (
+        item.id,
+        operation_type,
+        localtime(item.last_updated).isoformat(),
+        getattr(item, f'{operation_type}_amount'),
+        names.name(item.account_id),
+        categories.get(item.category_id, ''),
+        ', '.join(tags[tag_id] for tag_id in item.tag_ids),
+        '',
+        '',
+    )
+
+
 class OperationListViewSchema(schemas.AutoSchema):
 
     def get_manual_fields(self, path, method):
@@ -69,6 +195,31 @@ class OperationListViewSchema(schemas.AutoSchema):
                     location='query',
                     schema=coreschema.Array()
                 ),
+                coreapi.Field(
+                    'min_amount',
+                    location='query',
+                    schema=coreschema.Number()
+                ),
+                coreapi.Field(
+                    'max_amount',
+                    location='query',
+                    schema=coreschema.Number()
+                ),
+                coreapi.Field(
+                    'cursor',
+                    location='query',
+                    schema=coreschema.String()
+                ),
+                coreapi.Field(
+                    'limit',
+                    location='query',
+                    schema=coreschema.Integer()
+                ),
+                coreapi.Field(
+                    'stream',
+                    location='query',
+                    schema=coreschema.Boolean()
+                ),
             ]
 
         manual_fields = super().get_manual_fields(path, method)
@@ -82,196 +233,341 @@ class OperationListView(ServiceExceptionHandlerMixin, APIView):
 
     schema = OperationListViewSchema()
 
-    def get(self, request):
-        req_accounts = [account_id for account_id in request.query_params.get(
-            'account', '').split(",") if account_id]
-        req_categories = [category_id for category_id in request.query_params.get(
-            'category', '').split(",") if category_id]
-        req_tags = [tag_id for tag_id in request.query_params.get(
-            'tag', '').split(",") if tag_id]
-        req_types = [type_id for type_id in request.query_params.get(
-            'type', '').split(",") if type_id]
+    default_limit = 50
+    max_limit = 500
+    stream_chunk_size = 2000
 
-        profile = models.Profile.objects.get(user=self.request.user)
+    def get_error_response(self, detail):
+        return Response(
+            {"detail": detail},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
+    def validate_request(self, request, profile):
+        """Return an error response if the request can not be served"""
         if profile.company is None:
-            return Response(
-                {"detail": "Сначала необходимо создать компанию или присоединиться к ней."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return self.get_error_response(
+                "Сначала необходимо создать компанию "
+                "или присоединиться к ней.")
+
+        if 'start_date' not in request.query_params or \
+                'end_date' not in request.query_params:
+            return self.get_error_response("Неверный диапазон дат")
+
+        if not is_date(request.query_params['start_date']) or \
+                not is_date(request.query_params['end_date']):
+            return self.get_error_response("Неверный диапазон дат")
+
+        return None
+
+    def get_accounts(self, profile):
+        """Return the Account queryset the profile may see"""
+        if profile.is_admin:
+            return models.Account.objects.filter(company=profile.company)
+
+        return models.Account.objects.filter(profile=profile)
+
+    def get_rollups(self, request, profile):
+        """
+        Return DailyRollup rows matching the request, None if rollups are
+        disabled or do not hold every operation matching its filter
+        """
+        operation_filter = OperationFilter.from_query_params(
+            request.query_params)
+
+        if not settings.REPORTS_FROM_ROLLUPS or \
+                not operation_filter.supports_rollups:
+            return None
+
+        return operation_filter.get_rollups(
+            profile.company, self.get_accounts(profile))
+
+    def get_querysets(self, request, profile):
+        """
+        Return actions, transactions and transfers matching the request
+        filters, each annotated with ``day`` and ordered newest first.
+        """
+        operation_filter = OperationFilter.from_query_params(
+            request.query_params)
+        accounts = self.get_accounts(profile)
+
+        actions, transactions, transfers = (
+            operation_filter.get_queryset(operation_type, accounts)
+            for operation_type in ('action', 'transaction', 'transfer')
+        )
+
+        ordering = ('-last_updated', '-id')
+
+        return (
+            annotate_day(actions).order_by(*ordering),
+            annotate_day(transactions).order_by(*ordering),
+            annotate_day(transfers).order_by(*ordering),
+        )
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValueError('Неверный размер страницы')
 
-        if 'start_date' not in request.query_params or 'end_date' not in request.query_params:
-            return Response(
-                {"detail": "Неверный диапазон дат"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        elif not is_date(request.query_params['start_date']) or not is_date(request.query_params['end_date']):
-            return Response(
-                {"detail": "Неверный диапазон дат"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        if limit < 1:
+            raise ValueError('Неверный размер страницы')
 
-        start_date = request.query_params['start_date']
-        end_date = request.query_params['end_date']
+        return min(limit, self.max_limit)
 
-        from_datetime = make_aware(
-            parser.parse(start_date).replace(tzinfo=None))
-        to_date = make_aware(parser.parse(end_date).replace(tzinfo=None))
-        to_datetime = to_date.replace(minute=59, hour=23, second=59)
+    def get_page(self, request, profile, querysets):
+        """
+        Return up to ``limit`` operations after ``cursor`` merged across
+        actions, transactions and transfers.
 
-        actions = models.Action.objects.none()
-        transactions = models.Transaction.objects.none()
-        transfers = []
+        Every day section of the page carries ``continued`` set when the
+        day started on the previous page. Totals are not part of a page,
+        they are served by the totals endpoint.
+        """
+        limit = self.get_limit(request)
+        position = OperationCursor.decode(request.query_params['cursor']) \
+            if request.query_params.get('cursor') else None
 
-        try:
-            accounts = models.Account.objects.filter(company=profile.company) if profile.is_admin \
-                else models.Account.objects.filter(profile=profile)
-
-            accounts = accounts.filter(id__in=req_accounts) if bool(
-                req_accounts) else accounts
-
-            if ('action' in req_types) or not bool(req_types):
-                actions = models.Action.objects.filter(
-                    account__in=accounts,
-                    last_updated__range=[from_datetime, to_datetime]
-                ).select_related('account', 'category').prefetch_related('tags')
-
-                actions = actions.filter(category__in=req_categories) if bool(
-                    req_categories) else actions
-                actions = actions.filter(tags__in=req_tags) if bool(
-                    req_tags) else actions
-
-            if ('transaction' in req_types) or not bool(req_types):
-                transactions = models.Transaction.objects.filter(
-                    account__in=accounts,
-                    last_updated__range=[from_datetime, to_datetime]
-                ).select_related('account', 'category').prefetch_related('tags')
-
-                transactions = transactions.filter(category__in=req_categories) if bool(
-                    req_categories) else transactions
-                transactions = transactions.filter(
-                    tags__in=req_tags) if bool(req_tags) else transactions
-
-            transfers_list = list(models.Transfer.objects.filter(
-                Q(from_account__in=accounts) | Q(to_account__in=accounts),
-                last_updated__range=[from_datetime, to_datetime]
-            ).select_related('from_account', 'to_account'))
-
-            transfers_list = [] if bool(req_categories) else transfers_list
-            transfers_list = [] if bool(req_tags) else transfers_list
-
-            transfers = [i for n, i in enumerate(
-                transfers_list) if i not in transfers_list[n + 1:]]
-
-        except Exception as e:
-            print(f"transfers: {e}")
-
-        operation_data = []
-
-        for item in actions.values('id', 'account', 'action_amount', 'last_updated', 'category__id').annotate(
-            tags=ArrayAgg('tags__id', distinct=True)
-        ):
-            new_item = {}
-            new_item['id'] = item['id']
-            account = models.Account.objects.get(
-                id=item['account'])
-            profile_obj = account.profile
-            account_name = account.account_name
-            profile_count = profile.company.profiles.count()
-            if profile_count > 1:
-                new_item[
-                    'name'] = f"{profile_obj.first_name[:1]}. {profile_obj.last_name} ({account_name})"
-            else:
-                new_item['name'] = account_name
-            new_item['account'] = account.id
-            new_item["style"] = "color-success-600"
-            new_item['balance'] = item['action_amount']
-            new_item['last_updated'] = item['last_updated']
-            new_item['category'] = item['category__id']
-            new_item['tags'] = [int(var)
-                                for var in item['tags'] if var is not None]
-            new_item['type'] = "action"
-            operation_data.append(new_item)
-
-        for item in transactions.values('id', 'account', 'transaction_amount', 'last_updated', 'category__id').annotate(
-            tags=ArrayAgg('tags__id', distinct=True)
-        ):
-            new_item = {}
-            new_item['id'] = item['id']
-            account = models.Account.objects.get(
-                id=item['account'])
-            profile_obj = account.profile
-            account_name = account.account_name
-            profile_count = profile.company.profiles.count()
-            if profile_count > 1:
-                new_item[
-                    'name'] = f"{profile_obj.first_name[:1]}. {profile_obj.last_name} ({account_name})"
-            else:
-                new_item['name'] = account_name
-            new_item['account'] = account.id
-            new_item["style"] = "color-danger-600"
-            new_item['balance'] = item['transaction_amount']
-            new_item['last_updated'] = item['last_updated']
-            new_item['category'] = item['category__id']
-            new_item['tags'] = [int(var)
-                                for var in item['tags'] if var is not None]
-            new_item['type'] = "transaction"
-            operation_data.append(new_item)
-
-        for item in transfers:
-            new_item = {}
-            new_item['id'] = item.id
-            from_account = item.from_account
-            to_account = item.to_account
-            profile_from = from_account.profile
-            profile_to = to_account.profile
-            from_account_name = from_account.account_name
-            to_account_name = to_account.account_name
-            profile_count = profile.company.profiles.count()
-            if profile_count > 1:
-                new_item['name'] = (
-                    f"{profile_from.first_name[:1]}. {profile_from.last_name}"
-                    f" ({from_account_name}) => {profile_to.first_name[:1]}. "
-                    f"{profile_to.last_name} ({to_account_name})"
-                )
-            else:
-                new_item['name'] = f"{from_account_name} => {to_account_name}"
-            new_item['balance'] = item.transfer_amount
-            new_item['last_updated'] = item.last_updated
-            new_item["from_account"] = f"{from_account.account_name} (pk={from_account.id})"
-            new_item["from_account_id"] = from_account.id
-            new_item["to_account"] = f"{to_account.account_name} (pk={to_account.id})"
-            new_item["to_account_id"] = to_account.id
-            new_item['type'] = "transfer"
-            operation_data.append(new_item)
-
-        operation_data.sort(key=itemgetter('last_updated'), reverse=True)
-
-        groups = defaultdict(list)
-
-        for obj in operation_data:
-            groups[obj['last_updated'].strftime('%d.%m.%Y')].append(obj)
-
-        new_list = groups.values()
-
-        data = [
-            {"title": var[0]['last_updated'].strftime('%d.%m.%Y'), "data": var}
-            for var in new_list
+        streams = []
+
+        for operation_type, queryset in zip(
+                ('action', 'transaction', 'transfer'), querysets):
+            if position is not None:
+                queryset = filter_operations_after(
+                    operation_type, queryset, position)
+
+            streams.append(
+                tag_operations(operation_type, queryset[:limit + 1]))
+
+        operations = list(merge_operations(*streams, limit=limit + 1))
+        has_next = len(operations) > limit
+        operations = operations[:limit]
+
+        attach_operation_tags(operations)
+        names = AccountNames(
+            get_operation_account_ids(operations),
+            with_profile=profile.company.profiles.count() > 1
+        )
+        daily_totals = get_daily_totals(
+            *querysets, days={item.day for item_type, item in operations})
+
+        data = list(iter_day_groups(operations, names, daily_totals))
+
+        if data and position is not None:
+            data[0]['continued'] = get_day_title(
+                localtime(position[0])) == data[0]['title']
+
+        next_cursor = None
+
+        if has_next:
+            operation_type, item = operations[-1]
+            next_cursor = OperationCursor.encode(
+                item.last_updated, operation_type, item.id)
+
+        return Response({
+            'data': data,
+            'next': next_cursor,
+        }, status=status.HTTP_200_OK)
+
+    def iter_operations(self, querysets):
+        """
+        Yield ``(type, instance)`` pairs newest first reading the
+        querysets with server-side cursors.
+
+        Operations are merged one by one and tags are fetched once per
+        ``stream_chunk_size`` operations, so memory does not depend on
+        the number of operations in the range.
+        """
+        streams = [
+            tag_operations(
+                operation_type,
+                queryset.iterator(chunk_size=self.stream_chunk_size)
+            )
+            for operation_type, queryset in zip(
+                ('action', 'transaction', 'transfer'), querysets)
         ]
+        operations = merge_operations(*streams)
+
+        while True:
+            chunk = list(islice(operations, self.stream_chunk_size))
+
+            if not chunk:
+                return
+
+            attach_operation_tags(chunk)
+            yield from chunk
+
+    def iter_stream(self, profile, querysets, rollups=None):
+        """Yield the operation list JSON one completed day at a time"""
+        names = AccountNames(
+            models.Account.objects.filter(company=profile.company)
+            .values_list('id', flat=True),
+            with_profile=profile.company.profiles.count() > 1
+        )
+        daily_totals = get_daily_totals(*querysets)
+
+        yield '{"data":['
 
-        total_action = actions.aggregate(action_amount__sum=Coalesce(
-            Sum('action_amount'), 0))['action_amount__sum']
-        total_transaction = transactions.aggregate(transaction_amount__sum=Coalesce(
-            Sum('transaction_amount'), 0))['transaction_amount__sum']
+        groups = iter_day_groups(
+            self.iter_operations(querysets), names, daily_totals)
 
-        if total_action is None:
-            total_action = 0
+        for index, group in enumerate(groups):
+            yield to_json(group) if index == 0 else ',' + to_json(group)
 
-        if total_transaction is None:
-            total_transaction = 0
+        totals = get_operation_totals(*querysets, rollups=rollups)
+
+        yield '],' + to_json(totals)[1:]
+
+    def get(self, request):
+        profile = models.Profile.objects.get(user=self.request.user)
+        error_response = self.validate_request(request, profile)
+
+        if error_response is not None:
+            return error_response
+
+        querysets = self.get_querysets(request, profile)
+
+        if 'cursor' in request.query_params or \
+                'limit' in request.query_params:
+            return self.get_page(request, profile, querysets)
+
+        if request.query_params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                self.iter_stream(
+                    profile, querysets, self.get_rollups(request, profile)),
+                content_type='application/json'
+            )
+
+        actions, transactions, transfers = querysets
+
+        operations = list(merge_operations(
+            tag_operations('action', actions),
+            tag_operations('transaction', transactions),
+            tag_operations('transfer', transfers),
+        ))
+        attach_operation_tags(operations, querysets={
+            'action': actions,
+            'transaction': transactions,
+        })
+
+        names = AccountNames(
+            get_operation_account_ids(operations),
+            with_profile=profile.company.profiles.count() > 1
+        )
+
+        data = list(iter_day_groups(
+            operations, names, get_daily_totals(*querysets)))
 
         return Response({
             'data': data,
-            "total_action": total_action,
-            "total_transaction": total_transaction
+            **get_operation_totals(
+                *querysets, rollups=self.get_rollups(request, profile)),
         }, status=status.HTTP_200_OK)
+
+
+class OperationTotalsViewSchema(OperationListViewSchema):
+
+    def get_manual_fields(self, path, method):
+        extra_fields = []
+
+        if method.lower() in ['get', ]:
+            extra_fields = [
+                coreapi.Field(
+                    'breakdown',
+                    location='query',
+                    schema=coreschema.Array()
+                ),
+            ]
+
+        manual_fields = super().get_manual_fields(path, method)
+        return manual_fields + extra_fields
+
+
+class OperationTotalsView(OperationListView):
+    """
+    Custom View to get operation list totals without the operations
+
+    ``breakdown=category,account`` adds per-category and per-account
+    subtotals computed in the same query. With ``REPORTS_FROM_ROLLUPS``
+    actions and transactions are summed from daily rollups when the
+    filter allows it, as in the monthly report.
+    """
+    schema = OperationTotalsViewSchema()
+
+    def get_breakdowns(self, request):
+        breakdowns = [breakdown for breakdown in request.query_params.get(
+            'breakdown', '').split(",") if breakdown]
+
+        for breakdown in breakdowns:
+            if breakdown not in TOTAL_BREAKDOWNS:
+                raise ValueError('Неверная группировка итогов')
+
+        return list(dict.fromkeys(breakdowns))
+
+    def get(self, request):
+        profile = models.Profile.objects.get(user=self.request.user)
+        error_response = self.validate_request(request, profile)
+
+        if error_response is not None:
+            return error_response
+
+        breakdowns = self.get_breakdowns(request)
+        querysets = self.get_querysets(request, profile)
+
+        return Response(
+            get_operation_totals(
+                *querysets,
+                breakdowns=breakdowns,
+                rollups=self.get_rollups(request, profile)
+            ),
+            status=status.HTTP_200_OK
+        )
+
+
+class OperationExportView(OperationListView):
+    """
+    Custom View to export the operation list as CSV
+
+    Takes the operation list filters. Rows are streamed newest first with
+    server-side cursors, names are resolved from maps of the company
+    accounts, categories and tags built before the first row.
+    """
+
+    def iter_csv(self, profile, querysets):
+        names = AccountNames(
+            models.Account.objects.filter(company=profile.company)
+            .values_list('id', flat=True),
+            with_profile=profile.company.profiles.count() > 1
+        )
+        categories = dict(
+            models.Category.objects.filter(company=profile.company)
+            .values_list('id', 'category_name')
+        )
+        tags = dict(
+            models.Tag.objects.filter(company=profile.company)
+            .values_list('id', 'tag_name')
+        )
+        writer = csv.writer(Echo())
+
+        yield writer.writerow(EXPORT_COLUMNS)
+
+        for operation_type, item in self.iter_operations(querysets):
+            yield writer.writerow(get_export_row(
+                operation_type, item, names, categories, tags))
+
+    def get(self, request):
+        profile = models.Profile.objects.get(user=self.request.user)
+        error_response = self.validate_request(request, profile)
+
+        if error_response is not None:
+            return error_response
+
+        querysets = self.get_querysets(request, profile)
+        response = StreamingHttpResponse(
+            self.iter_csv(profile, querysets),
+            content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = \
+            'attachment; filename="operations.csv"'
+
+        return response
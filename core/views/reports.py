@@ -0,0 +1,181 @@
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.db.models import F
+from django.utils.timezone import localdate, localtime, make_aware
+
+from rest_framework import status, schemas
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+import coreapi
+import coreschema
+
+from core.cache import get_report_month_keys, get_report_months, \
+    set_report_months
+from core.filters import OperationFilter
+from core.mixins import ServiceExceptionHandlerMixin
+from core.services import get_monthly_report, get_rollup_monthly_report, \
+    get_next_month, iter_months, REPORT_GROUPS
+from core import models
+
+
+class MonthlyReportViewSchema(schemas.AutoSchema):
+
+    def get_manual_fields(self, path, method):
+        extra_fields = []
+
+        if method.lower() in ['get', ]:
+            extra_fields = [
+                coreapi.Field(
+                    'start_date',
+                    required=True,
+                    location='query',
+                    schema=coreschema.String()
+                ),
+                coreapi.Field(
+                    'end_date',
+                    required=True,
+                    location='query',
+                    schema=coreschema.String()
+                ),
+                coreapi.Field(
+                    'group',
+                    location='query',
+                    schema=coreschema.Array()
+                ),
+                coreapi.Field(
+                    'account',
+                    location='query',
+                    schema=coreschema.Array()
+                ),
+                coreapi.Field(
+                    'category',
+                    location='query',
+                    schema=coreschema.Array()
+                ),
+                coreapi.Field(
+                    'tag',
+                    location='query',
+                    schema=coreschema.Array()
+                ),
+            ]
+
+        manual_fields = super().get_manual_fields(path, method)
+        return manual_fields + extra_fields
+
+
+class MonthlyReportView(ServiceExceptionHandlerMixin, APIView):
+    """
+    Custom View to get monthly sums of actions and transactions
+
+    Sums are grouped by category by default, ``group`` takes a comma
+    separated list of ``category``, ``account`` and ``profile``. Reports
+    cover whole months of ``start_date`` and ``end_date``. Past months
+    are cached until an operation of the company is edited or deleted.
+    With ``REPORTS_FROM_ROLLUPS`` sums are read from daily rollups unless
+    the request filters by tags or amounts.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    schema = MonthlyReportViewSchema()
+
+    def get_groups(self, request):
+        groups = [group for group in request.query_params.get(
+            'group', 'category').split(",") if group]
+
+        for group in groups:
+            if group not in REPORT_GROUPS:
+                raise ValueError('Неверная группировка отчета')
+
+        return list(dict.fromkeys(groups))
+
+    def get_scope(self, profile, groups, operation_filter):
+        """Return a cache key part identifying the report params"""
+        scope = '|'.join(str(part) for part in (
+            'company' if profile.is_admin else profile.id,
+            groups,
+            operation_filter.accounts,
+            operation_filter.categories,
+            operation_filter.tags,
+            operation_filter.types,
+            operation_filter.min_amount,
+            operation_filter.max_amount,
+        ))
+
+        return hashlib.md5(scope.encode()).hexdigest()
+
+    def get(self, request):
+        profile = models.Profile.objects.select_related('company')\
+            .annotate(history_version=F('company__state__history_version'))\
+            .get(user=self.request.user)
+
+        if profile.company is None:
+            return Response(
+                {"detail": "Сначала необходимо создать компанию "
+                           "или присоединиться к ней."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        groups = self.get_groups(request)
+        operation_filter = OperationFilter.from_query_params(
+            request.query_params)
+
+        if operation_filter.start_date is None or \
+                operation_filter.end_date is None:
+            raise ValueError('Неверный диапазон дат')
+
+        months = list(iter_months(
+            localtime(operation_filter.start_date).date(),
+            localtime(operation_filter.end_date).date()
+        ))
+        current_month = localdate().replace(day=1)
+        past_months = [month for month in months if month < current_month]
+
+        keys = get_report_month_keys(
+            profile.company_id,
+            profile.history_version,
+            self.get_scope(profile, groups, operation_filter),
+            past_months
+        )
+        report = get_report_months(keys)
+        missing = [month for month in months if month not in report]
+
+        if missing:
+            operation_filter.start_date = make_aware(
+                datetime.datetime.combine(missing[0], datetime.time()))
+            operation_filter.end_date = make_aware(datetime.datetime.combine(
+                get_next_month(missing[-1]), datetime.time())) - \
+                datetime.timedelta(microseconds=1)
+
+            accounts = models.Account.objects\
+                .filter(company=profile.company) if profile.is_admin \
+                else models.Account.objects.filter(profile=profile)
+
+            if settings.REPORTS_FROM_ROLLUPS and \
+                    operation_filter.supports_rollups:
+                sections = get_rollup_monthly_report(
+                    operation_filter.get_rollups(profile.company, accounts),
+                    groups,
+                    missing
+                )
+            else:
+                sections = get_monthly_report(
+                    operation_filter.get_queryset('action', accounts),
+                    operation_filter.get_queryset('transaction', accounts),
+                    groups,
+                    missing
+                )
+            set_report_months(keys, {
+                month: section for month, section in sections.items()
+                if month in keys
+            })
+            report.update(sections)
+
+        return Response({
+            'data': [report[month] for month in months],
+        }, status=status.HTTP_200_OK)
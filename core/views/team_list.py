@@ -0,0 +1,52 @@
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.mixins import ServiceExceptionHandlerMixin
+from core.pagination import TeamListPagination
+from core.services import get_team_balances, refresh_ledger_balances
+from core import models
+
+
+class TeamListView(ServiceExceptionHandlerMixin, APIView):
+    """Custom View to get balances of every company profile"""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    pagination_class = TeamListPagination
+
+    def get(self, request):
+        profile = models.Profile.objects.select_related('company')\
+            .get(user=self.request.user)
+
+        if profile.company is None:
+            return Response(
+                {"detail": "Сначала необходимо создать компанию "
+                           "или присоединиться к ней."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not profile.is_admin:
+            return Response(
+                {"detail": "Невозможно получить данные пользователя."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        refresh_ledger_balances(profile.company_id)
+        paginator = self.pagination_class()
+        profiles = paginator.paginate_queryset(
+            get_team_balances(profile.company), request, view=self)
+
+        data = [
+            {
+                'id': item.id,
+                'name': f"{item.first_name} {item.last_name}",
+                'balance': item.balance_sum,
+                'last_updated': item.last_updated,
+                'type': "profile",
+            }
+            for item in profiles
+        ]
+
+        return paginator.get_paginated_response(data)